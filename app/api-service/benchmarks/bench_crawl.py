@@ -0,0 +1,55 @@
+"""Refresh wall-clock time of `fetch_all_products` versus crawl concurrency.
+
+python benchmarks/bench_crawl.py --products 20000 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+from stub_oda import StubOdaServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rate-limit", type=float, default=0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    with StubOdaServer(
+        total_products=args.products, page_size=args.page_size, latency=args.latency
+    ) as server:
+        os.environ["ODA_API_BASE_URL"] = server.base_url
+        os.environ["ODA_RATE_LIMIT"] = str(args.rate_limit)
+        from services import oda
+
+        print(
+            f"{'concurrency':>11} {'seconds':>8} {'products':>9} {'requests':>9} "
+            f"{'new conns':>9} {'p50 ms':>7}"
+        )
+        for concurrency in args.concurrency:
+            server.requests = 0
+            oda.client_stats = oda.OdaClientStats()
+            start = time.perf_counter()
+            products = asyncio.run(oda.fetch_all_products(concurrency))
+            elapsed = time.perf_counter() - start
+            stats = oda.client_stats.snapshot()
+            print(
+                f"{concurrency:>11} {elapsed:>8.2f} {len(products):>9} {server.requests:>9} "
+                f"{stats['new_connections']:>9} {stats['latency_ms']['p50']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Aggregation throughput of the python and numpy stats engines.
+
+Also checks that both engines serialize to byte-identical JSON.
+
+    python benchmarks/bench_engines.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+from catalog import make_catalog
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+
+def encode(stats) -> bytes:
+    return json.dumps(stats.model_dump(exclude={"last_updated"})).encode()
+
+
+def best_of(repeat: int, fn, *args):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    from utils.stats import calculate_stats
+    from utils.columnar import calculate_stats_columnar
+
+    print(
+        f"{'products':>9} {'python s':>9} {'numpy s':>9} {'speedup':>8} {'identical':>9}"
+    )
+    for size in args.sizes:
+        products = make_catalog(size, lean=True)
+        python_time, python_stats = best_of(args.repeat, calculate_stats, products)
+        numpy_time, numpy_stats = best_of(
+            args.repeat, calculate_stats_columnar, products
+        )
+        identical = encode(python_stats) == encode(numpy_stats)
+        print(
+            f"{size:>9} {python_time:>9.3f} {numpy_time:>9.3f} "
+            f"{python_time / numpy_time:>7.2f}x {str(identical):>9}"
+        )
+        del products
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Time-range queries over a year of half-hourly stats snapshots.
+
+Fills `product:stats:history` in a scratch Redis database with one snapshot
+every 30 minutes for `--days` days (stats of a synthetic catalog, with prices
+drifting over time), then times history queries over various ranges.
+
+    python benchmarks/bench_history.py --days 365 --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+import redis
+import redis.asyncio as aioredis
+
+from catalog import make_product
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+INTERVAL = 30 * 60
+
+
+def fill(client, days: int, products: int, end: float):
+    from services.stats_history import HISTORY_KEY, record_snapshot
+    from utils.stats import calculate_stats
+
+    client.delete(HISTORY_KEY)
+    stats = calculate_stats([make_product(i, lean=True) for i in range(products)])
+    snapshots = days * 24 * 2
+    start = end - snapshots * INTERVAL
+    with client.pipeline(transaction=False) as pipe:
+        for i in range(snapshots):
+            stats.average_price = round(stats.average_price * 1.0001, 2)
+            stats.last_updated = str(start + i * INTERVAL)
+            record_snapshot(pipe, stats, start + i * INTERVAL)
+            if i % 1000 == 999:
+                pipe.execute()
+        pipe.execute()
+
+    memory = client.memory_usage(HISTORY_KEY) or 0
+    print(f"{client.zcard(HISTORY_KEY)} snapshots, {memory / 1024 / 1024:.1f} MB")
+
+
+async def query(redis_url: str, end: float, repeat: int):
+    from services.stats_history import query_history
+
+    client = aioredis.Redis.from_url(redis_url, decode_responses=True)
+    print(f"{'range':>6} {'fields':>14} {'points':>7} {'returned':>9} {'ms':>8}")
+    for days in (1, 7, 30, 365):
+        for fields in (["average_price"], None):
+            for points in (200, 1000):
+                kwargs = {"max_points": points}
+                if fields:
+                    kwargs["fields"] = fields
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    result = await query_history(
+                        client, end - days * 86400, end, **kwargs
+                    )
+                elapsed = (time.perf_counter() - start) / repeat
+                print(
+                    f"{days:>5}d {','.join(fields or ['all']):>14} {points:>7} "
+                    f"{len(result['points']):>9} {elapsed * 1000:>8.1f}"
+                )
+    await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    end = time.time()
+    fill(redis.Redis.from_url(args.redis_url), args.days, args.products, end)
+    asyncio.run(query(args.redis_url, end, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Peak RSS of collecting the whole catalog versus streaming it page by page.
+
+Feeds a synthetic catalog through an async page generator (no network) and
+aggregates it in four ways, each in a fresh process:
+
+    list         collect every raw product dict, then calculate_stats
+    records      collect every product as a ProductRecord (fetch_all_products)
+    stream       fold each projected page into a StatsAccumulator
+    incremental  fold each projected page into an IncrementalStatsAggregator
+                 (refresh task)
+
+    python benchmarks/bench_memory.py --products 1000000
+"""
+
+import argparse
+import asyncio
+import logging
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from catalog import make_page
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+MODES = ["list", "records", "stream", "incremental"]
+
+
+async def synthetic_pages(total_products: int, page_size: int):
+    pages = -(-total_products // page_size)
+    for page in range(1, pages + 1):
+        yield make_page(page, total_products, page_size)["items"]
+        await asyncio.sleep(0)
+
+
+async def run(mode: str, total_products: int, page_size: int):
+    from utils.products import project_page
+    from utils.stats import (
+        IncrementalStatsAggregator,
+        StatsAccumulator,
+        calculate_stats,
+    )
+
+    pages = synthetic_pages(total_products, page_size)
+    if mode in ("list", "records"):
+        products = []
+        async for page in pages:
+            products.extend(page if mode == "list" else project_page(page))
+        return calculate_stats(products)
+
+    aggregator = (
+        StatsAccumulator() if mode == "stream" else IncrementalStatsAggregator()
+    )
+    if mode == "incremental":
+        aggregator.begin()
+    async for page in pages:
+        aggregator.add(project_page(page))
+    return aggregator.finish()
+
+
+def child(mode: str, total_products: int, page_size: int):
+    logging.basicConfig(level=logging.WARNING)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    stats = asyncio.run(run(mode, total_products, page_size))
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(
+        f"{mode} {stats.total_products} {elapsed:.2f} {baseline / 1024:.1f} {peak / 1024:.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args.products, args.page_size)
+
+    print(f"{'mode':>12} {'products':>9} {'seconds':>8} {'base MB':>8} {'peak MB':>8}")
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", mode]
+            + ["--products", str(args.products), "--page-size", str(args.page_size)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split()
+        print(
+            f"{output[0]:>12} {output[1]:>9} {output[2]:>8} {output[3]:>8} {output[4]:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Overhead of the /metrics instrumentation.
+
+record      one Counter.inc / Histogram.observe with labels
+request     an in-process GET of a cached payload, with and without
+            MetricsMiddleware (ASGI transport, no network)
+scrape      rendering the registry with every series populated
+
+python benchmarks/bench_metrics.py --requests 5000
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+
+def per_call(fn, min_time: float = 0.5) -> float:
+    calls, start = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < min_time:
+        for _ in range(1000):
+            fn()
+        calls += 1000
+    return elapsed / calls
+
+
+async def request_latency(app, requests: int) -> float:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        for _ in range(200):
+            await c.get("/api/stats")
+        start = time.perf_counter()
+        for _ in range(requests):
+            await c.get("/api/stats")
+        return (time.perf_counter() - start) / requests
+
+
+def make_app(instrumented: bool):
+    from fastapi import FastAPI, Response
+
+    from api.middleware import MetricsMiddleware
+
+    app = FastAPI()
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    body = b'{"total_products": 1}' * 200
+
+    @app.get("/api/stats")
+    async def stats():
+        return Response(content=body, media_type="application/json")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    from services import metrics
+
+    inc = per_call(lambda: metrics.stats_refreshes.inc("published"))
+    observe = per_call(lambda: metrics.oda_page_seconds.observe(0.042, "200"))
+    print(
+        f"record:  counter inc {inc * 1e9:.0f} ns, histogram observe {observe * 1e9:.0f} ns"
+    )
+
+    # Alternate the two apps so drift affects both equally
+    timings = {False: [], True: []}
+    for _ in range(args.rounds):
+        for instrumented in (False, True):
+            timings[instrumented].append(
+                asyncio.run(request_latency(make_app(instrumented), args.requests))
+            )
+    plain = statistics.median(timings[False])
+    instrumented = statistics.median(timings[True])
+    print(
+        f"request: {plain * 1e6:.1f} us plain, {instrumented * 1e6:.1f} us with "
+        f"middleware ({(instrumented - plain) * 1e6:+.1f} us, "
+        f"{(instrumented / plain - 1) * 100:+.1f}%)"
+    )
+
+    for status in ("200", "422", "503", "error"):
+        metrics.oda_page_seconds.observe(0.1, status)
+    for operation in ("stats_check", "stats_load", "stats_publish", "history_query"):
+        metrics.redis_operation_seconds.observe(0.001, operation)
+    scrape = per_call(metrics.registry.render, min_time=0.2)
+    size = len(metrics.registry.render())
+    print(f"scrape:  {scrape * 1e6:.0f} us for {size / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
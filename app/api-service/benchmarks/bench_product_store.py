@@ -0,0 +1,67 @@
+"""Memory held per product: raw ODA items versus ProductRecords.
+
+Parses synthetic `/search/mixed/` pages from JSON (as the crawler does) and
+measures, with tracemalloc, what keeping the whole catalog costs as raw item
+dicts and as projected ProductRecords.
+
+    python benchmarks/bench_product_store.py --products 100000
+"""
+
+import argparse
+import gc
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from catalog import make_page
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+
+def measure(bodies, keep):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    kept = []
+    for body in bodies:
+        kept.extend(keep(json.loads(body)["items"]))
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return len(kept), size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    from utils.products import project_page
+
+    pages = -(-args.products // args.page_size)
+    bodies = [
+        json.dumps(make_page(page, args.products, args.page_size))
+        for page in range(1, pages + 1)
+    ]
+
+    print(
+        f"{'store':>8} {'products':>9} {'MB':>8} {'bytes/product':>14} {'parse s':>8}"
+    )
+    results = {}
+    for name, keep in (("raw", lambda items: items), ("records", project_page)):
+        count, size, elapsed = measure(bodies, keep)
+        results[name] = size / count
+        print(
+            f"{name:>8} {count:>9} {size / 1024 / 1024:>8.1f} "
+            f"{size / count:>14.0f} {elapsed:>8.2f}"
+        )
+    print(f"records use {results['raw'] / results['records']:.1f}x less memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Burst of concurrent /api/stats requests against a missing or stale snapshot.
+
+Starts a stub ODA API and `--replicas` API processes under uvicorn sharing one
+Redis, then sends `--requests` concurrent requests spread over the replicas,
+each waiting up to `--wait` seconds for a fresh snapshot:
+
+    empty   right after startup, with nothing in Redis or on disk
+    stale   the catalog changed and the snapshot is past its fresh-until time
+
+Every request should get an answer (200 once the refresh lands, stale 200s or
+503s only if it takes longer than `--wait`), while ODA is crawled once per
+scenario however many requests and replicas asked for it.
+
+    python benchmarks/bench_revalidate.py --replicas 3 --requests 1000 --wait 20
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+import redis
+
+from load_test import percentile
+from stub_oda import StubOdaServer
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+STATS_KEYS = (
+    "product:stats",
+    "product:stats:version",
+    "product:stats:leader",
+    "product:stats:fresh_until",
+    "product:stats:next_refresh",
+    "product:stats:revalidate",
+    "product:stats:price_sketch",
+    "product:stats:index",
+)
+FRESH_UNTIL_KEY = "product:stats:fresh_until"
+
+
+def start_replicas(env: dict, ports) -> list:
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+            cwd=SRC,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for port in ports
+    ]
+    deadline = time.perf_counter() + 30
+    for port in ports:
+        while True:
+            try:
+                health = httpx.get(f"http://127.0.0.1:{port}/health", timeout=1)
+                if health.json()["status"] == "healthy":
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"Replica on port {port} did not start")
+            time.sleep(0.05)
+    return processes
+
+
+async def burst(ports, total: int, wait: float) -> dict:
+    latencies = []
+    statuses = Counter()
+
+    async def request(client: httpx.AsyncClient, port: int):
+        start = time.perf_counter()
+        try:
+            response = await client.get(
+                f"http://127.0.0.1:{port}/api/stats", params={"wait": wait}
+            )
+            status = str(response.status_code)
+            if response.status_code == 200 and response.json()["cache_info"]["stale"]:
+                status = "200 stale"
+            statuses[status] += 1
+        except httpx.HTTPError as e:
+            statuses[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=total)
+    async with httpx.AsyncClient(limits=limits, timeout=wait + 30) as client:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(request(client, ports[i % len(ports)]) for i in range(total))
+        )
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "seconds": round(elapsed, 3),
+        "latency_ms": {
+            name: round(percentile(latencies, q) * 1000, 1)
+            for name, q in (("p50", 0.5), ("p95", 0.95), ("max", 1.0))
+        },
+        "statuses": dict(statuses),
+    }
+
+
+def revalidations(ports) -> Counter:
+    total = Counter()
+    for port in ports:
+        debug = httpx.get(f"http://127.0.0.1:{port}/debug/scheduler", timeout=5)
+        total.update(debug.json()["revalidation"])
+    return total
+
+
+def report(scenario: str, result: dict, oda_requests: int, pages: int, seen: Counter):
+    print(
+        f"{scenario:>6}: {result['statuses']} in {result['seconds']:.2f}s, "
+        f"latency {result['latency_ms']}"
+    )
+    print(
+        f"{'':>6}  ODA requests: {oda_requests} (~{oda_requests / (pages + 1):.1f} crawls); "
+        f"revalidation {dict(seen)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--wait", type=float, default=20)
+    parser.add_argument("--redis-host", default="localhost")
+    parser.add_argument("--redis-port", default="6379")
+    parser.add_argument("--port", type=int, default=8020)
+    args = parser.parse_args()
+
+    client = redis.Redis(host=args.redis_host, port=int(args.redis_port))
+    client.delete(*STATS_KEYS)
+    ports = [args.port + i for i in range(args.replicas)]
+
+    with StubOdaServer(args.products, latency=args.latency) as stub:
+        env = dict(
+            os.environ,
+            REDIS_HOST=args.redis_host,
+            REDIS_PORT=args.redis_port,
+            ODA_API_BASE_URL=stub.base_url,
+            ODA_RATE_LIMIT="0",
+            ODA_FULL_CRAWL_INTERVAL="0",
+            ODA_PAGE_STORE_PATH="",
+            STATS_STARTUP_MODE="background",
+            STATS_SNAPSHOT_PATH="",
+            STATS_CACHE_CHECK_INTERVAL="0.5",
+        )
+        processes = start_replicas(env, ports)
+        try:
+            before = Counter()
+            for scenario in ("empty", "stale"):
+                if scenario == "stale":
+                    stub.revision += 1
+                    client.set(FRESH_UNTIL_KEY, time.time() - 1)
+                    time.sleep(1)  # Past every replica's check interval
+                requests = stub.requests
+                result = asyncio.run(burst(ports, args.requests, args.wait))
+                time.sleep(1)  # Let a refresh that outlived the burst finish
+                seen = revalidations(ports)
+                report(
+                    scenario,
+                    result,
+                    stub.requests - requests,
+                    stub.last_page,
+                    seen - before,
+                )
+                before = seen
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait()
+            client.delete(*STATS_KEYS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""JSON backends compared on the service's own payloads.
+
+decode page    an ODA `/search/mixed/` page (100 full items) to ProductRecords
+encode stats   the published stats snapshot
+decode stats   the same snapshot (followers and the history endpoint)
+
+python benchmarks/bench_serialization.py --products 20000
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+from catalog import make_catalog, make_page
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+
+def per_call(fn, arg, min_time: float = 0.5) -> float:
+    calls, start = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < min_time:
+        fn(arg)
+        calls += 1
+    return elapsed / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=20_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    from utils.serialization import SERIALIZERS, get_serializer
+    from utils.stats import calculate_stats
+
+    page = json.dumps(make_page(1, args.products, 100)).encode()
+    stats = calculate_stats(make_catalog(args.products, lean=True)).model_dump()
+    encoded_stats = json.dumps(stats).encode()
+    print(f"page: {len(page) / 1024:.0f} KB, stats: {len(encoded_stats) / 1024:.1f} KB")
+
+    print(
+        f"{'backend':>8} {'decode page':>13} {'encode stats':>13} "
+        f"{'decode stats':>13} {'vs stdlib':>16}"
+    )
+    timings = {}
+    for name in reversed(SERIALIZERS):
+        if SERIALIZERS[name] is None:
+            print(f"{name:>8} not installed")
+            continue
+        serializer = get_serializer(name)
+        timings[name] = [
+            per_call(serializer.decode_search_page, page),
+            per_call(serializer.dumps, stats),
+            per_call(serializer.loads, encoded_stats),
+        ]
+        speedups = "/".join(
+            f"{s / t:.1f}" for s, t in zip(timings["stdlib"], timings[name])
+        )
+        print(
+            f"{name:>8} "
+            + " ".join(f"{t * 1e6:>10.0f} µs" for t in timings[name])
+            + f" {speedups:>15}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
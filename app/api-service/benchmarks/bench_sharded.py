@@ -0,0 +1,139 @@
+"""Process-pool sharded aggregation: speedup and event-loop lag.
+
+speedup   calculate_stats versus calculate_stats_sharded with 1..N workers
+          over the same projected records
+lag       a 1 ms ticker runs on the event loop while pages arrive every
+          `--page-interval` seconds and are aggregated; reports how late the
+          ticker woke up (p99 and max) for each way of aggregating:
+
+    list         collect every page, then calculate_stats (the old refresh)
+    python       fold each page into a StatsAccumulator on the loop
+    incremental  fold each page into an IncrementalStatsAggregator
+    sharded      hand pages to ShardedStatsAccumulator, await drain()
+
+    python benchmarks/bench_sharded.py --products 1000000
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from catalog import make_catalog
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+MODES = ["list", "python", "incremental", "sharded"]
+
+
+def spawn_pool(workers: int) -> ProcessPoolExecutor:
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    # Start every worker before timing anything
+    list(pool.map(abs, range(workers * 4)))
+    return pool
+
+
+def speedup(records, worker_counts, shard_size: int):
+    from utils.sharded import calculate_stats_sharded
+    from utils.stats import calculate_stats
+
+    start = time.perf_counter()
+    calculate_stats(records)
+    baseline = time.perf_counter() - start
+    print(f"{'workers':>7} {'seconds':>8} {'speedup':>8}")
+    print(f"{'inline':>7} {baseline:>8.3f} {1:>7.2f}x")
+    for workers in worker_counts:
+        with spawn_pool(workers) as pool:
+            start = time.perf_counter()
+            calculate_stats_sharded(records, pool, shard_size)
+            elapsed = time.perf_counter() - start
+        print(f"{workers:>7} {elapsed:>8.3f} {baseline / elapsed:>7.2f}x")
+
+
+async def measure_lag(mode: str, pages, page_interval: float, pool, shard_size: int):
+    from utils.sharded import ShardedStatsAccumulator
+    from utils.stats import (
+        IncrementalStatsAggregator,
+        StatsAccumulator,
+        calculate_stats,
+    )
+
+    lags = []
+    done = False
+
+    async def ticker():
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+
+    task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    if mode == "list":
+        collected = []
+        for page in pages:
+            collected.extend(page)
+            await asyncio.sleep(page_interval)
+        calculate_stats(collected)
+    else:
+        if mode == "python":
+            accumulator = StatsAccumulator()
+        elif mode == "incremental":
+            accumulator = IncrementalStatsAggregator()
+            accumulator.begin()
+        else:
+            accumulator = ShardedStatsAccumulator(pool, shard_size)
+        for page in pages:
+            accumulator.add(page)
+            await asyncio.sleep(page_interval)
+        if mode == "sharded":
+            await accumulator.drain()
+        accumulator.finish()
+    elapsed = time.perf_counter() - start
+    done = True
+    await task
+
+    lags.sort()
+    return elapsed, lags[int(len(lags) * 0.99)], lags[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--page-interval", type=float, default=0.0005)
+    parser.add_argument("--shard-size", type=int, default=50_000)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1})
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    from utils.products import project_page
+
+    records = project_page(make_catalog(args.products, lean=True))
+    print(f"{args.products} products, {os.cpu_count()} CPUs\n")
+    speedup(records, args.workers, args.shard_size)
+
+    pages = [
+        records[start : start + args.page_size]
+        for start in range(0, len(records), args.page_size)
+    ]
+    print(f"\n{'mode':>12} {'seconds':>8} {'p99 lag ms':>11} {'max lag ms':>11}")
+    with spawn_pool(max(args.workers)) as pool:
+        for mode in MODES:
+            elapsed, p99, worst = asyncio.run(
+                measure_lag(mode, pages, args.page_interval, pool, args.shard_size)
+            )
+            print(
+                f"{mode:>12} {elapsed:>8.2f} {p99 * 1000:>11.2f} {worst * 1000:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Build time, size and query latency of the product index behind /api/stats/slice.
+
+Builds the index over a synthetic catalog and times filtered queries against
+it, uncached, next to a full `calculate_stats` rescan for comparison.
+
+    python benchmarks/bench_slices.py --products 100000
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+from catalog import CATEGORIES, make_page
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+QUERIES = [
+    ("all products", [], [], None),
+    ("one category", [CATEGORIES[0]], [], None),
+    ("one brand", [], ["Brand 0"], None),
+    ("category+brand", [CATEGORIES[3]], ["Brand 1"], [0, 25, 50, 100]),
+    ("3 cats, 2 brands", CATEGORIES[:3], ["Brand 0", "Brand 2"], [0, 10, 20, 40, 80]),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    from utils.product_index import ProductIndexBuilder
+    from utils.products import project_page
+    from utils.stats import calculate_stats
+
+    pages = [
+        project_page(make_page(page, args.products, 100)["items"])
+        for page in range(1, -(-args.products // 100) + 1)
+    ]
+
+    start = time.perf_counter()
+    builder = ProductIndexBuilder()
+    for page in pages:
+        builder.add(page)
+    index = builder.finish()
+    build = time.perf_counter() - start
+    print(
+        f"index of {index.size} products: built in {build * 1000:.0f} ms, "
+        f"{index.nbytes / 1024 / 1024:.1f} MB"
+    )
+
+    start = time.perf_counter()
+    calculate_stats([product for page in pages for product in page])
+    print(f"full rescan: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    for name, categories, brands, buckets in QUERIES:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            result = index.stats(categories, brands, buckets)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        print(
+            f"{name:>18}: {result['total_products']:>7} products in "
+            f"{elapsed * 1000:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Time from process start to the first 200 from /api/stats.
+
+Starts a stub ODA API and runs the API under uvicorn once per scenario against
+an empty Redis database, so the stats have to come from a crawl or from the
+persisted snapshot file:
+
+    blocking    STATS_STARTUP_MODE=blocking (lifespan waits for the crawl)
+    background  STATS_STARTUP_MODE=background, no snapshot file yet
+    persisted   STATS_STARTUP_MODE=background with the file from the last run
+
+    python benchmarks/bench_startup.py --products 20000 --latency 0.1
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Tuple
+
+import httpx
+import redis
+
+from stub_oda import StubOdaServer
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+STATS_KEYS = ("product:stats", "product:stats:version", "product:stats:leader")
+
+
+def time_to_first_stats(env: dict, port: int, timeout: float) -> Tuple[float, bool]:
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        cwd=SRC,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + timeout
+        while time.perf_counter() < deadline:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/api/stats", timeout=1)
+                if response.status_code == 200:
+                    stale = response.json()["cache_info"].get("stale", False)
+                    return time.perf_counter() - start, stale
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.02)
+        raise TimeoutError("API did not serve stats in time")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--redis-host", default="localhost")
+    parser.add_argument("--redis-port", default="6379")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    client = redis.Redis(host=args.redis_host, port=int(args.redis_port))
+    snapshot_path = os.path.join(tempfile.mkdtemp(), "stats_snapshot.json")
+
+    with StubOdaServer(args.products, latency=args.latency) as stub:
+        for scenario, mode in (
+            ("blocking", "blocking"),
+            ("background", "background"),
+            ("persisted", "background"),
+        ):
+            client.delete(*STATS_KEYS)
+            if scenario != "persisted" and os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
+            # "persisted" reuses the file written by the "background" run
+            env = dict(
+                os.environ,
+                REDIS_HOST=args.redis_host,
+                REDIS_PORT=args.redis_port,
+                ODA_API_BASE_URL=stub.base_url,
+                ODA_RATE_LIMIT="0",
+                STATS_STARTUP_MODE=mode,
+                STATS_SNAPSHOT_PATH=snapshot_path,
+            )
+            seconds, stale = time_to_first_stats(env, args.port, args.timeout)
+            print(f"{scenario:>10}: first stats after {seconds:.2f}s (stale={stale})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Fan-out latency of /api/stats/stream with many idle subscribers.
+
+Opens N SSE connections to a running API, then announces a new snapshot
+version through Redis and measures how long each stream takes to receive it.
+
+    python benchmarks/bench_stream.py http://localhost:8000 --streams 2000
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+import redis.asyncio as aioredis
+
+STATS_VERSION_KEY = "product:stats:version"
+STATS_CHANNEL = "product:stats:updates"
+
+
+async def subscriber(client: httpx.AsyncClient, url: str, connected, received: list):
+    async with client.stream("GET", f"{url}/api/stats/stream") as response:
+        connected.release()
+        async for line in response.aiter_lines():
+            if line.startswith("event: stats"):
+                received.append(time.perf_counter())
+
+
+async def run(url: str, redis_url: str, streams: int, timeout: float):
+    received = []
+    connected = asyncio.Semaphore(0)
+    limits = httpx.Limits(max_connections=streams + 10)
+    async with httpx.AsyncClient(limits=limits, timeout=None) as client:
+        tasks = [
+            asyncio.create_task(subscriber(client, url, connected, received))
+            for _ in range(streams)
+        ]
+        for _ in range(streams):
+            await connected.acquire()
+        await asyncio.sleep(1)  # Let the initial snapshots arrive
+        received.clear()
+
+        redis = aioredis.Redis.from_url(redis_url)
+        version = await redis.incr(STATS_VERSION_KEY)
+        start = time.perf_counter()
+        await redis.publish(STATS_CHANNEL, version)
+        await redis.aclose()
+
+        deadline = start + timeout
+        while len(received) < streams and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    latencies = sorted(t - start for t in received)
+    if not latencies:
+        print(f"0/{streams} streams received the update")
+        return
+    print(
+        f"{len(latencies)}/{streams} streams received version {version}: "
+        f"p50={latencies[len(latencies) // 2] * 1000:.1f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms "
+        f"max={latencies[-1] * 1000:.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("url")
+    parser.add_argument("--redis-url", default="redis://localhost:6379")
+    parser.add_argument("--streams", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.redis_url, args.streams, args.timeout))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Deterministic synthetic ODA catalog.
+
+Products are generated on demand from their index, so a catalog of any size
+costs no memory until a page of it is requested.
+"""
+
+import random
+
+BRANDS = [f"Brand {i}" for i in range(400)] + ["", None]
+CATEGORIES = [f"Category {i}" for i in range(120)]
+
+
+def make_product(
+    index: int, seed: int = 0, revision: int = 0, lean: bool = False
+) -> dict:
+    """Build the ODA search item for product `index`.
+
+    Bumping `revision` reprices a product, which lets callers simulate churn.
+    `lean` drops the fields the stats never read, for large in-memory catalogs.
+    """
+    rng = random.Random(index * 7919 + seed)
+    price = round(rng.lognormvariate(3.8, 0.9) * (1 + revision * 0.05), 2)
+    brand = BRANDS[min(int(rng.paretovariate(1.2)) - 1, len(BRANDS) - 1)]
+    classifiers = [
+        {"id": c, "name": CATEGORIES[c]}
+        for c in rng.sample(range(len(CATEGORIES)), rng.randint(1, 3))
+    ]
+    if lean:
+        return {
+            "type": "product",
+            "id": index + 1,
+            "attributes": {
+                "id": index + 1,
+                "brand": brand,
+                "gross_price": f"{price:.2f}",
+                "client_classifiers": classifiers,
+            },
+        }
+
+    return {
+        "type": "product",
+        "id": index + 1,
+        "attributes": {
+            "id": index + 1,
+            "full_name": f"Product {index + 1}",
+            "name": f"Product {index + 1}",
+            "brand": brand,
+            "gross_price": f"{price:.2f}",
+            "currency": "NOK",
+            "client_classifiers": classifiers,
+            "front_url": f"https://oda.com/no/products/{index + 1}/",
+            "images": [
+                {
+                    "thumbnail": {"url": f"https://img.example/{index + 1}/t.jpg"},
+                    "large": {"url": f"https://img.example/{index + 1}/l.jpg"},
+                }
+            ],
+        },
+    }
+
+
+def make_page(
+    page: int, total_products: int, page_size: int, seed: int = 0, revision: int = 0
+) -> dict:
+    """Build one `/search/mixed/` response page (1-based)."""
+    start = (page - 1) * page_size
+    end = min(start + page_size, total_products)
+    return {
+        "attributes": {
+            "page": page,
+            "items": max(0, end - start),
+            "has_more_items": end < total_products,
+        },
+        "items": [make_product(i, seed, revision) for i in range(start, end)],
+    }
+
+
+def make_catalog(total_products: int, seed: int = 0, lean: bool = False) -> list:
+    return [make_product(i, seed, lean=lean) for i in range(total_products)]
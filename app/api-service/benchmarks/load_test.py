@@ -0,0 +1,81 @@
+"""Concurrent load test for an API endpoint.
+
+Reports requests/sec and latency percentiles; run it against two builds to
+compare them.
+
+    python benchmarks/load_test.py http://localhost:8000/api/stats -c 50 -n 5000
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+
+
+def percentile(sorted_values, q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def load_test(url: str, concurrency: int, total: int, headers: dict) -> dict:
+    latencies = []
+    statuses = Counter()
+    remaining = total
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                response = await client.get(url, headers=headers)
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            name: round(percentile(latencies, q) * 1000, 2)
+            for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+        },
+        "statuses": {str(k): v for k, v in statuses.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("url")
+    parser.add_argument("-c", "--concurrency", type=int, default=50)
+    parser.add_argument("-n", "--requests", type=int, default=5000)
+    parser.add_argument(
+        "-H", "--header", action="append", default=[], help="Name: value"
+    )
+    args = parser.parse_args()
+
+    headers = dict(h.split(":", 1) for h in args.header)
+    headers = {k.strip(): v.strip() for k, v in headers.items()}
+    result = asyncio.run(load_test(args.url, args.concurrency, args.requests, headers))
+    latency = result["latency_ms"]
+    print(
+        f"{result['requests']} requests in {result['seconds']}s "
+        f"({result['rps']} req/s) p50={latency['p50']}ms p95={latency['p95']}ms "
+        f"p99={latency['p99']}ms statuses={result['statuses']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Local stub of the ODA `/search/mixed/` endpoint for benchmarks.
+
+Run standalone with `python stub_oda.py --products 20000` or start it in a
+background thread through `StubOdaServer`.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Optional
+from urllib.parse import parse_qs, urlparse
+
+from catalog import make_page, make_product
+
+SEARCH_PATH = "/api/v1/search/mixed/"
+
+
+class StubOdaServer:
+    """Serves a synthetic catalog with configurable latency and failures.
+
+    Each request sleeps `latency` plus up to `jitter` seconds, drawn at random.
+    Requests for `failing_pages` always answer 503, right away.
+
+    `end_mode` picks how pagination terminates: "422" answers pages past the
+    end with HTTP 422, "flag" sets `has_more_items=false` on the last page.
+
+    `reprice`, `remove` and `add` mutate individual products, for tests of
+    change detection; bumping `revision` reprices the whole catalog.
+
+    Pages carry an ETag of their body and `If-None-Match` is answered with
+    304 when it still matches; `not_modified` counts those responses.
+    """
+
+    def __init__(
+        self,
+        total_products: int = 10_000,
+        page_size: int = 100,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        failing_pages: Iterable[int] = (),
+        end_mode: str = "422",
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = 0,
+    ):
+        self.total_products = total_products
+        self.page_size = page_size
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.failing_pages = set(failing_pages)
+        self.end_mode = end_mode
+        self.seed = seed
+        self.revision = 0
+        self.requests = 0
+        self.not_modified = 0
+        # Product indices in catalog order and per-product revisions, once
+        # individual products have been mutated
+        self.order = None
+        self.revisions = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    @property
+    def last_page(self) -> int:
+        return max(1, -(-self.total_products // self.page_size))
+
+    def reprice(self, *indices: int):
+        """Bump the revision of the products at these catalog positions."""
+        order = self._order()
+        for i in indices:
+            product = order[i]
+            self.revisions[product] = self.revisions.get(product, self.revision) + 1
+
+    def remove(self, *indices: int):
+        """Drop the products at these catalog positions."""
+        order = self._order()
+        for i in sorted(indices, reverse=True):
+            del order[i]
+        self.total_products = len(order)
+
+    def add(self, count: int = 1):
+        """Append `count` new products to the end of the catalog."""
+        order = self._order()
+        start = max(order, default=-1) + 1
+        order.extend(range(start, start + count))
+        self.total_products = len(order)
+
+    def _order(self) -> list:
+        if self.order is None:
+            self.order = list(range(self.total_products))
+        return self.order
+
+    def page_body(self, page: int):
+        """Return (status, body) for a search page."""
+        if page > self.last_page:
+            return 422, {"detail": "Page out of range"}
+
+        if self.order is None:
+            data = make_page(
+                page, self.total_products, self.page_size, self.seed, self.revision
+            )
+        else:
+            start = (page - 1) * self.page_size
+            products = self.order[start : start + self.page_size]
+            data = {
+                "attributes": {
+                    "page": page,
+                    "items": len(products),
+                    "has_more_items": start + len(products) < self.total_products,
+                },
+                "items": [
+                    make_product(i, self.seed, self.revisions.get(i, self.revision))
+                    for i in products
+                ],
+            }
+        if self.end_mode == "422":
+            # ODA keeps claiming more items; the 422 is the only end signal
+            data["attributes"]["has_more_items"] = True
+        return 200, data
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != SEARCH_PATH:
+                    return self._send(404, {"detail": "Not found"})
+
+                with stub._lock:
+                    stub.requests += 1
+
+                page = int(parse_qs(url.query).get("page", ["1"])[0])
+                if page in stub.failing_pages:
+                    return self._send(503, {"detail": "Injected failure"})
+                if stub.latency or stub.jitter:
+                    time.sleep(stub.latency + random.uniform(0, stub.jitter))
+                if stub.error_rate and random.random() < stub.error_rate:
+                    return self._send(503, {"detail": "Injected failure"})
+
+                status, body = stub.page_body(page)
+                payload = json.dumps(body).encode()
+                etag = f'"{hashlib.blake2b(payload, digest_size=8).hexdigest()}"'
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    with stub._lock:
+                        stub.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self._send(status, body, etag if status == 200 else None)
+
+            def _send(self, status: int, body: dict, etag: Optional[str] = None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubOdaServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--end-mode", choices=["422", "flag"], default="422")
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+
+    server = StubOdaServer(
+        total_products=args.products,
+        page_size=args.page_size,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        end_mode=args.end_mode,
+        port=args.port,
+    )
+    print(f"Stub ODA API listening on {server.base_url}")
+    server._httpd.serve_forever()
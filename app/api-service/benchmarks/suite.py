@@ -0,0 +1,343 @@
+"""End-to-end benchmark suite with machine-readable results.
+
+Runs against the stub ODA server and synthetic catalogs, so nothing leaves
+the machine:
+
+    refresh      one full refresh (crawl, aggregation and product index) per
+                 catalog size, against the stub with the given page size,
+                 latency, error rate and end-of-pagination mode
+    aggregation  products/s of the python, numpy and incremental engines over
+                 already projected records
+    memory       peak RSS of a streaming refresh, in a fresh process
+    endpoint     req/s and latency percentiles of /api/stats and a filtered
+                 /api/stats/slice, served by uvicorn (needs a Redis; the
+                 service's keys in database 0 are overwritten)
+
+Results are written as JSON. `--compare` checks them against an earlier run
+and exits with status 1 when a metric regressed by more than `--tolerance`.
+
+    python benchmarks/suite.py --sizes 10000 100000 --output results.json
+    python benchmarks/suite.py --sizes 10000 100000 --compare results.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from catalog import make_catalog
+from load_test import load_test
+from stub_oda import StubOdaServer
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+BENCHMARKS = Path(__file__).resolve().parent
+sys.path.insert(0, str(SRC))
+
+SCENARIOS = ["refresh", "aggregation", "memory", "endpoint"]
+
+# Whether each metric is better when lower; anything else is not compared
+LOWER_IS_BETTER = {
+    "seconds": True,
+    "peak_rss_mb": True,
+    "p50_ms": True,
+    "p95_ms": True,
+    "p99_ms": True,
+    "products_per_second": False,
+    "rps": False,
+}
+
+
+def refresh_scenario(args, size: int) -> Dict:
+    from services import oda
+    from services.page_tracker import page_tracker
+    from tasks.stats import refresh_stats
+
+    with StubOdaServer(
+        total_products=size,
+        page_size=args.page_size,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        end_mode=args.end_mode,
+    ) as stub:
+        oda.ODA_API_SEARCH_BASE_URL = f"{stub.base_url}/search/mixed/"
+        oda.ODA_RATE_LIMIT = 0
+        page_tracker.reset()
+
+        start = time.perf_counter()
+        result = asyncio.run(refresh_stats())
+        elapsed = time.perf_counter() - start
+
+    return {
+        "seconds": round(elapsed, 3),
+        "products_per_second": round(size / elapsed),
+        "products": result.stats.total_products,
+        "requests": stub.requests,
+    }
+
+
+def aggregation_scenario(args, size: int) -> List[Dict]:
+    from utils.columnar import calculate_stats_columnar
+    from utils.products import project_page
+    from utils.stats import IncrementalStatsAggregator, calculate_stats
+
+    records = project_page(make_catalog(size, lean=True))
+
+    def incremental(records):
+        aggregator = IncrementalStatsAggregator()
+        aggregator.begin()
+        aggregator.add(records)
+        return aggregator.finish()
+
+    results = []
+    for engine, calculate in (
+        ("python", calculate_stats),
+        ("numpy", calculate_stats_columnar),
+        ("incremental", incremental),
+    ):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            calculate(records)
+            best = min(best, time.perf_counter() - start)
+        results.append(
+            {
+                "params": {"engine": engine},
+                "metrics": {
+                    "seconds": round(best, 4),
+                    "products_per_second": round(size / best),
+                },
+            }
+        )
+    return results
+
+
+def memory_scenario(args, size: int) -> Dict:
+    output = subprocess.run(
+        [sys.executable, str(BENCHMARKS / "bench_memory.py"), "--child", "incremental"]
+        + ["--products", str(size), "--page-size", str(args.page_size)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    return {
+        "seconds": float(output[2]),
+        "baseline_rss_mb": float(output[3]),
+        "peak_rss_mb": float(output[4]),
+    }
+
+
+def endpoint_scenario(args, size: int) -> List[Dict]:
+    import redis
+
+    try:
+        redis.Redis(host=args.redis_host, port=int(args.redis_port)).ping()
+    except redis.ConnectionError:
+        return [{"skipped": f"Redis not available at {args.redis_host}"}]
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    with StubOdaServer(
+        total_products=size, page_size=args.page_size, latency=0
+    ) as stub:
+        env = dict(
+            os.environ,
+            REDIS_HOST=args.redis_host,
+            REDIS_PORT=args.redis_port,
+            ODA_API_BASE_URL=stub.base_url,
+            ODA_RATE_LIMIT="0",
+            STATS_STARTUP_MODE="blocking",
+            STATS_SNAPSHOT_PATH="",
+        )
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+            cwd=SRC,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            wait_for_stats(base_url, args.timeout)
+            results = []
+            for path in ("/api/stats", "/api/stats/slice?brand=Brand%201"):
+                result = asyncio.run(
+                    load_test(
+                        base_url + path,
+                        args.concurrency,
+                        args.requests,
+                        {"Accept-Encoding": "gzip"},
+                    )
+                )
+                results.append(
+                    {
+                        "params": {"path": path, "concurrency": args.concurrency},
+                        "metrics": {
+                            "rps": result["rps"],
+                            **{
+                                f"{name}_ms": value
+                                for name, value in result["latency_ms"].items()
+                            },
+                            "errors": sum(
+                                count
+                                for status, count in result["statuses"].items()
+                                if status != "200"
+                            ),
+                        },
+                    }
+                )
+            return results
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def wait_for_stats(base_url: str, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(f"{base_url}/api/stats", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError("API did not serve stats in time")
+
+
+def environment() -> Dict:
+    from config import STATS_ENGINE
+    from utils.serialization import serializer
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCHMARKS,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "commit": commit or None,
+        "stats_engine": STATS_ENGINE,
+        "json_backend": serializer.name,
+    }
+
+
+def run_suite(args) -> Dict:
+    runners = {
+        "refresh": refresh_scenario,
+        "aggregation": aggregation_scenario,
+        "memory": memory_scenario,
+        "endpoint": endpoint_scenario,
+    }
+    results = []
+    for scenario in args.scenarios:
+        for size in args.sizes:
+            print(f"{scenario} ({size} products)...", file=sys.stderr)
+            outcome = runners[scenario](args, size)
+            for entry in outcome if isinstance(outcome, list) else [outcome]:
+                if "metrics" not in entry and "skipped" not in entry:
+                    entry = {"metrics": entry}
+                results.append(
+                    {
+                        "scenario": scenario,
+                        "params": {"products": size, **entry.get("params", {})},
+                        **{k: v for k, v in entry.items() if k != "params"},
+                    }
+                )
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(),
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "compare", "tolerance")
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Describe every metric that got worse by more than `tolerance`."""
+
+    def key(result: Dict) -> str:
+        return json.dumps([result["scenario"], result["params"]], sort_keys=True)
+
+    previous = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get(key(result))
+        if before is None or "metrics" not in before or "metrics" not in result:
+            continue
+        for metric, value in result["metrics"].items():
+            lower_is_better = LOWER_IS_BETTER.get(metric)
+            old = before["metrics"].get(metric)
+            if lower_is_better is None or not old or value is None:
+                continue
+            change = (value - old) / old
+            if (change if lower_is_better else -change) > tolerance:
+                regressions.append(
+                    f"{result['scenario']} {result['params']} {metric}: "
+                    f"{old} -> {value} ({change:+.1%})"
+                )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--end-mode", choices=["422", "flag"], default="422")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--redis-host", default="localhost")
+    parser.add_argument("--redis-port", default="6379")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", help="write the results to this file")
+    parser.add_argument("--compare", help="results of an earlier run to check against")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    results = run_suite(args)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,46 @@
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timedelta, timezone
-import json
+from typing import List, Optional
+import asyncio
 import logging
+import math
+import time
 
-from tasks.stats import CACHE_TTL
+from services import metrics
+from services.metrics import redis_operation_seconds, stats_cache_misses
+from services.oda import client_stats
+from services.page_store import page_store
+from services.page_tracker import page_tracker
+from services.profiler import get_profile, list_profiles, refresh_profiler
+from services.redis import scan_keys
+from services.refresh_scheduler import refresh_scheduler
+from services.revalidation import revalidator
+from services.stats_cache import (
+    ENCODINGS,
+    STATS_SKETCH_KEY,
+    StatsSnapshot,
+    stats_cache,
+)
+from services.stats_history import parse_fields, query_history
+from services.stats_index import stats_index
+from services.stats_stream import broadcaster
+from utils.serialization import serializer
+from utils.sketches import RELATIVE_ACCURACY, PriceSketch
+from utils.http import etag_matches, http_date, negotiate_encoding, parse_http_date
+from config import (
+    STATS_HISTORY_MAX_POINTS,
+    STATS_MAX_WAIT,
+    STATS_PRICE_HISTOGRAM_BINS,
+    STATS_PRICE_QUANTILES,
+    STATS_REVALIDATE_GUARD,
+    STATS_SLICE_MAX_BUCKETS,
+    STATS_STREAM_HEARTBEAT,
+    ODA_HTTP2,
+    ODA_POOL_MAX_CONNECTIONS,
+    ODA_POOL_MAX_KEEPALIVE,
+    ODA_KEEPALIVE_EXPIRY,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -14,10 +51,11 @@ router = APIRouter()
 async def health_check(request: Request):
     """Health check endpoint."""
     try:
-        if request.app.state.redis.ping():
+        if await request.app.state.redis.ping():
             return {
                 "status": "healthy",
                 "redis": "connected",
+                "role": "leader" if request.app.state.leader.is_leader else "follower",
                 "timestamp": datetime.now().isoformat(),
             }
     except Exception:
@@ -30,30 +68,62 @@ async def health_check(request: Request):
 
 
 @router.get("/api/stats")
-async def get_stats(request: Request):
-    cache_key = "product:stats"
+async def get_stats(request: Request, wait: float = Query(0, ge=0, le=STATS_MAX_WAIT)):
+    """The published stats; a missing or stale snapshot triggers one refresh.
+
+    A stale snapshot is served as is, flagged in cache_info. With `wait`,
+    the request first waits up to that many seconds for a fresh one.
+    """
     redis = request.app.state.redis
 
     try:
-        cached_data = redis.get(cache_key)
-        if not cached_data:
+        snapshot = await stats_cache.get(redis)
+        if snapshot is None or snapshot.is_stale(time.time()):
+            await revalidator.request(redis, snapshot)
+            if wait:
+                snapshot = await stats_cache.wait_for_update(redis, wait)
+        if snapshot is None:
+            stats_cache_misses.inc()
             logger.warning("Cache miss in /api/stats - waiting for background update")
             raise HTTPException(
                 status_code=503,
                 detail="Statistics are being calculated, please try again in a moment",
+                headers={"Retry-After": str(int(STATS_REVALIDATE_GUARD))},
             )
 
-        stats = json.loads(cached_data)
-        ttl = redis.ttl(cache_key)
-        now = datetime.now(timezone.utc)
-        next_update = now + timedelta(seconds=ttl - (CACHE_TTL - 30 * 60))
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"), ENCODINGS)
+        headers = {
+            "ETag": snapshot.etag_for(encoding),
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if snapshot.last_modified:
+            headers["Last-Modified"] = http_date(snapshot.last_modified)
+
+        if _not_modified(request, snapshot):
+            return Response(status_code=304, headers=headers)
 
-        stats["cache_info"] = {
+        now = time.time()
+        ttl = snapshot.ttl(now)
+        stale = snapshot.is_stale(now)
+        # A stale snapshot, or an overdue refresh, is being replaced right now
+        next_update_at = now
+        if not stale:
+            next_update_at = max(now, stats_cache.next_refresh_at or now + ttl)
+        next_update = datetime.fromtimestamp(next_update_at, timezone.utc)
+        cache_info = {
             "ttl_seconds": ttl,
             "next_update_at": next_update.isoformat(timespec="milliseconds"),
+            "stale": stale,
         }
 
-        return stats
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(
+            content=snapshot.render(cache_info, encoding),
+            media_type="application/json",
+            headers=headers,
+        )
 
     except HTTPException as http_exc:
         raise http_exc
@@ -62,27 +132,328 @@ async def get_stats(request: Request):
         raise HTTPException(status_code=500, detail="Error processing data")
 
 
+@router.get("/api/stats/stream")
+async def stream_stats(request: Request):
+    """Server-Sent Events stream that pushes every newly published snapshot.
+
+    The current snapshot is sent on connect unless the client already has it
+    (Last-Event-ID matches its version).
+    """
+    if broadcaster.full:
+        raise HTTPException(status_code=503, detail="Too many live stats streams")
+
+    queue = broadcaster.subscribe()
+    try:
+        snapshot = await stats_cache.get(request.app.state.redis)
+    except Exception:
+        broadcaster.unsubscribe(queue)
+        raise
+    if snapshot and request.headers.get("last-event-id") != str(snapshot.version):
+        broadcaster.offer(queue, snapshot)
+
+    async def events():
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    snapshot = await asyncio.wait_for(
+                        queue.get(), timeout=STATS_STREAM_HEARTBEAT
+                    )
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield snapshot.event
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/api/stats/slice")
+async def get_stats_slice(
+    category: List[str] = Query([]),
+    brand: List[str] = Query([]),
+    buckets: Optional[str] = None,
+):
+    """Stats for the products in any of `category` and any of `brand`.
+
+    Both filters can be repeated. `buckets` is a comma-separated list of
+    at most STATS_SLICE_MAX_BUCKETS ascending price boundaries, e.g.
+    `0,25,50,100`.
+    """
+    edges = None
+    if buckets:
+        try:
+            edges = [float(edge) for edge in buckets.split(",")]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="buckets must be numbers")
+        if not all(math.isfinite(edge) for edge in edges):
+            raise HTTPException(status_code=400, detail="buckets must be finite")
+        if len(edges) > STATS_SLICE_MAX_BUCKETS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"buckets can have at most {STATS_SLICE_MAX_BUCKETS} boundaries",
+            )
+        if len(edges) < 2 or any(low >= high for low, high in zip(edges, edges[1:])):
+            raise HTTPException(
+                status_code=400, detail="buckets must be at least two ascending numbers"
+            )
+
+    body = stats_index.query(category, brand, edges)
+    if body is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Product index is not available yet, please try again in a moment",
+        )
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/api/stats/prices")
+async def get_price_distribution(
+    request: Request,
+    quantiles: Optional[str] = None,
+    bins: int = Query(STATS_PRICE_HISTOGRAM_BINS, ge=1, le=1000),
+    max_price: Optional[float] = Query(None, alias="max", gt=0),
+):
+    """Price quantiles and histogram of the published snapshot, from its sketch.
+
+    `quantiles` is a comma-separated list between 0 and 1, e.g. `0.25,0.5,0.75`.
+    The histogram spans 0 to `max` (default: the 99th percentile, rounded up);
+    its last bin also holds every price above that.
+    """
+    selected = STATS_PRICE_QUANTILES
+    if quantiles:
+        try:
+            selected = [float(q) for q in quantiles.split(",")]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="quantiles must be numbers")
+        if not all(0 <= q <= 1 for q in selected):
+            raise HTTPException(
+                status_code=400, detail="quantiles must be between 0 and 1"
+            )
+
+    with redis_operation_seconds.time("sketch_load"):
+        data = await request.app.state.redis.get(STATS_SKETCH_KEY)
+    if data is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Price distribution is not available yet, please try again in a moment",
+        )
+
+    sketch = PriceSketch.from_dict(serializer.loads(data))
+    return Response(
+        content=serializer.dumps(
+            {
+                "total_priced": sketch.count,
+                "relative_accuracy": RELATIVE_ACCURACY,
+                "quantiles": sketch.quantiles(selected),
+                "histogram": sketch.histogram(bins, max_price),
+            }
+        ),
+        media_type="application/json",
+    )
+
+
+@router.get("/api/stats/history")
+async def get_stats_history(
+    request: Request,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    fields: Optional[str] = None,
+    points: int = Query(200, ge=1, le=STATS_HISTORY_MAX_POINTS),
+):
+    """Published snapshots over a time range, downsampled to at most `points`.
+
+    `from` defaults to 7 days before `to`, which defaults to now. `fields` is a
+    comma-separated subset of the stats fields.
+    """
+    try:
+        selected = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    end = _aware(end) if end else datetime.now(timezone.utc)
+    start = _aware(start) if start else end - timedelta(days=7)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+
+    try:
+        with redis_operation_seconds.time("history_query"):
+            history = await query_history(
+                request.app.state.redis,
+                start.timestamp(),
+                end.timestamp(),
+                selected,
+                points,
+            )
+    except Exception as e:
+        logger.error(f"Error reading stats history: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error reading stats history")
+
+    return Response(
+        content=serializer.dumps(
+            {"from": start.isoformat(), "to": end.isoformat(), **history}
+        ),
+        media_type="application/json",
+    )
+
+
+def _aware(value: datetime) -> datetime:
+    """Treat naive datetimes as UTC."""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _not_modified(request: Request, snapshot: StatsSnapshot) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since when no ETag was sent."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, snapshot.etags())
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and snapshot.last_modified:
+        since = parse_http_date(if_modified_since)
+        if since is None:
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return int(snapshot.last_modified.timestamp()) <= int(since.timestamp())
+
+    return False
+
+
+@router.get("/metrics")
+async def get_metrics(request: Request):
+    """Prometheus metrics of this process."""
+    metrics.refresh_leader.set(int(request.app.state.leader.is_leader))
+    return Response(
+        content=metrics.registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@metrics.registry.collector
+def _collect_service_metrics():
+    now = time.time()
+    snapshot = stats_cache.snapshot
+    metrics.stats_snapshot_age_seconds.set(
+        round(now - snapshot.last_modified.timestamp(), 3)
+        if snapshot is not None and snapshot.last_modified
+        else None
+    )
+    metrics.stats_snapshot_stale.set(
+        int(snapshot.is_stale(now)) if snapshot is not None else None
+    )
+    metrics.stats_snapshot_version.set(
+        snapshot.version if snapshot is not None else None
+    )
+
+    metrics.refresh_interval_seconds.set(refresh_scheduler.interval)
+    metrics.refresh_crawls_saved.set(int(refresh_scheduler.crawls_saved))
+    metrics.refresh_consecutive_failures.set(refresh_scheduler.failures)
+
+    for outcome, count in revalidator.stats.items():
+        metrics.stats_revalidations.set(count, outcome)
+    for event, count in page_tracker.stats.items():
+        metrics.oda_change_detection.set(count, event)
+    metrics.oda_connections.set(client_stats.new_connections, "new")
+    metrics.oda_connections.set(client_stats.reused_connections, "reused")
+
+
 @router.get("/debug/redis")
-async def debug_redis(request: Request):
-    """Debug endpoint to check Redis connection and cached keys."""
+async def debug_redis(
+    request: Request,
+    cursor: int = Query(0, ge=0),
+    match: str = "*",
+    count: int = Query(100, ge=1, le=1000),
+):
+    """Debug endpoint to check Redis connection and cached keys.
+
+    Keys are listed a page at a time with SCAN; pass `next_cursor` back as
+    `cursor` until it is 0.
+    """
     redis = request.app.state.redis
 
     try:
-        keys = redis.keys("*")
-        debug_info = {
-            "redis_connected": redis.ping(),
-            "cached_keys": keys,
+        next_cursor, key_details = await scan_keys(redis, cursor, match, count)
+        return {
+            "redis_connected": await redis.ping(),
+            "cached_keys": list(key_details),
+            "key_details": key_details,
+            "cursor": cursor,
+            "next_cursor": next_cursor,
             "timestamp": datetime.now().isoformat(),
         }
-
-        key_details = {}
-        for key in keys:
-            ttl = redis.ttl(key)
-            value_type = redis.type(key)
-            key_details[key] = {"ttl": ttl, "type": value_type}
-        debug_info["key_details"] = key_details
-
-        return debug_info
     except Exception as e:
         logger.error(f"Redis debug error: {str(e)}")
         raise HTTPException(status_code=500, detail="Redis connection error")
+
+
+@router.post("/debug/profile")
+async def request_profile(request: Request, now: bool = False):
+    """Profile the next refresh; with `now`, run it immediately if this
+    process is the refresh leader."""
+    await refresh_profiler.request(request.app.state.redis)
+    started = now and request.app.state.leader.is_leader
+    if started:
+        refresh_scheduler.schedule(0)
+    return {
+        "requested": True,
+        "refresh_started": started,
+        "next_refresh_at": stats_cache.next_refresh_at,
+    }
+
+
+@router.get("/debug/profile")
+async def debug_profiles(request: Request):
+    """Stored refresh profiles, newest first, with their hottest functions."""
+    return {
+        "profiles": await list_profiles(request.app.state.redis),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+@router.get("/debug/profile/{profile_id}")
+async def debug_profile(request: Request, profile_id: str):
+    """Collapsed stacks of one profile, for flamegraph.pl or speedscope."""
+    profile = await get_profile(request.app.state.redis, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(content=profile["stacks"], media_type="text/plain")
+
+
+@router.get("/debug/oda")
+async def debug_oda():
+    """Debug endpoint exposing ODA client pool settings, request counters,
+    change detection counters and the stored crawls."""
+    return {
+        "client": {
+            "http2": ODA_HTTP2,
+            "max_connections": ODA_POOL_MAX_CONNECTIONS,
+            "max_keepalive_connections": ODA_POOL_MAX_KEEPALIVE,
+            "keepalive_expiry": ODA_KEEPALIVE_EXPIRY,
+        },
+        "stats": client_stats.snapshot(),
+        "change_detection": {
+            **page_tracker.stats,
+            "tracked_pages": page_tracker.last_page,
+            "last_full_crawl_at": page_tracker.full_crawl_at or None,
+        },
+        "page_store": await page_store.info(),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+@router.get("/debug/scheduler")
+async def debug_scheduler(request: Request):
+    """Debug endpoint exposing the adaptive refresh schedule."""
+    return {
+        "role": "leader" if request.app.state.leader.is_leader else "follower",
+        "scheduler": refresh_scheduler.snapshot(),
+        "revalidation": revalidator.stats,
+        "next_refresh_at": stats_cache.next_refresh_at,
+        "timestamp": datetime.now().isoformat(),
+    }
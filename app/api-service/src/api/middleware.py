@@ -0,0 +1,46 @@
+import time
+
+from services.metrics import http_request_seconds
+
+
+class MetricsMiddleware:
+    """Observes the latency of every HTTP request, labelled by route template.
+
+    Timing stops when the response headers are sent, so long-lived streams
+    count as fast as their first byte. Requests matching no route share the
+    "unmatched" label to keep the series bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        started = False
+
+        def observe(status: int):
+            route = scope.get("route")
+            http_request_seconds.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status),
+            )
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            # The server error middleware outside this one answers with a 500
+            if not started:
+                observe(500)
+            raise
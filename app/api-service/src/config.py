@@ -4,4 +4,111 @@ CACHE_TTL = 3600  # 1 hour
 API_PORT = int(os.getenv("FASTAPI_PORT", "8000"))
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
 ODA_API_BASE_URL = os.getenv("ODA_API_BASE_URL", "https://oda.com/api/v1")
+
+# ODA crawler
+ODA_CRAWL_CONCURRENCY = int(os.getenv("ODA_CRAWL_CONCURRENCY", "4"))
+ODA_RATE_LIMIT = float(
+    os.getenv("ODA_RATE_LIMIT", "5")
+)  # requests per second, 0 disables
+ODA_RATE_BURST = int(os.getenv("ODA_RATE_BURST", "4"))
+ODA_MAX_RETRIES = int(os.getenv("ODA_MAX_RETRIES", "3"))
+
+# ODA HTTP client
+ODA_HTTP2 = os.getenv("ODA_HTTP2", "false").lower() in ("1", "true", "yes")
+ODA_POOL_MAX_CONNECTIONS = int(os.getenv("ODA_POOL_MAX_CONNECTIONS", "10"))
+ODA_POOL_MAX_KEEPALIVE = int(os.getenv("ODA_POOL_MAX_KEEPALIVE", "10"))
+ODA_KEEPALIVE_EXPIRY = float(os.getenv("ODA_KEEPALIVE_EXPIRY", "30"))
+ODA_CONNECT_TIMEOUT = float(os.getenv("ODA_CONNECT_TIMEOUT", "5"))
+ODA_READ_TIMEOUT = float(os.getenv("ODA_READ_TIMEOUT", "15"))
+
+# Stats engine: "incremental" (diff-based), "python", "numpy" or "sharded"
+# (process pool)
+STATS_ENGINE = os.getenv("STATS_ENGINE", "incremental")
+
+# Worker processes of the "sharded" stats engine (0: one per CPU) and the
+# number of products aggregated per shard
+STATS_WORKERS = int(os.getenv("STATS_WORKERS", "0"))
+STATS_SHARD_SIZE = int(os.getenv("STATS_SHARD_SIZE", "50000"))
+
+# Price distribution in /api/stats: the reported quantiles and the number of
+# histogram bins (the last one open-ended above the 99th percentile)
+STATS_PRICE_QUANTILES = tuple(
+    float(q) for q in os.getenv("STATS_PRICE_QUANTILES", "0.5,0.9,0.99").split(",")
+)
+STATS_PRICE_HISTOGRAM_BINS = int(os.getenv("STATS_PRICE_HISTOGRAM_BINS", "20"))
+
+# Stale-while-revalidate: seconds a snapshot stays in Redis past CACHE_TTL,
+# served flagged as stale; the shortest time (seconds) between refreshes
+# requested for a stale snapshot across all replicas; and the longest
+# `/api/stats?wait=` a client may ask for
+STATS_STALE_TTL = int(os.getenv("STATS_STALE_TTL", "86400"))
+STATS_REVALIDATE_GUARD = float(os.getenv("STATS_REVALIDATE_GUARD", "30"))
+STATS_MAX_WAIT = float(os.getenv("STATS_MAX_WAIT", "30"))
+
+# Seconds between checks for a snapshot published by another process
+STATS_CACHE_CHECK_INTERVAL = float(os.getenv("STATS_CACHE_CHECK_INTERVAL", "5"))
+
+# Live stats stream (Server-Sent Events)
+STATS_STREAM_MAX_SUBSCRIBERS = int(os.getenv("STATS_STREAM_MAX_SUBSCRIBERS", "5000"))
+STATS_STREAM_HEARTBEAT = float(os.getenv("STATS_STREAM_HEARTBEAT", "15"))
+
+# Seconds a refresh leader lease lasts without renewal
+REFRESH_LEASE_TTL = float(os.getenv("REFRESH_LEASE_TTL", "30"))
+
+# Startup: "background" serves the last snapshot and crawls in the background,
+# "blocking" waits for the initial crawl before accepting traffic
+STATS_STARTUP_MODE = os.getenv("STATS_STARTUP_MODE", "background")
+# Durable copy of the latest snapshot, empty to disable
+STATS_SNAPSHOT_PATH = os.getenv("STATS_SNAPSHOT_PATH", "/app/data/stats_snapshot.json")
+
+# Stats history: days of snapshots kept, and the most points one query returns
+STATS_HISTORY_RETENTION_DAYS = float(os.getenv("STATS_HISTORY_RETENTION_DAYS", "365"))
+STATS_HISTORY_MAX_POINTS = int(os.getenv("STATS_HISTORY_MAX_POINTS", "1000"))
+
+# Filtered stats (/api/stats/slice): memoized query results, and the most
+# price bucket boundaries one query may ask for
+STATS_SLICE_CACHE_SIZE = int(os.getenv("STATS_SLICE_CACHE_SIZE", "256"))
+STATS_SLICE_MAX_BUCKETS = int(os.getenv("STATS_SLICE_MAX_BUCKETS", "50"))
+
+# JSON backend: "auto" (msgspec, then orjson, then stdlib) or one of those names
+JSON_BACKEND = os.getenv("JSON_BACKEND", "auto")
+# Format of values written to Redis: 1 is plain JSON, which every release
+# reads; switch to 2 once every replica runs a release that reads it
+STATS_VALUE_FORMAT = int(os.getenv("STATS_VALUE_FORMAT", "1"))
+
+# Adaptive refresh schedule: the interval (seconds) halves when more than
+# REFRESH_CHANGE_HIGH of the catalog changed and grows when at most
+# REFRESH_CHANGE_LOW did; failures back off from REFRESH_BACKOFF_BASE
+REFRESH_MIN_INTERVAL = float(os.getenv("REFRESH_MIN_INTERVAL", "300"))
+REFRESH_MAX_INTERVAL = float(os.getenv("REFRESH_MAX_INTERVAL", "1800"))
+REFRESH_CHANGE_HIGH = float(os.getenv("REFRESH_CHANGE_HIGH", "0.01"))
+REFRESH_CHANGE_LOW = float(os.getenv("REFRESH_CHANGE_LOW", "0.001"))
+REFRESH_BACKOFF_BASE = float(os.getenv("REFRESH_BACKOFF_BASE", "30"))
+
+# Change detection: random pages probed (besides the first and last) before
+# each refresh, the longest time (seconds) between full crawls (0 always
+# crawls everything) and the share of pages above which a partial crawl
+# becomes a full one
+ODA_PROBE_PAGES = int(os.getenv("ODA_PROBE_PAGES", "3"))
+ODA_FULL_CRAWL_INTERVAL = float(os.getenv("ODA_FULL_CRAWL_INTERVAL", "21600"))
+ODA_PROBE_MAX_REFETCH = float(os.getenv("ODA_PROBE_MAX_REFETCH", "0.5"))
+
+# On-disk store of the raw ODA pages of each crawl, for replay and conditional
+# refetches; empty to disable. Complete crawls kept, and their zlib level
+ODA_PAGE_STORE_PATH = os.getenv("ODA_PAGE_STORE_PATH", "")
+ODA_PAGE_STORE_MAX_CRAWLS = int(os.getenv("ODA_PAGE_STORE_MAX_CRAWLS", "3"))
+ODA_PAGE_STORE_COMPRESSION = int(os.getenv("ODA_PAGE_STORE_COMPRESSION", "6"))
+
+# Record per-request latency for /metrics (the other metrics are always kept)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Refresh profiling: refreshes to profile after startup (more can be requested
+# through POST /debug/profile), seconds between stack samples, and the bounds
+# on each stored profile's collapsed stacks and on the number of profiles kept
+PROFILE_REFRESHES = int(os.getenv("PROFILE_REFRESHES", "0"))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_BYTES", "262144"))
+PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", "10"))
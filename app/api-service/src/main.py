@@ -5,10 +5,22 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from services.redis import init_redis_client
-from tasks.stats import periodic_stats_update, initial_stats_update, background_tasks
+from services.redis import init_redis_client, close_redis_client
+from services.oda import init_oda_client, close_oda_client
+from services.leader import LeaderElection
+from services.revalidation import listen_for_revalidation
+from services.stats_cache import stats_cache
+from services.stats_stream import listen_for_snapshots
+from tasks.stats import (
+    background_tasks,
+    initial_stats_update,
+    periodic_stats_update,
+    refresh_in_progress,
+)
+from utils.sharded import shutdown_stats_pool
 from api.endpoints import router as api_router
-from config import API_PORT
+from api.middleware import MetricsMiddleware
+from config import API_PORT, METRICS_ENABLED, STATS_STARTUP_MODE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -25,14 +37,45 @@ async def lifespan(app: FastAPI):
         app.state.redis = await init_redis_client()
         logger.info(f"Redis client initialization completed: {app.state.redis}")
 
-        logger.info("Starting initial stats update...")
-        await initial_stats_update(app.state.redis)
-        logger.info("Initial stats update completed")
-
-        # Start periodic update task
-        task = asyncio.create_task(periodic_stats_update(app.state.redis))
-        background_tasks.add(task)
-        task.add_done_callback(background_tasks.discard)
+        # Shared ODA client, reused across pages and refreshes
+        app.state.oda_client = await init_oda_client()
+
+        # Relay published snapshots to live stats streams
+        listener = asyncio.create_task(listen_for_snapshots(app.state.redis))
+        background_tasks.add(listener)
+        listener.add_done_callback(background_tasks.discard)
+
+        # Only the lease holder crawls ODA; the rest serve its snapshots
+        app.state.leader = LeaderElection(app.state.redis)
+        await app.state.leader.campaign()
+
+        # Serve the last known snapshot until a fresh one is published
+        stats_cache.load_persisted()
+
+        if STATS_STARTUP_MODE == "blocking":
+            logger.info("Starting initial stats update...")
+            await initial_stats_update(app.state.redis, app.state.leader)
+            logger.info("Initial stats update completed")
+
+        background = [
+            app.state.leader.run(),
+            periodic_stats_update(app.state.redis, app.state.leader),
+            # Refreshes requested by replicas serving a stale snapshot
+            listen_for_revalidation(
+                app.state.redis,
+                lambda: app.state.leader.is_leader,
+                refresh_in_progress,
+            ),
+        ]
+        if STATS_STARTUP_MODE != "blocking":
+            logger.info("Initial stats update will run in the background")
+            background.append(initial_stats_update(app.state.redis, app.state.leader))
+
+        # Start leader election and update tasks
+        for coro in background:
+            task = asyncio.create_task(coro)
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
 
         logger.info("Background tasks started successfully")
 
@@ -50,8 +93,11 @@ async def lifespan(app: FastAPI):
     if background_tasks:
         await asyncio.gather(*background_tasks, return_exceptions=True)
 
+    await close_oda_client()
+    shutdown_stats_pool()
+
     if app.state.redis:
-        app.state.redis.close()
+        await close_redis_client(app.state.redis)
 
     logger.info("Cleanup completed")
 
@@ -60,6 +106,9 @@ app = FastAPI(lifespan=lifespan)
 # Include the API routes
 app.include_router(api_router)
 
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -7,10 +7,22 @@ class BrandInfo(BaseModel):
     count: int
 
 
+class PriceBin(BaseModel):
+    low: float
+    # None for the open-ended last bin
+    high: Optional[float]
+    count: int
+
+
 class ProductStats(BaseModel):
     total_products: int
     average_price: float
     price_ranges: Dict[str, int]
     top_brands: List[BrandInfo]
     categories: Dict[str, int]
+    # Estimated from a price sketch; empty in snapshots published before them
+    price_quantiles: Dict[str, float] = {}
+    price_histogram: List[PriceBin] = []
+    distinct_brands: int = 0
+    distinct_categories: int = 0
     last_updated: str
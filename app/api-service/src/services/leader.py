@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+from config import REFRESH_LEASE_TTL
+
+logger = logging.getLogger(__name__)
+
+LEADER_KEY = "product:stats:leader"
+
+# Extend the lease only if we still own it
+RENEW_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Delete the lease only if we still own it
+RELEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class LeaderElection:
+    """Redis lease that elects the single process allowed to refresh stats.
+
+    The holder renews the lease every `ttl / 3` seconds. If it dies, the lease
+    expires after `ttl` seconds and the next follower to try takes over.
+    Followers keep serving whatever snapshot the leader published.
+    """
+
+    def __init__(self, redis, key: str = LEADER_KEY, ttl: float = REFRESH_LEASE_TTL):
+        self.redis = redis
+        self.key = key
+        self.ttl = ttl
+        self.identity = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._renew = redis.register_script(RENEW_SCRIPT)
+        self._release = redis.register_script(RELEASE_SCRIPT)
+
+    async def campaign(self) -> bool:
+        """Acquire or renew the lease once; returns whether we are the leader."""
+        ttl_ms = int(self.ttl * 1000)
+        if self.is_leader:
+            held = bool(
+                await self._renew(keys=[self.key], args=[self.identity, ttl_ms])
+            )
+            if not held:
+                logger.warning(f"Lost refresh leadership ({self.identity})")
+        else:
+            held = bool(
+                await self.redis.set(self.key, self.identity, nx=True, px=ttl_ms)
+            )
+            if held:
+                logger.info(f"Acquired refresh leadership ({self.identity})")
+
+        self.is_leader = held
+        return held
+
+    async def run(self):
+        """Keep campaigning until cancelled, then hand the lease back."""
+        try:
+            while True:
+                try:
+                    await self.campaign()
+                except Exception as e:
+                    # Without Redis we cannot prove we still hold the lease
+                    logger.error(f"Leader election error: {str(e)}")
+                    self.is_leader = False
+                await asyncio.sleep(self.ttl / 3)
+        except asyncio.CancelledError:
+            await self.release()
+            raise
+
+    async def release(self):
+        if self.is_leader:
+            self.is_leader = False
+            try:
+                await self._release(keys=[self.key], args=[self.identity])
+                logger.info(f"Released refresh leadership ({self.identity})")
+            except Exception as e:
+                logger.warning(f"Failed to release refresh leadership: {str(e)}")
@@ -0,0 +1,86 @@
+from utils.metrics import MetricsRegistry
+
+# Every metric the service exposes on /metrics. State that already lives
+# elsewhere (snapshot age, scheduler, change detection) is read at scrape time.
+registry = MetricsRegistry()
+
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds",
+    "Time until response headers are sent, by route",
+    ("method", "route", "status"),
+)
+stats_cache_misses = registry.counter(
+    "stats_cache_misses",
+    "/api/stats requests answered 503 because no snapshot was available",
+)
+stats_revalidations = registry.counter(
+    "stats_revalidations",
+    "Requests for a missing or stale snapshot, by outcome (requests, coalesced, triggered)",
+    ("outcome",),
+)
+
+oda_page_seconds = registry.histogram(
+    "oda_page_duration_seconds",
+    "ODA search page request latency, by HTTP status",
+    ("status",),
+)
+oda_page_retries = registry.counter(
+    "oda_page_retries", "ODA page requests retried after a failure"
+)
+
+stats_refreshes = registry.counter(
+    "stats_refreshes",
+    "Stats refreshes by outcome (published, unchanged, dropped, failed)",
+    ("outcome",),
+)
+stats_refresh_seconds = registry.histogram(
+    "stats_refresh_duration_seconds", "Wall time of a whole stats refresh"
+)
+stats_refresh_products = registry.gauge(
+    "stats_refresh_products", "Products read by the last completed refresh"
+)
+stats_aggregation_seconds = registry.histogram(
+    "stats_aggregation_seconds",
+    "Time spent aggregating stats and building the product index per refresh",
+)
+stats_serialization_seconds = registry.histogram(
+    "stats_serialization_seconds", "Time to encode a stats snapshot for Redis"
+)
+
+redis_operation_seconds = registry.histogram(
+    "redis_operation_duration_seconds",
+    "Redis round trips (pipelines count once), by operation",
+    ("operation",),
+)
+
+# Set from the state of other services when /metrics is scraped
+refresh_leader = registry.gauge(
+    "stats_refresh_leader", "1 while this process holds the refresh lease"
+)
+stats_snapshot_age_seconds = registry.gauge(
+    "stats_snapshot_age_seconds", "Seconds since the served snapshot was published"
+)
+stats_snapshot_stale = registry.gauge(
+    "stats_snapshot_stale", "1 while the served snapshot is past its TTL"
+)
+stats_snapshot_version = registry.gauge(
+    "stats_snapshot_version", "Version of the served snapshot"
+)
+refresh_interval_seconds = registry.gauge(
+    "stats_refresh_interval_seconds", "Current adaptive refresh interval"
+)
+refresh_crawls_saved = registry.gauge(
+    "stats_refresh_crawls_saved",
+    "Crawls a fixed schedule at the minimum interval would have run on top",
+)
+refresh_consecutive_failures = registry.gauge(
+    "stats_refresh_consecutive_failures", "Failed refreshes since the last success"
+)
+oda_change_detection = registry.counter(
+    "oda_change_detection",
+    "Change detection crawls, probes and pages fetched or reused, by event",
+    ("event",),
+)
+oda_connections = registry.counter(
+    "oda_connections", "ODA requests on a new or a reused connection", ("kind",)
+)
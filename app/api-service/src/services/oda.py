@@ -1,82 +1,346 @@
 import os
 import asyncio
+import time
+from collections import deque
 from datetime import datetime
-from typing import Optional, List
+from typing import AsyncIterator, Dict, Iterable, Optional, List
 import logging
 
 import httpx
-from config import ODA_API_BASE_URL
+from config import (
+    ODA_API_BASE_URL,
+    ODA_CRAWL_CONCURRENCY,
+    ODA_RATE_LIMIT,
+    ODA_RATE_BURST,
+    ODA_MAX_RETRIES,
+    ODA_HTTP2,
+    ODA_POOL_MAX_CONNECTIONS,
+    ODA_POOL_MAX_KEEPALIVE,
+    ODA_KEEPALIVE_EXPIRY,
+    ODA_CONNECT_TIMEOUT,
+    ODA_READ_TIMEOUT,
+)
+from services.metrics import oda_page_retries, oda_page_seconds
+from services.page_store import page_store
+from utils.rate_limit import TokenBucket
+from utils.products import ProductRecord
+from utils.serialization import SearchPage, serializer
 
 logger = logging.getLogger(__name__)
 
 # ODA API constants
 ODA_API_SEARCH_BASE_URL = f"{ODA_API_BASE_URL}/search/mixed/"
 
+oda_client: Optional[httpx.AsyncClient] = None
 
-async def fetch_oda_data(page: int) -> Optional[dict]:
-    """Fetch data from ODA API for a specific page."""
-    async with httpx.AsyncClient() as client:
+
+class OdaClientStats:
+    """Per-page latency and connection-reuse counters for the ODA client."""
+
+    def __init__(self, window: int = 500):
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._latencies = deque(maxlen=window)
+
+    def record(self, latency: float, new_connection: bool):
+        self.requests += 1
+        if new_connection:
+            self.new_connections += 1
+        else:
+            self.reused_connections += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        self._latencies.append(latency)
+
+    def snapshot(self) -> dict:
+        recent = sorted(self._latencies)
+
+        def percentile(q: float) -> Optional[float]:
+            if not recent:
+                return None
+            return round(recent[min(len(recent) - 1, int(q * len(recent)))] * 1000, 2)
+
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "connection_reuse_ratio": (
+                round(self.reused_connections / self.requests, 3)
+                if self.requests
+                else None
+            ),
+            "latency_ms": {
+                "avg": (
+                    round(self.total_latency / self.requests * 1000, 2)
+                    if self.requests
+                    else None
+                ),
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(self.max_latency * 1000, 2),
+            },
+        }
+
+
+client_stats = OdaClientStats()
+
+
+def create_oda_client() -> httpx.AsyncClient:
+    """Create a pooled keep-alive client for the ODA API."""
+    http2 = ODA_HTTP2
+    if http2:
         try:
-            params = {"q": "", "page": page}
-            response = await client.get(ODA_API_SEARCH_BASE_URL, params=params)
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning(
+                "ODA_HTTP2 is enabled but h2 is not installed, using HTTP/1.1"
+            )
+            http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=ODA_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=ODA_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=ODA_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(ODA_READ_TIMEOUT, connect=ODA_CONNECT_TIMEOUT),
+    )
 
-            # Log the response status
-            logger.info(
-                f"HTTP Request: GET {ODA_API_SEARCH_BASE_URL} page={page} Status: {response.status_code}"
+
+async def init_oda_client() -> httpx.AsyncClient:
+    """Create the app-scoped ODA client shared by every refresh."""
+    global oda_client
+    oda_client = create_oda_client()
+    logger.info(
+        f"ODA client initialized (max_connections={ODA_POOL_MAX_CONNECTIONS}, "
+        f"keepalive_expiry={ODA_KEEPALIVE_EXPIRY}s)"
+    )
+    return oda_client
+
+
+async def close_oda_client():
+    global oda_client
+    if oda_client is not None:
+        await oda_client.aclose()
+        oda_client = None
+        logger.info("ODA client closed")
+
+
+async def fetch_oda_data(client: httpx.AsyncClient, page: int) -> Optional[SearchPage]:
+    """Fetch data from ODA API for a specific page.
+
+    When the page store has the page from an earlier crawl, the request is
+    conditional and a 304 is answered from the stored body. Fetched pages
+    are recorded in the crawl the page store is recording, if any.
+    """
+    new_connection = False
+
+    async def trace(event_name: str, info: dict):
+        nonlocal new_connection
+        if event_name == "connection.connect_tcp.complete":
+            new_connection = True
+
+    try:
+        params = {"q": "", "page": page}
+        start = time.perf_counter()
+        try:
+            response = await client.get(
+                ODA_API_SEARCH_BASE_URL,
+                params=params,
+                headers=page_store.validators(page),
+                extensions={"trace": trace},
             )
+        except httpx.HTTPError:
+            oda_page_seconds.observe(time.perf_counter() - start, "error")
+            raise
+        latency = time.perf_counter() - start
+        client_stats.record(latency, new_connection)
+        oda_page_seconds.observe(latency, str(response.status_code))
 
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 422:
-                logger.info(f"Reached end of pagination at page {page}")
-                return None
-            else:
+        # Log the response status
+        logger.info(
+            f"HTTP Request: GET {ODA_API_SEARCH_BASE_URL} page={page} Status: {response.status_code}"
+        )
+
+        if response.status_code == 200:
+            await page_store.record(page, response.content, response.headers)
+            return serializer.decode_search_page(response.content)
+        elif response.status_code == 304:
+            body = await page_store.stored_body(page)
+            if body is None:
+                raise httpx.HTTPError(f"HTTP 304 for page {page} that is not stored")
+            await page_store.copy(page)
+            return serializer.decode_search_page(body)
+        elif response.status_code == 422:
+            logger.info(f"Reached end of pagination at page {page}")
+            return None
+        else:
+            logger.error(
+                f"Failed to fetch data for page {page}: {response.status_code}"
+            )
+            raise httpx.HTTPError(f"HTTP {response.status_code}")
+
+    except Exception as e:
+        logger.error(f"Error fetching page {page}: {str(e)}")
+        raise
+
+
+async def fetch_page_with_retries(
+    client: httpx.AsyncClient,
+    page: int,
+    rate_limiter: TokenBucket,
+    max_retries: int = ODA_MAX_RETRIES,
+) -> Optional[SearchPage]:
+    """Fetch a single page, retrying transient failures."""
+    for attempt in range(max_retries):
+        try:
+            await rate_limiter.acquire()
+            return await fetch_oda_data(client, page)
+        except Exception as e:
+            if attempt == max_retries - 1:
                 logger.error(
-                    f"Failed to fetch data for page {page}: {response.status_code}"
+                    f"Failed to fetch page {page} after {max_retries} attempts: {str(e)}"
                 )
-                raise httpx.HTTPError(f"HTTP {response.status_code}")
+                raise
+            logger.warning(f"Attempt {attempt + 1} failed for page {page}: {str(e)}")
+            oda_page_retries.inc()
+            await asyncio.sleep(1)  # Wait before retry
 
-        except Exception as e:
-            logger.error(f"Error fetching page {page}: {str(e)}")
-            raise
 
+async def iter_product_pages(
+    concurrency: Optional[int] = None,
+    start_page: int = 1,
+) -> AsyncIterator[List[ProductRecord]]:
+    """Yield the products of each ODA page, in page order, as they arrive.
 
-async def fetch_all_products() -> List[dict]:
-    """Fetch all products from ODA API."""
-    all_products = []
-    page = 1
-    max_retries = 3
+    Each page is projected into ProductRecords as soon as it is parsed; the
+    raw response is not kept.
+
+    Keeps up to `concurrency` page requests in flight, paced by a shared token
+    bucket. Pages are claimed in order; once a page signals the end of
+    pagination (422 or `has_more_items=false`), no later pages are claimed and
+    any that were already in flight are discarded. A page that fails after its
+    retries ends the crawl once it is next in order, unless it turns out to be
+    past the end. Workers never run more than `2 * concurrency` pages ahead of
+    the consumer, so memory is bounded by a few pages regardless of catalog
+    size.
+
+    Uses the app-scoped client when one is initialized, otherwise a client
+    that lives for the duration of this crawl. `start_page` resumes a crawl
+    part way through the catalog.
+    """
+    concurrency = max(1, concurrency or ODA_CRAWL_CONCURRENCY)
+    window = 2 * concurrency
+    rate_limiter = TokenBucket(ODA_RATE_LIMIT, ODA_RATE_BURST)
+
+    results: Dict[int, List[ProductRecord]] = {}
+    next_page = start_page  # Next page to claim
+    next_yield = start_page  # Next page to hand to the consumer
+    last_page: Optional[int] = None  # Last page that holds items
+    failures: Dict[int, BaseException] = {}
+    changed = asyncio.Condition()
+
+    def mark_end(page: int):
+        nonlocal last_page
+        last_page = page if last_page is None else min(last_page, page)
+
+    def exhausted() -> bool:
+        # Pages past the end, or past one that failed, are never needed
+        ends = [*failures, *([] if last_page is None else [last_page])]
+        return bool(ends) and next_page > min(ends)
+
+    async def worker():
+        nonlocal next_page
+        while True:
+            async with changed:
+                await changed.wait_for(
+                    lambda: exhausted() or next_page - next_yield < window
+                )
+                if exhausted():
+                    return
+                page = next_page
+                next_page += 1
 
-    while True:
-        for attempt in range(max_retries):
             try:
-                data = await fetch_oda_data(page)
+                data = await fetch_page_with_retries(client, page, rate_limiter)
+            except Exception as e:
+                async with changed:
+                    failures[page] = e
+                    changed.notify_all()
+                return
+
+            async with changed:
                 # Only None means end of pagination (422)
                 if data is None:
-                    logger.info(
-                        f"Finished fetching products. Total products: {len(all_products)}"
-                    )
-                    return all_products
+                    mark_end(page - 1)
+                else:
+                    results[page] = data.products
+                    if not data.has_more_items:
+                        logger.info(f"No more items flag received at page {page}")
+                        mark_end(page)
+                changed.notify_all()
 
-                products = [item for item in data["items"] if item["type"] == "product"]
-                all_products.extend(products)
+    client = oda_client or create_oda_client()
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        while True:
+            async with changed:
+                await changed.wait_for(
+                    lambda: next_yield in results
+                    or next_yield in failures
+                    or (last_page is not None and next_yield > last_page)
+                )
+                if last_page is not None and next_yield > last_page:
+                    break
+                if next_yield in failures:
+                    raise failures[next_yield]
+                products = results.pop(next_yield)
+                next_yield += 1
+                changed.notify_all()
 
-                if not data["attributes"]["has_more_items"]:
-                    logger.info("No more items flag received")
-                    return all_products
+            yield products
 
-                break  # Successful attempt, break retry loop
+        logger.info(f"Finished fetching products from {last_page} pages")
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        if client is not oda_client:
+            await client.aclose()
 
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    logger.error(
-                        f"Failed to fetch page {page} after {max_retries} attempts: {str(e)}"
-                    )
-                    raise
-                logger.warning(
-                    f"Attempt {attempt + 1} failed for page {page}: {str(e)}"
-                )
-                await asyncio.sleep(1)  # Wait before retry
 
-        page += 1
-        await asyncio.sleep(0.2)  # Be nice to the API
+async def fetch_pages(
+    pages: Iterable[int], concurrency: Optional[int] = None
+) -> Dict[int, Optional[SearchPage]]:
+    """Fetch specific pages concurrently; None marks a page past the end."""
+    semaphore = asyncio.Semaphore(max(1, concurrency or ODA_CRAWL_CONCURRENCY))
+    rate_limiter = TokenBucket(ODA_RATE_LIMIT, ODA_RATE_BURST)
+    client = oda_client or create_oda_client()
+
+    async def fetch(page: int) -> Optional[SearchPage]:
+        async with semaphore:
+            return await fetch_page_with_retries(client, page, rate_limiter)
+
+    pages = sorted(set(pages))
+    try:
+        results = await asyncio.gather(*(fetch(page) for page in pages))
+    finally:
+        if client is not oda_client:
+            await client.aclose()
+    return dict(zip(pages, results))
+
+
+async def fetch_all_products(
+    concurrency: Optional[int] = None,
+) -> List[ProductRecord]:
+    """Fetch all products from ODA API as compact records."""
+    all_products = []
+    async for products in iter_product_pages(concurrency):
+        all_products.extend(products)
+
+    logger.info(f"Finished fetching products. Total products: {len(all_products)}")
+    return all_products
@@ -0,0 +1,356 @@
+import asyncio
+import json
+import logging
+import mmap
+import os
+import shutil
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+from utils.products import ProductRecord
+from utils.serialization import serializer
+from config import (
+    ODA_PAGE_STORE_COMPRESSION,
+    ODA_PAGE_STORE_MAX_CRAWLS,
+    ODA_PAGE_STORE_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+# Per crawl directory: compressed page bodies back to back, and their index
+PAGES_FILE = "pages.bin"
+INDEX_FILE = "index.json"
+
+
+def new_crawl_id() -> str:
+    """Sortable id of a crawl: its start time in UTC."""
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+
+
+class CrawlWriter:
+    """Appends the compressed pages of one crawl to its record file.
+
+    Writes come from worker threads, so they are serialized by a lock.
+    """
+
+    def __init__(self, directory: Path, crawl_id: str):
+        self.crawl_id = crawl_id
+        self.directory = directory
+        self.started_at = time.time()
+        self.pages: Dict[int, Dict] = {}
+        directory.mkdir(parents=True)
+        self._file = open(directory / PAGES_FILE, "wb")
+        self._lock = threading.Lock()
+
+    def write(
+        self, page: int, blob: bytes, size: int, validators: Dict[str, str]
+    ) -> bool:
+        """Record the compressed body of a page; a later write of it wins.
+
+        Returns False if the crawl was already finished or aborted.
+        """
+        with self._lock:
+            if self._file.closed:
+                return False
+            offset = self._file.tell()
+            self._file.write(blob)
+            self.pages[page] = {
+                "offset": offset,
+                "length": len(blob),
+                "size": size,
+                **validators,
+            }
+        return True
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class PageStore:
+    """On-disk store of the raw ODA pages of recent crawls.
+
+    Each crawl gets a directory named by its crawl id, holding every page
+    body zlib-compressed back to back in one record file, plus an index of
+    page number -> offset, length and the response's ETag/Last-Modified.
+    The index is only written once the crawl completes, so an interrupted
+    crawl never looks complete; the newest `max_crawls` complete crawls are
+    kept. Pruning only ever removes complete crawls, so a crawl another
+    process is still recording into the same path (e.g. during a leader
+    handover) is left alone.
+
+    Pages reused from the previous crawl instead of refetched are copied
+    over from its record file, so every complete crawl holds the whole
+    catalog and can be replayed on its own. Its validators make refetches
+    conditional: a 304 is answered from the stored body. Filesystem work
+    runs in worker threads, off the event loop.
+    """
+
+    def __init__(
+        self,
+        path: str = ODA_PAGE_STORE_PATH,
+        max_crawls: int = ODA_PAGE_STORE_MAX_CRAWLS,
+        compression: int = ODA_PAGE_STORE_COMPRESSION,
+    ):
+        self.root = Path(path) if path else None
+        self.max_crawls = max_crawls
+        self.compression = compression
+        self.writer: Optional[CrawlWriter] = None
+        # Index of the newest complete crawl, loaded when a crawl begins
+        self._latest: Optional[Dict] = None
+        self._latest_loaded = False
+        self.stats = {
+            "pages_written": 0,
+            "pages_copied": 0,
+            "bytes_written": 0,
+            "not_modified": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.root is not None
+
+    @property
+    def latest(self) -> Optional[Dict]:
+        return self._latest
+
+    async def begin(self) -> Optional[str]:
+        """Start recording a new crawl, dropping any unfinished one."""
+        if not self.enabled:
+            return None
+        await self.abort()
+        if not self._latest_loaded:
+            self._latest = await asyncio.to_thread(self._load_latest)
+            self._latest_loaded = True
+        crawl_id = new_crawl_id()
+        self.writer = await asyncio.to_thread(
+            CrawlWriter, self.root / crawl_id, crawl_id
+        )
+        return crawl_id
+
+    async def record(self, page: int, body: bytes, headers: Mapping[str, str]):
+        """Store a fetched page body in the crawl being recorded, if any."""
+        writer = self.writer
+        if writer is None:
+            return
+        validators = {
+            name: headers[header]
+            for name, header in (("etag", "etag"), ("last_modified", "last-modified"))
+            if header in headers
+        }
+        length = await asyncio.to_thread(
+            self._compress_and_write, writer, page, body, validators
+        )
+        if length is not None:
+            self.stats["pages_written"] += 1
+            self.stats["bytes_written"] += length
+
+    async def copy(self, page: int):
+        """Copy a page the crawl reused from the newest complete crawl."""
+        writer, latest = self.writer, self.latest
+        if writer is None or page in writer.pages or latest is None:
+            return
+        entry = latest["pages"].get(str(page))
+        if entry is None:
+            return
+        copied = await asyncio.to_thread(
+            self._copy_blob, writer, page, latest["crawl_id"], entry
+        )
+        if copied:
+            self.stats["pages_copied"] += 1
+
+    async def reuse(self, page: int) -> Optional[List[ProductRecord]]:
+        """The products of a page of the newest complete crawl, for a crawl
+        that reuses it; the page is copied into the crawl being recorded.
+
+        Returns None if the page is not stored.
+        """
+        writer, latest = self.writer, self.latest
+        entry = latest["pages"].get(str(page)) if latest else None
+        if entry is None:
+            return None
+        products, copied = await asyncio.to_thread(
+            self._reuse_page, writer, page, latest["crawl_id"], entry
+        )
+        if copied:
+            self.stats["pages_copied"] += 1
+        return products
+
+    def validators(self, page: int) -> Dict[str, str]:
+        """Conditional request headers for a page from the newest complete crawl."""
+        latest = self.latest
+        entry = latest["pages"].get(str(page)) if latest else None
+        if entry is None:
+            return {}
+        headers = {}
+        if "etag" in entry:
+            headers["If-None-Match"] = entry["etag"]
+        if "last_modified" in entry:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    async def stored_body(self, page: int) -> Optional[bytes]:
+        """The body of a page in the newest complete crawl, for a 304."""
+        latest = self.latest
+        entry = latest["pages"].get(str(page)) if latest else None
+        if entry is None:
+            return None
+        blob = await asyncio.to_thread(self._read_blob, latest["crawl_id"], entry)
+        self.stats["not_modified"] += 1
+        return zlib.decompress(blob)
+
+    async def finish(self, last_page: int) -> Optional[str]:
+        """Complete the recorded crawl with pages 1..`last_page`.
+
+        A crawl missing any of those pages (e.g. reused ones the store never
+        saw) is dropped. Returns the crawl id if it was kept.
+        """
+        writer, self.writer = self.writer, None
+        if writer is None:
+            return None
+        index = await asyncio.to_thread(self._complete, writer, last_page)
+        if index is None:
+            return None
+        self._latest, self._latest_loaded = index, True
+        return writer.crawl_id
+
+    async def abort(self):
+        """Drop the crawl being recorded, if any."""
+        writer, self.writer = self.writer, None
+        if writer is not None:
+            await asyncio.to_thread(self._discard, writer)
+
+    def prune(self):
+        """Keep the newest `max_crawls` complete crawls; drop the older ones."""
+        for crawl_id in self.crawls()[: -max(1, self.max_crawls)]:
+            shutil.rmtree(self.root / crawl_id, ignore_errors=True)
+            logger.info(f"Pruned stored crawl {crawl_id}")
+
+    def crawls(self) -> List[str]:
+        """Ids of the complete crawls on disk, oldest first."""
+        if not self.enabled or not self.root.is_dir():
+            return []
+        return sorted(
+            directory.name
+            for directory in self.root.iterdir()
+            if (directory / INDEX_FILE).is_file()
+        )
+
+    def load_index(self, crawl_id: str) -> Dict:
+        return json.loads((self.root / crawl_id / INDEX_FILE).read_text())
+
+    def iter_pages(self, crawl_id: str) -> Iterator[Tuple[int, bytes]]:
+        """Yield (page, body) of a complete crawl in page order."""
+        index = self.load_index(crawl_id)
+        with open(self.root / crawl_id / PAGES_FILE, "rb") as f:
+            if not index["pages"]:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for page in range(1, index["last_page"] + 1):
+                    entry = index["pages"][str(page)]
+                    start = entry["offset"]
+                    yield page, zlib.decompress(data[start : start + entry["length"]])
+
+    def iter_records(self, crawl_id: str) -> Iterator[List[ProductRecord]]:
+        """The products of each page of a complete crawl, as a crawl yields them."""
+        for _, body in self.iter_pages(crawl_id):
+            yield serializer.decode_search_page(body).products
+
+    async def info(self) -> Dict:
+        crawls = await asyncio.to_thread(self._crawl_info)
+        return {
+            "enabled": self.enabled,
+            "recording": self.writer.crawl_id if self.writer else None,
+            "crawls": crawls,
+            **self.stats,
+        }
+
+    def _crawl_info(self) -> List[Dict]:
+        crawls = []
+        for crawl_id in self.crawls():
+            index = self.load_index(crawl_id)
+            crawls.append(
+                {
+                    "crawl_id": crawl_id,
+                    "pages": index["last_page"],
+                    "bytes": (self.root / crawl_id / PAGES_FILE).stat().st_size,
+                    "duration_seconds": round(
+                        index["finished_at"] - index["started_at"], 3
+                    ),
+                }
+            )
+        return crawls
+
+    def _load_latest(self) -> Optional[Dict]:
+        crawls = self.crawls()
+        return self.load_index(crawls[-1]) if crawls else None
+
+    def _complete(self, writer: CrawlWriter, last_page: int) -> Optional[Dict]:
+        """Write the index of a finished crawl, or drop it if it is incomplete."""
+        writer.close()
+
+        missing = [p for p in range(1, last_page + 1) if p not in writer.pages]
+        if missing:
+            logger.warning(
+                f"Crawl {writer.crawl_id} is missing {len(missing)} pages, not storing it"
+            )
+            shutil.rmtree(writer.directory, ignore_errors=True)
+            return None
+
+        index = {
+            "crawl_id": writer.crawl_id,
+            "started_at": writer.started_at,
+            "finished_at": time.time(),
+            "last_page": last_page,
+            "pages": {
+                str(page): writer.pages[page] for page in range(1, last_page + 1)
+            },
+        }
+        temp = writer.directory / f"{INDEX_FILE}.tmp"
+        temp.write_text(json.dumps(index))
+        os.replace(temp, writer.directory / INDEX_FILE)
+        logger.info(f"Stored crawl {writer.crawl_id} ({last_page} pages)")
+
+        self.prune()
+        return index
+
+    def _discard(self, writer: CrawlWriter):
+        writer.close()
+        shutil.rmtree(writer.directory, ignore_errors=True)
+
+    def _compress_and_write(
+        self, writer: CrawlWriter, page: int, body: bytes, validators: Dict[str, str]
+    ) -> Optional[int]:
+        blob = zlib.compress(body, self.compression)
+        return len(blob) if writer.write(page, blob, len(body), validators) else None
+
+    def _copy_blob(
+        self, writer: CrawlWriter, page: int, crawl_id: str, entry: Dict
+    ) -> bool:
+        blob = self._read_blob(crawl_id, entry)
+        validators = {k: v for k, v in entry.items() if k in ("etag", "last_modified")}
+        return writer.write(page, blob, entry["size"], validators)
+
+    def _reuse_page(
+        self, writer: Optional[CrawlWriter], page: int, crawl_id: str, entry: Dict
+    ) -> Tuple[List[ProductRecord], bool]:
+        blob = self._read_blob(crawl_id, entry)
+        copied = False
+        if writer is not None and page not in writer.pages:
+            validators = {
+                k: v for k, v in entry.items() if k in ("etag", "last_modified")
+            }
+            copied = writer.write(page, blob, entry["size"], validators)
+        return serializer.decode_search_page(zlib.decompress(blob)).products, copied
+
+    def _read_blob(self, crawl_id: str, entry: Dict) -> bytes:
+        with open(self.root / crawl_id / PAGES_FILE, "rb") as f:
+            f.seek(entry["offset"])
+            return f.read(entry["length"])
+
+
+page_store = PageStore()
@@ -0,0 +1,241 @@
+import hashlib
+import logging
+import random
+import time
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from services.oda import fetch_pages, iter_product_pages
+from services.page_store import page_store
+from utils.products import ProductRecord
+from utils.serialization import SearchPage
+from config import (
+    ODA_FULL_CRAWL_INTERVAL,
+    ODA_PROBE_MAX_REFETCH,
+    ODA_PROBE_PAGES,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def page_hash(products: List[ProductRecord]) -> str:
+    """Content hash of a page over the fields the stats read."""
+    content = repr([(p.id, p.price, p.brand, p.categories) for p in products])
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+class CrawlPlan:
+    """What a refresh has to fetch after probing.
+
+    `full` means crawl every page. Otherwise `pages` are refetched
+    individually and, with `tail_from`, everything from that page to the end
+    of pagination is crawled again. A plan with nothing to fetch means the
+    catalog is unchanged.
+    """
+
+    __slots__ = ("full", "pages", "tail_from", "probed")
+
+    def __init__(
+        self,
+        full: bool = False,
+        pages: Optional[Set[int]] = None,
+        tail_from: Optional[int] = None,
+        probed: Optional[Dict[int, Optional[SearchPage]]] = None,
+    ):
+        self.full = full
+        self.pages = pages or set()
+        self.tail_from = tail_from
+        self.probed = probed or {}
+
+    @property
+    def unchanged(self) -> bool:
+        return not self.full and not self.pages and self.tail_from is None
+
+
+class PageTracker:
+    """Remembers a hash of every page of the last crawl to avoid refetching
+    unchanged ones.
+
+    Before a refresh, the first page, the last two pages, the page after
+    them and `probe_pages` random pages are fetched and their hashes compared with
+    the last crawl. If all match, the refresh is skipped. Otherwise only the
+    ranges between the nearest matching probes around each mismatch are
+    refetched; a mismatch at the end of the catalog recrawls from there on,
+    which also covers growth and shrinkage.
+
+    Changes between matching probes go unnoticed until a probe or a full
+    crawl catches them. A full crawl runs at least every
+    `full_crawl_interval` seconds (0 disables probing), and whenever the
+    plan would refetch more than `max_refetch` of the pages anyway.
+
+    Each refresh, probes included, is recorded as one crawl in the page
+    store when it is enabled. Pages a partial crawl reuses are read back from
+    the stored last crawl, so only their hashes are kept in memory; without
+    a page store, any change means a full crawl.
+    """
+
+    def __init__(
+        self,
+        probe_pages: int = ODA_PROBE_PAGES,
+        full_crawl_interval: float = ODA_FULL_CRAWL_INTERVAL,
+        max_refetch: float = ODA_PROBE_MAX_REFETCH,
+    ):
+        self.probe_pages = probe_pages
+        self.full_crawl_interval = full_crawl_interval
+        self.max_refetch = max_refetch
+        self.hashes: Dict[int, str] = {}
+        # The stored crawl the hashes describe, to reuse pages from
+        self.crawl_id: Optional[str] = None
+        self.full_crawl_at = 0.0
+        self.stats = {
+            "full_crawls": 0,
+            "partial_crawls": 0,
+            "skipped_crawls": 0,
+            "probe_requests": 0,
+            "pages_fetched": 0,
+            "pages_reused": 0,
+        }
+
+    @property
+    def last_page(self) -> int:
+        return max(self.hashes, default=0)
+
+    @property
+    def can_reuse(self) -> bool:
+        """Whether the pages of the last crawl can be read from the page store."""
+        latest = page_store.latest
+        return (
+            self.crawl_id is not None
+            and latest is not None
+            and latest["crawl_id"] == self.crawl_id
+        )
+
+    def reset(self):
+        self.hashes, self.crawl_id = {}, None
+
+    async def plan(self) -> CrawlPlan:
+        """Probe ODA and decide what the next refresh has to fetch."""
+        await page_store.begin()
+        last = self.last_page
+        if not last or time.time() - self.full_crawl_at >= self.full_crawl_interval:
+            return CrawlPlan(full=True)
+
+        middle = range(2, last - 1)
+        probes = {1, last - 1, last, last + 1} - {0} | set(
+            random.sample(middle, min(self.probe_pages, len(middle)))
+        )
+        probed = await fetch_pages(probes)
+        self.stats["probe_requests"] += len(probed)
+
+        def matches(page: int) -> bool:
+            result = probed[page]
+            if page > last:
+                return result is None
+            return (
+                result is not None and page_hash(result.products) == self.hashes[page]
+            )
+
+        order = sorted(probes)
+        pages: Set[int] = set()
+        tail_from = None
+        for i, page in enumerate(order):
+            if matches(page):
+                continue
+            low = order[i - 1] + 1 if i else 1
+            if page >= last:
+                tail_from = low if tail_from is None else min(tail_from, low)
+            else:
+                pages.update(range(low, order[i + 1]))
+
+        if tail_from is not None:
+            pages = {page for page in pages if page < tail_from}
+        refetch = len(pages) + (last - tail_from + 1 if tail_from is not None else 0)
+        if refetch > self.max_refetch * last:
+            logger.info(f"Probes changed {refetch}/{last} pages, crawling everything")
+            return CrawlPlan(full=True)
+        if (pages or tail_from is not None) and not self.can_reuse:
+            logger.info("The last crawl is not stored to reuse, crawling everything")
+            return CrawlPlan(full=True)
+
+        return CrawlPlan(pages=pages, tail_from=tail_from, probed=probed)
+
+    async def crawl(self, plan: CrawlPlan) -> AsyncIterator[List[ProductRecord]]:
+        """Yield every page of the catalog in order, fetching only what `plan` says.
+
+        The tracked pages are only replaced once the crawl completes.
+        """
+        try:
+            async for products in self._crawl(plan):
+                yield products
+        except BaseException:
+            await page_store.abort()
+            raise
+
+    async def _crawl(self, plan: CrawlPlan) -> AsyncIterator[List[ProductRecord]]:
+        if plan.full:
+            hashes = {}
+            async for products in iter_product_pages():
+                hashes[len(hashes) + 1] = page_hash(products)
+                yield products
+            await self._finish(hashes)
+            self.full_crawl_at = time.time()
+            self.stats["full_crawls"] += 1
+            self.stats["pages_fetched"] += len(hashes)
+            return
+
+        fetched = {
+            page: plan.probed[page] for page in plan.pages if page in plan.probed
+        }
+        fetched.update(await fetch_pages(plan.pages - fetched.keys()))
+        if any(result is None for result in fetched.values()):
+            # The catalog shrank past a page we meant to reuse; start over
+            logger.info("Catalog ended earlier than expected, crawling everything")
+            async for products in self._crawl(CrawlPlan(full=True)):
+                yield products
+            return
+
+        end = plan.tail_from or self.last_page + 1
+        hashes = {}
+        for page in range(1, end):
+            if page in fetched:
+                products = fetched[page].products
+                hashes[page] = page_hash(products)
+            else:
+                products = await self._reuse(page)
+                hashes[page] = self.hashes[page]
+            yield products
+        if plan.tail_from is not None:
+            page = plan.tail_from
+            async for products in iter_product_pages(start_page=page):
+                hashes[page] = page_hash(products)
+                page += 1
+                yield products
+
+        refetched = len(fetched) + len(hashes) - end + 1
+        await self._finish(hashes)
+        self.stats["partial_crawls"] += 1
+        self.stats["pages_fetched"] += refetched
+        self.stats["pages_reused"] += len(hashes) - refetched
+        logger.info(f"Partial crawl refetched {refetched} of {len(hashes)} pages")
+
+    async def skip(self):
+        await page_store.abort()
+        self.stats["skipped_crawls"] += 1
+        self.stats["pages_reused"] += self.last_page
+
+    async def _reuse(self, page: int) -> List[ProductRecord]:
+        try:
+            products = await page_store.reuse(page)
+        except OSError:
+            products = None
+        if products is None:
+            # The stored crawl is gone (e.g. pruned by another process)
+            self.reset()
+            raise RuntimeError(f"Page {page} of the last crawl is no longer stored")
+        return products
+
+    async def _finish(self, hashes: Dict[int, str]):
+        self.hashes = hashes
+        self.crawl_id = await page_store.finish(len(hashes))
+
+
+page_tracker = PageTracker()
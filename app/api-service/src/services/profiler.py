@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from config import (
+    PROFILE_MAX_BYTES,
+    PROFILE_MAX_STORED,
+    PROFILE_REFRESHES,
+    PROFILE_SAMPLE_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Set by the admin endpoint on any replica, consumed by the refresh leader
+PROFILE_REQUEST_KEY = "product:stats:profile_request"
+# Newest first, trimmed to PROFILE_MAX_STORED entries
+PROFILES_KEY = "product:stats:profiles"
+
+MAX_DEPTH = 128
+
+
+class StackSampler:
+    """Samples the call stack of one thread from a background thread.
+
+    Stacks are aggregated in the collapsed format of flamegraph.pl and
+    speedscope: frames root first, separated by ";", with a sample count.
+    An event loop waiting on the network shows up as its selector frames.
+    Samples can only be taken when the sampled thread releases the GIL, so
+    intervals below the interpreter's switch interval (5 ms) add nothing.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.counts
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            frames = []
+            while frame is not None and len(frames) < MAX_DEPTH:
+                frames.append(_frame_label(frame))
+                frame = frame.f_back
+            if frames:
+                self.counts[";".join(reversed(frames))] += 1
+                self.samples += 1
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename.replace(os.sep, "/").rsplit("/", 2)
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({'/'.join(path[-2:])})"
+
+
+def collapse(counts: Counter, max_bytes: int = PROFILE_MAX_BYTES) -> str:
+    """Collapsed stacks, heaviest first, cut to `max_bytes`.
+
+    The dropped stacks are folded into a single "[truncated]" line so sample
+    totals stay correct.
+    """
+    lines, size, dropped = [], 0, 0
+    for stack, count in counts.most_common():
+        line = f"{stack} {count}"
+        if size + len(line) + 1 > max_bytes:
+            dropped += count
+            continue
+        lines.append(line)
+        size += len(line) + 1
+    if dropped:
+        lines.append(f"[truncated] {dropped}")
+    return "\n".join(lines)
+
+
+def top_functions(counts: Counter, limit: int = 20) -> List[Dict]:
+    """Functions by self samples (the leaf frame of each stack)."""
+    leaves: Counter = Counter()
+    for stack, count in counts.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    total = sum(leaves.values()) or 1
+    return [
+        {"function": function, "samples": count, "share": round(count / total, 3)}
+        for function, count in leaves.most_common(limit)
+    ]
+
+
+class RefreshProfiler:
+    """Profiles whole refresh cycles on request.
+
+    A profile is requested for the next `PROFILE_REFRESHES` refreshes at
+    startup, or for one refresh through `request()` from any replica. When
+    nothing is requested a refresh costs one Redis GETDEL and no sampling.
+    """
+
+    def __init__(self, pending: int = PROFILE_REFRESHES):
+        self.pending = pending
+
+    async def request(self, redis):
+        await redis.set(PROFILE_REQUEST_KEY, 1, ex=86400)
+
+    async def take_request(self, redis) -> bool:
+        if self.pending > 0:
+            self.pending -= 1
+            return True
+        return bool(await redis.getdel(PROFILE_REQUEST_KEY))
+
+    @asynccontextmanager
+    async def profile(self, redis, label: str = "refresh"):
+        """Sample the event loop thread for the duration of the block and
+        store the profile in Redis."""
+        sampler = StackSampler()
+        started_at = time.time()
+        outcome = "failed"
+        sampler.start()
+        try:
+            yield
+            outcome = "completed"
+        finally:
+            counts = sampler.stop()
+            profile = {
+                "id": uuid.uuid4().hex[:12],
+                "label": label,
+                "started_at": started_at,
+                "duration_seconds": round(time.time() - started_at, 3),
+                "outcome": outcome,
+                "interval_seconds": sampler.interval,
+                "samples": sampler.samples,
+                "top_functions": top_functions(counts),
+                "stacks": collapse(counts),
+            }
+            try:
+                await store_profile(redis, profile)
+                logger.info(
+                    f"Stored {label} profile {profile['id']} "
+                    f"({profile['samples']} samples)"
+                )
+            except Exception as e:
+                logger.error(f"Failed to store {label} profile: {str(e)}")
+
+
+async def store_profile(redis, profile: Dict):
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.lpush(PROFILES_KEY, json.dumps(profile))
+        pipe.ltrim(PROFILES_KEY, 0, PROFILE_MAX_STORED - 1)
+        await pipe.execute()
+
+
+async def list_profiles(redis) -> List[Dict]:
+    """Stored profiles, newest first, without their stacks."""
+    profiles = []
+    for raw in await redis.lrange(PROFILES_KEY, 0, -1):
+        profile = json.loads(raw)
+        profile.pop("stacks", None)
+        profiles.append(profile)
+    return profiles
+
+
+async def get_profile(redis, profile_id: str) -> Optional[Dict]:
+    for raw in await redis.lrange(PROFILES_KEY, 0, -1):
+        profile = json.loads(raw)
+        if profile["id"] == profile_id:
+            return profile
+    return None
+
+
+refresh_profiler = RefreshProfiler()
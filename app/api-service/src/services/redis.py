@@ -1,9 +1,13 @@
 import asyncio
 import os
 import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
 import redis
+import redis.asyncio as aioredis
 from fastapi import HTTPException
 
+from config import REDIS_MAX_CONNECTIONS, REDIS_POOL_TIMEOUT
+
 logger = logging.getLogger(__name__)
 
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
@@ -11,6 +15,15 @@ REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
 
 redis_client = None
 
+# SCAN calls one `scan_keys` page may make while looking for matching keys
+SCAN_MAX_CALLS = 10
+# Keys whose TTL, TYPE and MEMORY USAGE are fetched per pipeline
+KEY_DETAIL_BATCH = 100
+# Seconds before a failed pub/sub listener subscribes again, doubling with
+# every consecutive failure up to the maximum
+SUBSCRIBE_RETRY_DELAY = 1
+SUBSCRIBE_MAX_RETRY_DELAY = 30
+
 
 async def init_redis_client():
     logger.info("Starting Redis initialization...")
@@ -29,25 +42,38 @@ async def init_redis_client():
         raise
 
 
+def create_connection_pool() -> aioredis.BlockingConnectionPool:
+    """Connection pool shared by every request handler and background task.
+
+    When all connections are busy, callers wait up to REDIS_POOL_TIMEOUT
+    seconds for one to be released instead of opening more.
+    """
+    return aioredis.BlockingConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        decode_responses=True,
+        socket_timeout=5,
+        socket_connect_timeout=5,
+        retry_on_timeout=True,
+        health_check_interval=30,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+    )
+
+
 async def wait_for_redis(retries=5, delay=2):
     for attempt in range(retries):
+        pool = create_connection_pool()
         try:
             logger.info(
                 f"Attempt {attempt + 1} to connect to Redis at {REDIS_HOST}:{REDIS_PORT}"
             )
-            client = redis.Redis(
-                host=REDIS_HOST,
-                port=REDIS_PORT,
-                decode_responses=True,
-                socket_timeout=5,
-                socket_connect_timeout=5,
-                retry_on_timeout=True,
-                health_check_interval=30,
-            )
-            await asyncio.to_thread(client.ping)
+            client = aioredis.Redis(connection_pool=pool)
+            await client.ping()
             logger.info("Redis connection successful!")
             return client
         except redis.ConnectionError as e:
+            await pool.disconnect()
             logger.warning(f"Redis connection attempt {attempt + 1} failed: {e}")
             if attempt == retries - 1:
                 logger.error("All Redis connection attempts failed")
@@ -55,7 +81,85 @@ async def wait_for_redis(retries=5, delay=2):
             await asyncio.sleep(delay)
 
 
+async def close_redis_client(client: aioredis.Redis):
+    await client.aclose()
+    await client.connection_pool.disconnect()
+
+
 def get_redis_client(app):
     if not hasattr(app.state, "redis"):
         raise HTTPException(status_code=503, detail="Redis connection not available")
     return app.state.redis
+
+
+async def scan_keys(
+    client: aioredis.Redis, cursor: int = 0, match: str = "*", count: int = 100
+) -> Tuple[int, Dict[str, Dict]]:
+    """One page of keys matching `match`, with their TTL, type and memory use.
+
+    Uses SCAN, which never blocks the server the way KEYS does. `count` is a
+    hint: a page holds roughly that many keys, fewer when matches are sparse
+    (at most SCAN_MAX_CALLS calls are made per page). Returns the cursor to
+    continue from, 0 once the keyspace is exhausted. Keys modified during a
+    scan may be missed or repeated, as SCAN guarantees.
+    """
+    keys: Dict[str, Dict] = {}
+    for _ in range(SCAN_MAX_CALLS):
+        cursor, batch = await client.scan(cursor, match=match, count=count)
+        keys.update(dict.fromkeys(batch))
+        if cursor == 0 or len(keys) >= count:
+            break
+
+    names = list(keys)
+    for start in range(0, len(names), KEY_DETAIL_BATCH):
+        batch = names[start : start + KEY_DETAIL_BATCH]
+        async with client.pipeline(transaction=False) as pipe:
+            for key in batch:
+                pipe.ttl(key).type(key).memory_usage(key)
+            # MEMORY USAGE may be disabled on managed Redis
+            results = await pipe.execute(raise_on_error=False)
+        for i, key in enumerate(batch):
+            ttl, value_type, memory = (
+                None if isinstance(result, Exception) else result
+                for result in results[3 * i : 3 * i + 3]
+            )
+            keys[key] = {"ttl": ttl, "type": value_type, "memory_bytes": memory}
+    return cursor, keys
+
+
+async def listen_forever(
+    redis_instance,
+    channel: str,
+    handle: Callable[[Any], Awaitable[None]],
+    name: str,
+):
+    """Call `handle` with the data of every message on `channel`, for good.
+
+    Any failure, of Redis or of `handle`, is logged and the channel is
+    subscribed to again after a backoff, so neither a Redis restart nor one
+    bad message stops the listener.
+    """
+    delay = SUBSCRIBE_RETRY_DELAY
+    while True:
+        pubsub = redis_instance.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(channel)
+            logger.info(f"Listening for {name} on {channel}")
+
+            async for message in pubsub.listen():
+                await handle(message["data"])
+                delay = SUBSCRIBE_RETRY_DELAY
+
+        except asyncio.CancelledError:
+            logger.info(f"Listener for {name} cancelled")
+            raise
+        except (redis.ConnectionError, redis.TimeoutError) as e:
+            logger.warning(
+                f"Listener for {name} lost Redis: {e}, reconnecting in {delay}s"
+            )
+        except Exception:
+            logger.exception(f"Listener for {name} failed, resubscribing in {delay}s")
+        finally:
+            await pubsub.aclose()
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, SUBSCRIBE_MAX_RETRY_DELAY)
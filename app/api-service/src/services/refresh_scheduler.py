@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Optional
+
+from config import (
+    REFRESH_BACKOFF_BASE,
+    REFRESH_CHANGE_HIGH,
+    REFRESH_CHANGE_LOW,
+    REFRESH_MAX_INTERVAL,
+    REFRESH_MIN_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Epoch time of the leader's next refresh, for every replica's cache_info
+SCHEDULE_KEY = "product:stats:next_refresh"
+
+
+class RefreshScheduler:
+    """Decides when the next stats refresh runs.
+
+    After each successful refresh the interval adapts to how much of the
+    catalog changed: it is halved when more than REFRESH_CHANGE_HIGH of the
+    products changed and grows by half when at most REFRESH_CHANGE_LOW did,
+    always staying within [min_interval, max_interval]. Failures are retried
+    with jittered exponential backoff.
+
+    `crawls_saved` counts the refreshes a fixed schedule at `min_interval`
+    would have run on top of the ones that actually ran.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = REFRESH_MIN_INTERVAL,
+        max_interval: float = REFRESH_MAX_INTERVAL,
+        change_high: float = REFRESH_CHANGE_HIGH,
+        change_low: float = REFRESH_CHANGE_LOW,
+        backoff_base: float = REFRESH_BACKOFF_BASE,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.change_high = change_high
+        self.change_low = change_low
+        self.backoff_base = backoff_base
+
+        self.interval = self.max_interval
+        self.next_run_at: Optional[float] = None
+        self.failures = 0
+        self.crawls = 0
+        self.crawls_saved = 0.0
+        self.last_change_ratio: Optional[float] = None
+        self._rescheduled = asyncio.Event()
+
+    @property
+    def backing_off(self) -> bool:
+        """Whether a retry after failed refreshes is still pending."""
+        return (
+            self.failures > 0
+            and self.next_run_at is not None
+            and self.next_run_at > time.time()
+        )
+
+    def schedule(self, delay: float) -> float:
+        """Set the next run `delay` seconds from now and wake `wait()`."""
+        self.next_run_at = time.time() + max(0.0, delay)
+        self._rescheduled.set()
+        return self.next_run_at
+
+    async def wait(self):
+        """Sleep until the next run is due, following any rescheduling."""
+        while True:
+            self._rescheduled.clear()
+            if self.next_run_at is None:
+                await self._rescheduled.wait()
+                continue
+
+            delay = self.next_run_at - time.time()
+            if delay <= 0:
+                self.next_run_at = None
+                return
+            try:
+                await asyncio.wait_for(self._rescheduled.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def record_success(self, change_ratio: Optional[float]) -> float:
+        """Adapt the interval to the measured change ratio and schedule the next run.
+
+        `change_ratio` is the share of products added, changed or removed, or
+        None when it is unknown (e.g. the first refresh); the interval is then
+        left unchanged.
+        """
+        self.failures = 0
+        self.crawls += 1
+        self.last_change_ratio = change_ratio
+
+        if change_ratio is not None:
+            if change_ratio > self.change_high:
+                self.interval = max(self.min_interval, self.interval / 2)
+            elif change_ratio <= self.change_low:
+                self.interval = min(self.max_interval, self.interval * 1.5)
+
+        self.crawls_saved += self.interval / self.min_interval - 1
+        logger.info(
+            f"Next stats refresh in {self.interval:.0f}s (change ratio: {change_ratio})"
+        )
+        return self.schedule(self.interval)
+
+    def record_failure(self) -> float:
+        """Schedule a retry with jittered exponential backoff."""
+        self.failures += 1
+        ceiling = min(self.max_interval, self.backoff_base * 2 ** (self.failures - 1))
+        delay = random.uniform(ceiling / 2, ceiling)
+        logger.warning(
+            f"Stats refresh failed {self.failures} time(s) in a row, retrying in {delay:.0f}s"
+        )
+        return self.schedule(delay)
+
+    def snapshot(self) -> Dict:
+        return {
+            "interval_seconds": round(self.interval, 1),
+            "next_run_at": self.next_run_at,
+            "consecutive_failures": self.failures,
+            "last_change_ratio": self.last_change_ratio,
+            "crawls": self.crawls,
+            "crawls_saved": int(self.crawls_saved),
+        }
+
+
+refresh_scheduler = RefreshScheduler()
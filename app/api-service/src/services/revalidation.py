@@ -0,0 +1,91 @@
+import logging
+import time
+from typing import Callable, Optional
+
+import redis
+
+from services.redis import listen_forever
+from services.refresh_scheduler import refresh_scheduler
+from services.stats_cache import StatsSnapshot
+from config import STATS_REVALIDATE_GUARD
+
+logger = logging.getLogger(__name__)
+
+# Held for STATS_REVALIDATE_GUARD seconds by the request that asked for a refresh
+REVALIDATE_KEY = "product:stats:revalidate"
+# The refresh leader starts a refresh on every message
+REVALIDATE_CHANNEL = "product:stats:refresh_requests"
+
+
+class Revalidator:
+    """Turns requests for a missing or stale snapshot into one refresh.
+
+    Concurrent requests in a process share one attempt: the first sets a
+    local guard before its only await, so the rest return without touching
+    Redis until the guard expires or the snapshot changes. Across replicas,
+    `SET NX PX` on REVALIDATE_KEY lets one request per `guard` seconds
+    through, and only that one is published on REVALIDATE_CHANNEL for the
+    refresh leader. The guard also caps how often a failing ODA can be
+    retried on behalf of clients.
+    """
+
+    def __init__(self, guard: float = STATS_REVALIDATE_GUARD):
+        self.guard = guard
+        self._quiet_until = 0.0
+        # The snapshot the local guard was set for: version and fresh-until time
+        self._requested_for = None
+        self.stats = {"requests": 0, "coalesced": 0, "triggered": 0}
+
+    async def request(self, redis_instance, snapshot: Optional[StatsSnapshot]) -> bool:
+        """Ask for a refresh of `snapshot` (None when there is none yet).
+
+        Returns True if this call is the one that triggered it.
+        """
+        self.stats["requests"] += 1
+        now = time.monotonic()
+        requested_for = snapshot and (snapshot.version, snapshot.expires_at)
+        if now < self._quiet_until and requested_for == self._requested_for:
+            self.stats["coalesced"] += 1
+            return False
+        self._quiet_until = now + self.guard
+        self._requested_for = requested_for
+
+        try:
+            if not await redis_instance.set(
+                REVALIDATE_KEY, 1, nx=True, px=int(self.guard * 1000)
+            ):
+                self.stats["coalesced"] += 1
+                return False
+            await redis_instance.publish(REVALIDATE_CHANNEL, 1)
+        except redis.RedisError as e:
+            logger.error(f"Could not request a stats refresh: {str(e)}")
+            return False
+
+        self.stats["triggered"] += 1
+        logger.info("Stale stats requested, asked the refresh leader to refresh")
+        return True
+
+
+revalidator = Revalidator()
+
+
+async def listen_for_revalidation(
+    redis_instance, is_leader: Callable[[], bool], refreshing: Callable[[], bool]
+):
+    """Start a refresh on the leader whenever a replica asks for one.
+
+    A request that arrives while a refresh is running is already covered by
+    it, so it is dropped, and so is one that arrives while failed refreshes
+    are backing off: clients cannot make a failing ODA be retried sooner.
+    """
+
+    async def handle(_):
+        if not is_leader() or refreshing():
+            return
+        if refresh_scheduler.backing_off:
+            logger.info("Refresh requested during failure backoff, not retrying early")
+            return
+        logger.info("Refresh requested for a stale snapshot")
+        refresh_scheduler.schedule(0)
+
+    await listen_forever(redis_instance, REVALIDATE_CHANNEL, handle, "refresh requests")
@@ -0,0 +1,354 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import zlib
+from datetime import datetime
+from typing import Optional
+
+from services.metrics import redis_operation_seconds
+from services.refresh_scheduler import SCHEDULE_KEY
+from services.stats_index import stats_index
+from utils.serialization import serializer, unpack_value
+from config import STATS_CACHE_CHECK_INTERVAL, STATS_SNAPSHOT_PATH
+
+try:
+    import brotli
+except ImportError:  # brotli responses are only offered when it is installed
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = "product:stats"
+STATS_TEMP_KEY = "product:stats:temp"
+STATS_VERSION_KEY = "product:stats:version"
+# Epoch time until which the published snapshot is fresh; past it, and until
+# the keys expire STATS_STALE_TTL seconds later, it is served as stale
+STATS_FRESH_UNTIL_KEY = "product:stats:fresh_until"
+STATS_CHANNEL = "product:stats:updates"
+# Serialized price sketch of the published snapshot, for custom quantiles
+STATS_SKETCH_KEY = "product:stats:price_sketch"
+# Product index of the published snapshot, for replicas that did not crawl
+STATS_INDEX_KEY = "product:stats:index"
+
+# Content codings offered for the stats payload, in order of preference
+ENCODINGS = ("br", "gzip", "identity") if brotli else ("gzip", "identity")
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Final empty brotli meta-block (ISLAST=1, ISLASTEMPTY=1)
+BROTLI_END = b"\x03"
+
+
+def brotli_stored(data: bytes) -> bytes:
+    """`data` as uncompressed brotli meta-blocks (RFC 7932, section 9.2).
+
+    Appended to a flushed, hence byte-aligned, brotli stream, they extend it
+    without compressing anything again.
+    """
+    blocks = []
+    for start in range(0, len(data), 1 << 16):
+        chunk = data[start : start + (1 << 16)]
+        # ISLAST=0, 4 nibbles of MLEN-1, ISUNCOMPRESSED=1, zero-padded to 3 bytes
+        header = (len(chunk) - 1) << 3 | 1 << 19
+        blocks.append(header.to_bytes(3, "little") + chunk)
+    return b"".join(blocks)
+
+
+class StatsSnapshot:
+    """A published stats payload, kept as the exact bytes stored in Redis.
+
+    Per request only `cache_info` changes, and it is appended at the end of
+    the payload. The compressed variants are therefore compressed once per
+    snapshot up to that point: gzip requests finish a copy of the saved
+    compressor state, and brotli requests append `cache_info` to the flushed
+    stream as an uncompressed block.
+    """
+
+    __slots__ = (
+        "body",
+        "etag",
+        "version",
+        "expires_at",
+        "stale",
+        "last_modified",
+        "_gzip",
+        "_gzip_prefix",
+        "_br_prefix",
+        "_event",
+    )
+
+    def __init__(self, body: bytes, version: int, expires_at: float):
+        self.body = body
+        self.version = version
+        self.expires_at = expires_at
+        self.stale = False  # Set when Redis no longer holds this snapshot
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+        last_updated = serializer.loads(body).get("last_updated")
+        self.last_modified = (
+            datetime.fromisoformat(last_updated) if last_updated else None
+        )
+
+        self._gzip = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        self._gzip_prefix = self._gzip.compress(body[:-1]) + self._gzip.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+        self._br_prefix = None
+        self._event = None
+
+    def ttl(self, now: float) -> int:
+        return max(0, int(self.expires_at - now))
+
+    def is_stale(self, now: float) -> bool:
+        return self.stale or self.expires_at <= now
+
+    def etag_for(self, encoding: str) -> str:
+        """Strong ETag of the snapshot in the given content coding."""
+        if encoding == "identity":
+            return self.etag
+        return f'{self.etag[:-1]}-{encoding}"'
+
+    def etags(self):
+        return [self.etag_for(encoding) for encoding in ENCODINGS]
+
+    @property
+    def event(self) -> bytes:
+        """The snapshot as a Server-Sent Events frame, shared by all streams."""
+        if self._event is None:
+            self._event = b"id: %d\nevent: stats\ndata: %s\n\n" % (
+                self.version,
+                self.body,
+            )
+        return self._event
+
+    def render(self, cache_info: dict, encoding: str = "identity") -> bytes:
+        """Return the payload with `cache_info` spliced in, in `encoding`."""
+        tail = b', "cache_info": ' + serializer.dumps(cache_info) + b"}"
+
+        if encoding == "gzip":
+            compressor = self._gzip.copy()
+            return self._gzip_prefix + compressor.compress(tail) + compressor.flush()
+
+        if encoding == "br":
+            if self._br_prefix is None:
+                compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+                self._br_prefix = (
+                    compressor.process(self.body[:-1]) + compressor.flush()
+                )
+            return self._br_prefix + brotli_stored(tail) + BROTLI_END
+
+        return self.body[:-1] + tail
+
+
+class StatsCache:
+    """In-process copy of the latest stats snapshot.
+
+    The refresh task publishes into it directly. Snapshots published by other
+    processes are picked up by checking `product:stats:version` at most once
+    every STATS_CACHE_CHECK_INTERVAL seconds, so the hot path is a memory
+    lookup.
+
+    Every new snapshot is also written to STATS_SNAPSHOT_PATH. After a
+    restart, or when the Redis key is gone, the last good snapshot keeps
+    being served, flagged as stale. So is a snapshot past its fresh-until
+    time, which Redis keeps for another STATS_STALE_TTL seconds.
+    """
+
+    def __init__(
+        self,
+        check_interval: float = STATS_CACHE_CHECK_INTERVAL,
+        path: str = STATS_SNAPSHOT_PATH,
+    ):
+        self.check_interval = check_interval
+        self.path = path
+        self.snapshot: Optional[StatsSnapshot] = None
+        self._last_good: Optional[StatsSnapshot] = None
+        # When the leader runs its next refresh (epoch seconds), if known
+        self.next_refresh_at: Optional[float] = None
+        self._checked_at = 0.0
+        # Wall clock time of the last check, to tell when a snapshot expired
+        self._checked_time = 0.0
+        self._lock = asyncio.Lock()
+        self._updated = asyncio.Event()
+
+    def publish(self, body: bytes, version: int, ttl: float) -> StatsSnapshot:
+        self.snapshot = StatsSnapshot(body, version, time.time() + ttl)
+        self._last_good = self.snapshot
+        self._mark_checked()
+        self._persist(self.snapshot)
+        self._notify()
+        return self.snapshot
+
+    def _notify(self):
+        """Wake every request waiting for a fresh snapshot."""
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def wait_for_update(self, redis, timeout: float) -> Optional[StatsSnapshot]:
+        """Wait up to `timeout` seconds for a fresh snapshot.
+
+        Wakes on every snapshot published in this process, and checks Redis
+        as often as `get` would for one kept or published elsewhere. Returns
+        whatever snapshot is current by then, fresh or not.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            snapshot = await self.get(redis)
+            if snapshot is not None and not snapshot.is_stale(time.time()):
+                return snapshot
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return snapshot
+            try:
+                await asyncio.wait_for(
+                    self._updated.wait(), min(remaining, self.check_interval)
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def extend(self, ttl: int):
+        """The published snapshot was kept for another `ttl` seconds."""
+        if self.snapshot is not None and not self.snapshot.stale:
+            self.snapshot.expires_at = time.time() + ttl
+            self._notify()
+
+    def load_persisted(self) -> Optional[StatsSnapshot]:
+        """Load the snapshot saved by a previous run, flagged as stale."""
+        if not self.path:
+            return None
+
+        try:
+            with open(self.path, "rb") as f:
+                header = json.loads(f.readline())
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load persisted stats snapshot: {str(e)}")
+            return None
+
+        snapshot = StatsSnapshot(body, header["version"], expires_at=0)
+        snapshot.stale = True
+        self.snapshot = self._last_good = snapshot
+        logger.info(f"Loaded persisted stats snapshot version {snapshot.version}")
+        return snapshot
+
+    def _persist(self, snapshot: StatsSnapshot):
+        if not self.path:
+            return
+
+        temp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(temp_path, "wb") as f:
+                f.write(json.dumps({"version": snapshot.version}).encode() + b"\n")
+                f.write(snapshot.body)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not persist stats snapshot: {str(e)}")
+
+    def _fall_back(self):
+        """Redis has no snapshot: keep serving the last good one, flagged stale."""
+        if self._last_good is not None:
+            self._last_good.stale = True
+        self.snapshot = self._last_good
+        self._mark_checked()
+
+    def _mark_checked(self):
+        self._checked_at = time.monotonic()
+        self._checked_time = time.time()
+
+    def _fresh(self) -> bool:
+        """Whether the current state can be served without asking Redis."""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            return False
+        # A snapshot that expired since the last check is checked right away
+        snapshot = self.snapshot
+        return (
+            snapshot is None
+            or snapshot.stale
+            or snapshot.expires_at > time.time()
+            or snapshot.expires_at <= self._checked_time
+        )
+
+    async def get(self, redis) -> Optional[StatsSnapshot]:
+        if self._fresh():
+            return self.snapshot
+
+        # One coroutine revalidates; concurrent requests wait for its result
+        async with self._lock:
+            if not self._fresh():
+                await self._reload(redis)
+        return self.snapshot
+
+    async def get_version(self, redis, version: int) -> Optional[StatsSnapshot]:
+        """Return the snapshot, reloading it if it is older than `version`."""
+        if self.snapshot is not None and self.snapshot.version >= version:
+            return self.snapshot
+
+        async with self._lock:
+            if self.snapshot is None or self.snapshot.version < version:
+                await self._reload(redis)
+        return self.snapshot
+
+    async def _reload(self, redis):
+        async with redis.pipeline(transaction=False) as pipe:
+            with redis_operation_seconds.time("stats_check"):
+                version, ttl, next_refresh_at, fresh_until = (
+                    await pipe.get(STATS_VERSION_KEY)
+                    .ttl(STATS_KEY)
+                    .get(SCHEDULE_KEY)
+                    .get(STATS_FRESH_UNTIL_KEY)
+                    .execute()
+                )
+        version = int(version or 0)
+        if next_refresh_at is not None:
+            self.next_refresh_at = float(next_refresh_at)
+
+        if ttl < 0:
+            # -2: key missing, -1: no expiry (should not happen for published stats)
+            if ttl == -2:
+                self._fall_back()
+                return
+            ttl = 0
+        # Seconds until the snapshot goes stale; before STATS_FRESH_UNTIL_KEY
+        # existed, that was when the key expired
+        if fresh_until is not None:
+            ttl = float(fresh_until) - time.time()
+
+        if self.snapshot is not None and self.snapshot.version == version:
+            self.snapshot.expires_at = time.time() + ttl
+            self.snapshot.stale = False
+            self._mark_checked()
+            return
+
+        async with redis.pipeline(transaction=True) as pipe:
+            with redis_operation_seconds.time("stats_load"):
+                body, version, index = (
+                    await pipe.get(STATS_KEY)
+                    .get(STATS_VERSION_KEY)
+                    .get(STATS_INDEX_KEY)
+                    .execute()
+                )
+
+        if body is None:
+            self._fall_back()
+            return
+
+        try:
+            body = unpack_value(body)
+        except ValueError as e:
+            # Written by a newer release during a rollout
+            logger.warning(f"Cannot read stats snapshot from Redis: {str(e)}")
+            self._fall_back()
+            return
+
+        self.publish(body, int(version or 0), max(ttl, 0))
+        logger.info(f"Loaded stats snapshot version {self.snapshot.version} from Redis")
+        if index is not None:
+            await stats_index.load(index, self.snapshot.version)
+
+
+stats_cache = StatsCache()
@@ -0,0 +1,105 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+from models.stats import ProductStats
+from utils.serialization import pack_value, serializer, unpack_value
+from config import STATS_HISTORY_RETENTION_DAYS
+
+logger = logging.getLogger(__name__)
+
+# Sorted set of published snapshots, scored by publish time (epoch seconds)
+HISTORY_KEY = "product:stats:history"
+# The numeric series kept per snapshot; brands and categories are left out,
+# as they would make each member tens of times larger
+HISTORY_FIELDS = (
+    "total_products",
+    "average_price",
+    "price_ranges",
+    "price_quantiles",
+    "distinct_brands",
+    "distinct_categories",
+)
+
+
+def record_snapshot(pipe, stats: ProductStats, timestamp: float):
+    """Queue the commands that append a snapshot and apply retention on `pipe`.
+
+    Members are compact JSON of HISTORY_FIELDS in the versioned value format;
+    `last_updated` keeps them unique.
+    """
+    point = stats.model_dump(include={*HISTORY_FIELDS, "last_updated"})
+    member = pack_value(serializer.dumps(point))
+    pipe.zadd(HISTORY_KEY, {member: timestamp})
+    pipe.zremrangebyscore(
+        HISTORY_KEY, "-inf", f"({timestamp - STATS_HISTORY_RETENTION_DAYS * 86400}"
+    )
+
+
+def _point(member: str, timestamp: float, fields: Sequence[str]) -> Dict:
+    snapshot = serializer.loads(unpack_value(member))
+    point = {"timestamp": datetime.fromtimestamp(timestamp, timezone.utc).isoformat()}
+    for field in fields:
+        point[field] = snapshot.get(field)
+    return point
+
+
+async def query_history(
+    redis,
+    start: float,
+    end: float,
+    fields: Sequence[str] = HISTORY_FIELDS,
+    max_points: int = 200,
+) -> Dict:
+    """Snapshots published between `start` and `end`, at most `max_points`.
+
+    When the range holds more snapshots than that, it is split into
+    `max_points` equal buckets and the latest snapshot of each bucket is
+    returned. Every bucket is a single `ZRANGE ... BYSCORE REV LIMIT 0 1`, so
+    only the returned points are ever loaded, however long the range is.
+    """
+    total = await redis.zcount(HISTORY_KEY, start, end)
+
+    if total <= max_points:
+        rows = await redis.zrange(
+            HISTORY_KEY, start, end, byscore=True, withscores=True
+        )
+    else:
+        step = (end - start) / max_points
+        async with redis.pipeline(transaction=False) as pipe:
+            for i in range(max_points):
+                low = start + i * step
+                # Buckets are half-open, the last one includes `end`
+                high = end if i == max_points - 1 else f"({start + (i + 1) * step}"
+                pipe.zrange(
+                    HISTORY_KEY,
+                    high,
+                    low,
+                    desc=True,
+                    byscore=True,
+                    offset=0,
+                    num=1,
+                    withscores=True,
+                )
+            rows = [bucket[0] for bucket in await pipe.execute() if bucket]
+
+    return {
+        "total": total,
+        "downsampled": total > len(rows),
+        "points": [_point(member, timestamp, fields) for member, timestamp in rows],
+    }
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Parse a comma-separated `fields` parameter.
+
+    Raises ValueError on unknown fields.
+    """
+    if not fields:
+        return list(HISTORY_FIELDS)
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in HISTORY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return requested
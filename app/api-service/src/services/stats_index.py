@@ -0,0 +1,104 @@
+import asyncio
+import base64
+import binascii
+import logging
+import zipfile
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+from utils.columnar import NUMPY_AVAILABLE
+from utils.product_index import ProductIndex
+from utils.serialization import serializer
+from config import STATS_SLICE_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+SliceQuery = Tuple[Tuple[str, ...], Tuple[str, ...], Optional[Tuple[float, ...]]]
+
+
+def encode_index(index: ProductIndex) -> str:
+    """The index as a Redis value, for the other processes to load."""
+    return base64.b64encode(index.to_bytes()).decode()
+
+
+def decode_index(value: str) -> ProductIndex:
+    return ProductIndex.from_bytes(base64.b64decode(value))
+
+
+class StatsIndex:
+    """The product index of the latest published snapshot.
+
+    The process that crawled publishes the index it built; the others load
+    the copy stored in Redis next to the snapshot. Encoded slice results are
+    memoized in an LRU keyed by the normalized query and dropped whenever a
+    new index is published.
+    """
+
+    def __init__(self, max_entries: int = STATS_SLICE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.index: Optional[ProductIndex] = None
+        self.version: Optional[int] = None
+        self._results: "OrderedDict[SliceQuery, bytes]" = OrderedDict()
+
+    def publish(self, index: ProductIndex, version: int):
+        self.index = index
+        self.version = version
+        self._results.clear()
+        logger.info(
+            f"Product index version {version}: {index.size} products, "
+            f"{index.nbytes / 1024 / 1024:.1f} MB"
+        )
+
+    async def load(self, value: str, version: int):
+        """Publish the index stored in Redis with snapshot `version`, unless
+        this process already has it (or a newer one)."""
+        if not NUMPY_AVAILABLE or (self.version or 0) >= version:
+            return
+        try:
+            index = await asyncio.to_thread(decode_index, value)
+        except (ValueError, KeyError, binascii.Error, zipfile.BadZipFile) as e:
+            logger.warning(f"Cannot read product index from Redis: {str(e)}")
+            return
+        if (self.version or 0) < version:
+            self.publish(index, version)
+
+    def query(
+        self,
+        categories: Sequence[str] = (),
+        brands: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None,
+    ) -> Optional[bytes]:
+        """JSON body with the stats of one slice, or None if there is no index yet."""
+        if self.index is None:
+            return None
+
+        key = (
+            tuple(sorted(set(categories))),
+            tuple(sorted(set(brands))),
+            tuple(buckets) if buckets else None,
+        )
+        body = self._results.get(key)
+        if body is not None:
+            self._results.move_to_end(key)
+            return body
+
+        stats = self.index.stats(*key)
+        body = serializer.dumps(
+            {
+                "version": self.version,
+                "filters": {
+                    "category": list(key[0]),
+                    "brand": list(key[1]),
+                    "buckets": list(key[2]) if key[2] else None,
+                },
+                **stats,
+            }
+        )
+
+        self._results[key] = body
+        if len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+        return body
+
+
+stats_index = StatsIndex()
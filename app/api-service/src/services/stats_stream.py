@@ -0,0 +1,70 @@
+import asyncio
+import logging
+from typing import Set
+
+from config import STATS_STREAM_MAX_SUBSCRIBERS
+from services.redis import listen_forever
+from services.stats_cache import STATS_CHANNEL, StatsSnapshot, stats_cache
+
+logger = logging.getLogger(__name__)
+
+
+class StatsBroadcaster:
+    """Fans new snapshots out to the live stats streams of this process.
+
+    Each stream gets a single-slot queue. A stream that has not sent its
+    pending snapshot yet has it replaced by the newer one, so slow consumers
+    skip intermediate versions instead of buffering them.
+    """
+
+    def __init__(self, max_subscribers: int = STATS_STREAM_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_subscribers
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    @staticmethod
+    def offer(queue: asyncio.Queue, snapshot: StatsSnapshot):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(snapshot)
+
+    def broadcast(self, snapshot: StatsSnapshot):
+        for queue in self._subscribers:
+            self.offer(queue, snapshot)
+        logger.info(
+            f"Broadcast stats version {snapshot.version} to {len(self._subscribers)} streams"
+        )
+
+
+broadcaster = StatsBroadcaster()
+
+
+async def listen_for_snapshots(redis_instance):
+    """Relay snapshot notifications from Redis pub/sub to local streams.
+
+    Every replica subscribes, so a snapshot published by any of them reaches
+    all connected dashboards. Each notification costs one Redis read per
+    process, not per stream.
+    """
+
+    async def relay(version):
+        snapshot = await stats_cache.get_version(redis_instance, int(version))
+        if snapshot is not None:
+            broadcaster.broadcast(snapshot)
+
+    await listen_forever(redis_instance, STATS_CHANNEL, relay, "stats snapshots")
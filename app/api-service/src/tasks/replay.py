@@ -0,0 +1,101 @@
+"""Recompute stats from a crawl in the page store, without any network.
+
+Run from src/ with the service's environment (ODA_PAGE_STORE_PATH and
+STATS_ENGINE; REDIS_HOST and REDIS_PORT for --publish):
+
+    python -m tasks.replay --list
+    python -m tasks.replay [--crawl ID] [--publish]
+
+Prints the stats of the crawl (by default the newest) as JSON. `--publish`
+also publishes them as the current snapshot and a history point, e.g. to
+recover from a bad deploy without crawling ODA again.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from typing import List, Optional
+
+import redis.asyncio as aioredis
+
+from services.page_store import page_store
+from services.redis import REDIS_HOST, REDIS_PORT
+from tasks.stats import RefreshResult, aggregate_pages, publish_stats
+from utils.serialization import serializer
+from utils.sharded import shutdown_stats_pool
+
+logger = logging.getLogger(__name__)
+
+
+async def replay(crawl_id: str) -> RefreshResult:
+    """Aggregate a stored crawl exactly like the refresh that fetched it."""
+
+    async def pages():
+        for products in page_store.iter_records(crawl_id):
+            yield products
+
+    return await aggregate_pages(pages())
+
+
+async def run(args) -> int:
+    if not page_store.enabled:
+        print("ODA_PAGE_STORE_PATH is not set", file=sys.stderr)
+        return 1
+    if args.list:
+        print(json.dumps((await page_store.info())["crawls"], indent=2))
+        return 0
+
+    crawls = page_store.crawls()
+    crawl_id = args.crawl or (crawls[-1] if crawls else None)
+    if crawl_id not in crawls:
+        print(f"No stored crawl {crawl_id} in {page_store.root}", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    result = await replay(crawl_id)
+    elapsed = time.perf_counter() - start
+    if not result.stats:
+        print(f"Crawl {crawl_id} holds no products", file=sys.stderr)
+        return 1
+    print(
+        f"Replayed crawl {crawl_id}: {result.stats.total_products} products "
+        f"in {elapsed:.2f}s",
+        file=sys.stderr,
+    )
+    print(serializer.dumps(result.stats.model_dump()).decode())
+
+    if args.publish:
+        client = aioredis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+        try:
+            version = await publish_stats(
+                client, result.stats, None, result.index, result.price_sketch
+            )
+        finally:
+            await client.aclose()
+        print(f"Published as version {version}", file=sys.stderr)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--list", action="store_true", help="list the stored crawls")
+    parser.add_argument("--crawl", help="crawl id to replay (default: the newest)")
+    parser.add_argument(
+        "--publish", action="store_true", help="publish the stats to Redis"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        sys.exit(asyncio.run(run(args)))
+    finally:
+        shutdown_stats_pool()
+
+
+if __name__ == "__main__":
+    main()
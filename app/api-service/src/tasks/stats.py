@@ -1,73 +1,319 @@
 import asyncio
-import json
 import logging
-from datetime import datetime, timedelta, timezone
-from typing import Set
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterable, List, NamedTuple, Optional, Set
 
-from services.oda import fetch_all_products
-from utils.stats import calculate_stats
-from config import CACHE_TTL
+from redis.exceptions import WatchError
+
+from services.leader import LeaderElection
+from services.metrics import (
+    redis_operation_seconds,
+    stats_aggregation_seconds,
+    stats_refresh_products,
+    stats_refresh_seconds,
+    stats_refreshes,
+    stats_serialization_seconds,
+)
+from services.page_tracker import page_tracker
+from services.profiler import refresh_profiler
+from utils.stats import IncrementalStatsAggregator, StatsAccumulator
+from utils.columnar import ColumnarStatsAccumulator, NUMPY_AVAILABLE
+from utils.product_index import ProductIndex, ProductIndexBuilder
+from utils.sharded import ShardedStatsAccumulator
+from utils.products import ProductRecord
+from utils.sketches import PriceSketch
+from utils.serialization import pack_value, serializer
+from models.stats import ProductStats
+from services.stats_history import record_snapshot
+from services.stats_index import encode_index, stats_index
+from services.refresh_scheduler import SCHEDULE_KEY, refresh_scheduler
+from services.revalidation import REVALIDATE_KEY
+from services.stats_cache import (
+    STATS_CHANNEL,
+    STATS_FRESH_UNTIL_KEY,
+    STATS_INDEX_KEY,
+    STATS_KEY,
+    STATS_SKETCH_KEY,
+    STATS_TEMP_KEY,
+    STATS_VERSION_KEY,
+    stats_cache,
+)
+from config import CACHE_TTL, STATS_ENGINE, STATS_STALE_TTL
 
 logger = logging.getLogger(__name__)
 
 background_tasks: Set[asyncio.Task] = set()
 
-import sys
+# Seconds between lease checks while another process is the refresh leader
+FOLLOWER_POLL_INTERVAL = 60
+
+# Shared by the initial and periodic updates so each refresh only applies churn
+stats_aggregator = IncrementalStatsAggregator()
+
+# Published keys outlive their CACHE_TTL by STATS_STALE_TTL, to be served stale
+SNAPSHOT_KEY_TTL = CACHE_TTL + STATS_STALE_TTL
+
+# Held while a refresh runs, so the initial, periodic and requested refreshes
+# never overlap
+refresh_lock = asyncio.Lock()
+
+
+def new_stats_accumulator():
+    """Return the accumulator for the configured STATS_ENGINE."""
+    if STATS_ENGINE == "numpy":
+        if NUMPY_AVAILABLE:
+            return ColumnarStatsAccumulator()
+        logger.warning("STATS_ENGINE=numpy but numpy is not installed, using python")
+    elif STATS_ENGINE == "incremental":
+        stats_aggregator.begin()
+        return stats_aggregator
+    elif STATS_ENGINE == "sharded":
+        return ShardedStatsAccumulator()
+    return StatsAccumulator()
+
+
+class RefreshResult(NamedTuple):
+    stats: Optional[ProductStats]
+    index: Optional[ProductIndex]
+    # Share of the catalog that changed since the previous refresh, if known
+    change_ratio: Optional[float]
+    # Probes found nothing new; the published snapshot is still current
+    unchanged: bool = False
+    price_sketch: Optional[PriceSketch] = None
+
 
-print(sys.path)
+async def refresh_stats() -> RefreshResult:
+    """Crawl ODA and fold each page into the aggregator as it arrives.
 
+    The product index for filtered queries is built from the same pages when
+    numpy is available. Only the incremental engine measures how much of the
+    catalog changed. Pages the probes show to be unchanged are reused from
+    the previous crawl, and no crawl runs at all if nothing changed.
+    """
+    plan = await page_tracker.plan()
+    if plan.unchanged:
+        logger.info("Probed pages are unchanged, skipping the crawl")
+        await page_tracker.skip()
+        return RefreshResult(None, None, 0.0, unchanged=True)
 
-async def periodic_stats_update(redis_instance):
-    """Periodically update product statistics in Redis."""
-    logger.info(
-        "Periodic stats update task started - waiting 30 minutes before first update"
+    return await aggregate_pages(page_tracker.crawl(plan))
+
+
+async def aggregate_pages(
+    pages: AsyncIterable[List[ProductRecord]],
+) -> RefreshResult:
+    """Fold pages of products into the configured engine and product index."""
+    accumulator = new_stats_accumulator()
+    index_builder = ProductIndexBuilder() if NUMPY_AVAILABLE else None
+    products_read = 0
+    aggregation_time = 0.0
+    async for products in pages:
+        start = time.perf_counter()
+        accumulator.add(products)
+        if index_builder is not None:
+            index_builder.add(products)
+        aggregation_time += time.perf_counter() - start
+        products_read += len(products)
+
+    start = time.perf_counter()
+    if isinstance(accumulator, ShardedStatsAccumulator):
+        await accumulator.drain()
+    stats = accumulator.finish()
+    index = index_builder.finish() if index_builder is not None and stats else None
+    stats_aggregation_seconds.observe(aggregation_time + time.perf_counter() - start)
+    stats_refresh_products.set(products_read)
+    return RefreshResult(
+        stats,
+        index,
+        getattr(accumulator, "change_ratio", None),
+        price_sketch=accumulator.price_sketch,
     )
-    await asyncio.sleep(30 * 60)
 
-    while True:
+
+async def publish_stats(
+    redis_instance,
+    stats: ProductStats,
+    leader: Optional[LeaderElection] = None,
+    index: Optional[ProductIndex] = None,
+    price_sketch: Optional[PriceSketch] = None,
+) -> Optional[int]:
+    """Atomically replace the published snapshot, bump its version and
+    append it to the history. The snapshot's price sketch and product index
+    are stored next to it with the same TTL. All are fresh for CACHE_TTL
+    seconds and kept for another STATS_STALE_TTL, and a pending revalidation
+    is released.
+
+    With a `leader`, the write is fenced on the lease: if it changed hands
+    while we were crawling, the snapshot is dropped and None is returned.
+    """
+    with stats_serialization_seconds.time():
+        payload = serializer.dumps(stats.model_dump())
+        sketch = serializer.dumps(price_sketch.to_dict()) if price_sketch else None
+        encoded_index = (
+            await asyncio.to_thread(encode_index, index) if index is not None else None
+        )
+
+    async with redis_instance.pipeline(transaction=True) as pipe:
+        if leader is not None:
+            await pipe.watch(leader.key)
+            if await pipe.get(leader.key) != leader.identity:
+                logger.warning(
+                    "Refresh lease lost before publishing, dropping snapshot"
+                )
+                return None
+            pipe.multi()
+
+        # Write to temporary key first, then swap it in
+        now = time.time()
+        pipe.setex(STATS_TEMP_KEY, SNAPSHOT_KEY_TTL, pack_value(payload))
+        pipe.rename(STATS_TEMP_KEY, STATS_KEY)
+        pipe.incr(STATS_VERSION_KEY)
+        record_snapshot(pipe, stats, now)
+        if sketch is not None:
+            pipe.setex(STATS_SKETCH_KEY, SNAPSHOT_KEY_TTL, sketch)
+        else:
+            pipe.delete(STATS_SKETCH_KEY)
+        if encoded_index is not None:
+            pipe.setex(STATS_INDEX_KEY, SNAPSHOT_KEY_TTL, encoded_index)
+        else:
+            pipe.delete(STATS_INDEX_KEY)
+        pipe.setex(STATS_FRESH_UNTIL_KEY, SNAPSHOT_KEY_TTL, now + CACHE_TTL)
+        pipe.delete(REVALIDATE_KEY)
+        try:
+            with redis_operation_seconds.time("stats_publish"):
+                _, _, version, *_ = await pipe.execute()
+        except WatchError:
+            logger.warning("Refresh lease changed while publishing, dropping snapshot")
+            return None
+
+    stats_cache.publish(payload, version, CACHE_TTL)
+    if index is not None:
+        stats_index.publish(index, version)
+
+    # Notify every replica's live streams
+    await redis_instance.publish(STATS_CHANNEL, version)
+    return version
+
+
+async def publish_schedule(redis_instance):
+    """Share the next refresh time with every replica's cache_info."""
+    next_run_at = refresh_scheduler.next_run_at
+    stats_cache.next_refresh_at = next_run_at
+    if next_run_at is not None:
+        await redis_instance.set(
+            SCHEDULE_KEY, next_run_at, px=int(refresh_scheduler.max_interval * 2000)
+        )
+
+
+async def keep_snapshot(redis_instance) -> bool:
+    """Keep the published snapshot fresh for another CACHE_TTL seconds;
+    False if it no longer exists."""
+    async with redis_instance.pipeline(transaction=True) as pipe:
+        kept, *_ = await (
+            pipe.expire(STATS_KEY, SNAPSHOT_KEY_TTL)
+            .expire(STATS_SKETCH_KEY, SNAPSHOT_KEY_TTL)
+            .expire(STATS_INDEX_KEY, SNAPSHOT_KEY_TTL)
+            .setex(STATS_FRESH_UNTIL_KEY, SNAPSHOT_KEY_TTL, time.time() + CACHE_TTL)
+            .delete(REVALIDATE_KEY)
+            .execute()
+        )
+    if not kept:
+        await redis_instance.delete(STATS_FRESH_UNTIL_KEY)
+        return False
+    stats_cache.extend(CACHE_TTL)
+    return True
+
+
+async def run_refresh(redis_instance, leader: LeaderElection) -> Optional[int]:
+    """Crawl, publish and schedule the next refresh from the outcome."""
+    with stats_refresh_seconds.time():
         try:
-            next_update = datetime.now() + timedelta(minutes=30)
-            logger.info(
-                f"Starting periodic stats update (next update scheduled for: {next_update.isoformat()})"
+            result = await refresh_stats()
+            if result.unchanged:
+                if await keep_snapshot(redis_instance):
+                    stats_refreshes.inc("unchanged")
+                    refresh_scheduler.record_success(result.change_ratio)
+                    await publish_schedule(redis_instance)
+                    return None
+                # The snapshot is gone from Redis, so it has to be rebuilt
+                page_tracker.reset()
+                result = await refresh_stats()
+            if not result.stats:
+                raise RuntimeError("Crawl returned no products")
+            version = await publish_stats(
+                redis_instance, result.stats, leader, result.index, result.price_sketch
             )
+        except Exception:
+            stats_refreshes.inc("failed")
+            refresh_scheduler.record_failure()
+            await publish_schedule(redis_instance)
+            raise
+
+    if version:
+        stats_refreshes.inc("published")
+        refresh_scheduler.record_success(result.change_ratio)
+        await publish_schedule(redis_instance)
+    else:
+        # Lease lost while crawling; the new leader publishes its own schedule
+        stats_refreshes.inc("dropped")
+        refresh_scheduler.schedule(FOLLOWER_POLL_INTERVAL)
+    return version
 
-            products = await fetch_all_products()
-            if products:
-                stats = calculate_stats(products)
-                if stats:
-                    # Write to temporary key first
-                    temp_key = "product:stats:temp"
-                    redis_instance.setex(temp_key, CACHE_TTL, json.dumps(stats.dict()))
 
-                    # Atomic swap
-                    redis_instance.rename(temp_key, "product:stats")
-                    logger.info(
-                        f"Successfully updated stats cache at {datetime.now().isoformat()}"
-                    )
+async def run_refresh_cycle(redis_instance, leader: LeaderElection) -> Optional[int]:
+    """`run_refresh`, under the sampling profiler when a profile was requested."""
+    async with refresh_lock:
+        if not await refresh_profiler.take_request(redis_instance):
+            return await run_refresh(redis_instance, leader)
+        async with refresh_profiler.profile(redis_instance):
+            return await run_refresh(redis_instance, leader)
 
-            # await asyncio.sleep(30 * 60)
-            await asyncio.sleep(60)
+
+def refresh_in_progress() -> bool:
+    return refresh_lock.locked()
+
+
+async def periodic_stats_update(redis_instance, leader: LeaderElection):
+    """Run stats refreshes whenever the refresh scheduler says one is due.
+
+    Every process runs this loop, but only the current refresh leader crawls;
+    followers keep serving the snapshot the leader publishes and check the
+    lease again every FOLLOWER_POLL_INTERVAL seconds.
+    """
+    logger.info("Periodic stats update task started")
+
+    while True:
+        try:
+            await refresh_scheduler.wait()
+            if not leader.is_leader:
+                refresh_scheduler.schedule(FOLLOWER_POLL_INTERVAL)
+                continue
+
+            logger.info("Starting periodic stats update")
+            version = await run_refresh_cycle(redis_instance, leader)
+            if version:
+                logger.info(
+                    f"Successfully updated stats cache (version {version}) at {datetime.now().isoformat()}"
+                )
 
         except asyncio.CancelledError:
             logger.info("Periodic stats update task cancelled")
             break
         except Exception as e:
             logger.error(f"Error in periodic stats update: {str(e)}")
-            await asyncio.sleep(5 * 60)
 
 
-async def initial_stats_update(redis_instance):
-    """Initial update of stats during startup."""
+async def initial_stats_update(redis_instance, leader: LeaderElection):
+    """Initial update of stats during startup, performed by the leader only."""
+    if not leader.is_leader:
+        logger.info("Not the refresh leader, skipping initial stats update")
+        refresh_scheduler.schedule(FOLLOWER_POLL_INTERVAL)
+        return
+
     try:
         logger.info("Performing initial stats update...")
-        products = await fetch_all_products()
-        if products:
-            stats = calculate_stats(products)
-            if stats:
-                # Same atomic update pattern for initial update
-                temp_key = "product:stats:temp"
-                redis_instance.setex(temp_key, CACHE_TTL, json.dumps(stats.dict()))
-                redis_instance.rename(temp_key, "product:stats")
-                logger.info("Initial stats cache created successfully")
+        if await run_refresh_cycle(redis_instance, leader):
+            logger.info("Initial stats cache created successfully")
     except Exception as e:
         logger.error(f"Error in initial stats update: {str(e)}")
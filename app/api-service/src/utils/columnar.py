@@ -0,0 +1,124 @@
+import logging
+import math
+from array import array
+from typing import Dict, Iterable, List, Optional, Union
+
+from models.stats import ProductStats
+from utils.stats import (
+    PRICE_RANGES,
+    TOP_BRANDS_LIMIT,
+    build_stats,
+    rank_brands,
+)
+from utils.products import ProductRecord, as_records
+from utils.sketches import PriceSketch, sketch_keys
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the "numpy" stats engine
+    np = None
+
+logger = logging.getLogger(__name__)
+
+NUMPY_AVAILABLE = np is not None
+
+# Upper (inclusive) bound of every price range except the open-ended last one
+PRICE_RANGE_EDGES = (50.0, 100.0, 200.0, 500.0)
+
+
+class ColumnarStatsAccumulator:
+    """Collects products into columns and aggregates them with NumPy.
+
+    Each page is reduced to a price column and interned brand and category
+    codes; `finish()` then buckets prices with `searchsorted`, counts codes
+    with `bincount` and selects top brands with `argpartition`. The price
+    sketch is built from vectorized `frexp`. The output is identical to
+    `calculate_stats`.
+    """
+
+    def __init__(self):
+        if np is None:
+            raise RuntimeError("numpy is required for the numpy stats engine")
+
+        self.total_products = 0
+        self.prices = array("d")
+        self.brand_codes = array("q")
+        self.category_codes = array("q")
+        self.brand_names: Dict[str, int] = {}
+        self.category_names: Dict[str, int] = {}
+        self.price_sketch: Optional[PriceSketch] = None
+
+    def add(self, records: Iterable[ProductRecord]):
+        prices, brand_codes, category_codes = (
+            self.prices,
+            self.brand_codes,
+            self.category_codes,
+        )
+        brand_names, category_names = self.brand_names, self.category_names
+
+        for record in records:
+            self.total_products += 1
+            if record.price is None:
+                continue
+
+            prices.append(record.price)
+            brand_codes.append(brand_names.setdefault(record.brand, len(brand_names)))
+            for category in record.categories:
+                category_codes.append(
+                    category_names.setdefault(category, len(category_names))
+                )
+
+    def finish(self) -> ProductStats:
+        if not self.total_products:
+            logger.warning("No products provided to calculate_stats")
+            return None
+
+        prices = np.frombuffer(self.prices, dtype=np.float64)
+        buckets = np.searchsorted(PRICE_RANGE_EDGES, prices, side="left")
+        bucket_counts = np.bincount(buckets, minlength=len(PRICE_RANGES)).tolist()
+
+        brand_names = list(self.brand_names)
+        brand_counts = np.bincount(
+            np.frombuffer(self.brand_codes, dtype=np.int64), minlength=len(brand_names)
+        )
+        category_counts = np.bincount(
+            np.frombuffer(self.category_codes, dtype=np.int64),
+            minlength=len(self.category_names),
+        ).tolist()
+        self.price_sketch = PriceSketch.from_keys(sketch_keys(prices))
+
+        return build_stats(
+            self.total_products,
+            math.fsum(self.prices),
+            dict(zip(PRICE_RANGES, bucket_counts)),
+            dict(zip(brand_names, brand_counts.tolist())),
+            dict(zip(self.category_names, category_counts)),
+            top_brands=rank_brand_counts(brand_names, brand_counts),
+            price_sketch=self.price_sketch,
+        )
+
+
+def rank_brand_counts(names: List[str], counts: "np.ndarray"):
+    """`rank_brands` over a column of counts, one per name."""
+    candidates = np.arange(len(counts))
+    if len(counts) > TOP_BRANDS_LIMIT:
+        top = np.argpartition(counts, -TOP_BRANDS_LIMIT)[-TOP_BRANDS_LIMIT:]
+        # Keep every brand tied with the k-th count so name ordering can break ties
+        candidates = np.flatnonzero(counts >= counts[top].min())
+
+    return rank_brands((names[i], int(counts[i])) for i in candidates.tolist())
+
+
+def calculate_stats_columnar(
+    products: List[Union[dict, ProductRecord]],
+) -> ProductStats:
+    """Columnar/NumPy equivalent of `calculate_stats`."""
+    if not products:
+        logger.warning("No products provided to calculate_stats")
+        return None
+
+    logger.info(f"Starting columnar stats calculation for {len(products)} products")
+
+    accumulator = ColumnarStatsAccumulator()
+    accumulator.add(as_records(products))
+    return accumulator.finish()
@@ -0,0 +1,47 @@
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> str:
+    """Pick the first of `available` (in preference order) the client accepts."""
+    if not accept_encoding:
+        return "identity"
+
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.strip().lower()] = q
+
+    for coding in available:
+        if accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return "identity"
+
+
+def etag_matches(if_none_match: str, etags: Iterable[str]) -> bool:
+    """Weak comparison of an If-None-Match header against our entity tags."""
+    if if_none_match.strip() == "*":
+        return True
+
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return any(etag in candidates for etag in etags)
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value, usegmt=True)
+
+
+def parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
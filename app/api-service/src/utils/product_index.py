@@ -0,0 +1,265 @@
+import io
+import logging
+import math
+from array import array
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from utils.columnar import PRICE_RANGE_EDGES, np, rank_brand_counts
+from utils.products import ProductRecord
+from utils.sketches import PriceSketch, sketch_keys
+from utils.stats import PRICE_RANGES
+from config import STATS_PRICE_HISTOGRAM_BINS, STATS_PRICE_QUANTILES
+
+logger = logging.getLogger(__name__)
+
+
+class ProductIndexBuilder:
+    """Collects products page by page into a `ProductIndex`."""
+
+    def __init__(self):
+        if np is None:
+            raise RuntimeError("numpy is required for the product index")
+
+        self.prices = array("d")
+        self.brand_codes = array("q")
+        self.category_codes = array("q")
+        self.category_counts = array("q")
+        self.brand_names: Dict[str, int] = {}
+        self.category_names: Dict[str, int] = {}
+
+    def add(self, records: Iterable[ProductRecord]):
+        brand_names, category_names = self.brand_names, self.category_names
+
+        for record in records:
+            self.prices.append(math.nan if record.price is None else record.price)
+            self.brand_codes.append(
+                brand_names.setdefault(record.brand, len(brand_names))
+            )
+            self.category_counts.append(len(record.categories))
+            for category in record.categories:
+                self.category_codes.append(
+                    category_names.setdefault(category, len(category_names))
+                )
+
+    def finish(self) -> "ProductIndex":
+        return ProductIndex(
+            np.frombuffer(self.prices, dtype=np.float64),
+            np.frombuffer(self.brand_codes, dtype=np.int64),
+            np.frombuffer(self.category_codes, dtype=np.int64),
+            np.frombuffer(self.category_counts, dtype=np.int64),
+            list(self.brand_names),
+            list(self.category_names),
+        )
+
+
+class ProductIndex:
+    """Price-sorted product columns with brand and category inverted indexes.
+
+    Rows are numbered in price order, so the prices of any selection are
+    already sorted and custom price buckets are one `searchsorted`. Each brand
+    and category maps to the ascending row numbers of its products; filters
+    are answered by marking those rows in a boolean mask and intersecting
+    the masks.
+
+    Unpriced products (NaN prices) sort after every priced one, in the last
+    `size - priced` rows. As in `/api/stats`, they count towards
+    `total_products` and the average's denominator but not towards prices,
+    brands or categories.
+    """
+
+    def __init__(
+        self,
+        prices: "np.ndarray",
+        brand_codes: "np.ndarray",
+        category_codes: "np.ndarray",
+        category_counts: "np.ndarray",
+        brand_names: Sequence[str],
+        category_names: Sequence[str],
+    ):
+        order = np.argsort(prices, kind="stable")
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+
+        self.size = len(prices)
+        self.prices = prices[order]
+        self.priced = int(np.count_nonzero(~np.isnan(self.prices)))
+        self.sketch_keys = sketch_keys(self.prices[: self.priced])
+        self.brand_codes = brand_codes[order]
+        self.brand_names = list(brand_names)
+        self.category_names = list(category_names)
+        self._brand_ids = {name: i for i, name in enumerate(self.brand_names)}
+        self._category_ids = {name: i for i, name in enumerate(self.category_names)}
+
+        # (row, category) memberships, used to count categories in a selection
+        self.member_rows = rank[np.repeat(np.arange(self.size), category_counts)]
+        self.member_categories = category_codes
+
+        self._brand_rows, self._brand_offsets = _invert(
+            self.brand_codes, np.arange(self.size), len(self.brand_names)
+        )
+        self._category_rows, self._category_offsets = _invert(
+            self.member_categories, self.member_rows, len(self.category_names)
+        )
+
+    def to_bytes(self) -> bytes:
+        """The price-ordered columns of the index, compressed, for other processes."""
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            prices=self.prices,
+            brand_codes=self.brand_codes.astype(np.int32),
+            member_rows=self.member_rows.astype(np.int32),
+            member_categories=self.member_categories.astype(np.int32),
+            brand_names=np.array(self.brand_names, dtype=str),
+            category_names=np.array(self.category_names, dtype=str),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ProductIndex":
+        """Rebuild an index from `to_bytes`, for the same stats as the original."""
+        with np.load(io.BytesIO(data), allow_pickle=False) as columns:
+            member_rows = columns["member_rows"].astype(np.int64)
+            # Rows are already in price order; list each row's categories together
+            order = np.argsort(member_rows, kind="stable")
+            return cls(
+                columns["prices"],
+                columns["brand_codes"].astype(np.int64),
+                columns["member_categories"].astype(np.int64)[order],
+                np.bincount(member_rows, minlength=len(columns["prices"])),
+                columns["brand_names"].tolist(),
+                columns["category_names"].tolist(),
+            )
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            column.nbytes
+            for column in (
+                self.prices,
+                self.sketch_keys,
+                self.brand_codes,
+                self.member_rows,
+                self.member_categories,
+                self._brand_rows,
+                self._brand_offsets,
+                self._category_rows,
+                self._category_offsets,
+            )
+        )
+
+    def select(
+        self, categories: Sequence[str] = (), brands: Sequence[str] = ()
+    ) -> Optional["np.ndarray"]:
+        """Mask of the rows in any of `categories` and any of `brands`.
+
+        Returns None when there is no filter, meaning every row.
+        """
+        mask = None
+        for names, ids, rows, offsets in (
+            (
+                categories,
+                self._category_ids,
+                self._category_rows,
+                self._category_offsets,
+            ),
+            (brands, self._brand_ids, self._brand_rows, self._brand_offsets),
+        ):
+            if not names:
+                continue
+            selected = np.zeros(self.size, dtype=bool)
+            for name in names:
+                code = ids.get(name)
+                if code is not None:
+                    selected[rows[offsets[code] : offsets[code + 1]]] = True
+            mask = selected if mask is None else mask & selected
+        return mask
+
+    def stats(
+        self,
+        categories: Sequence[str] = (),
+        brands: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None,
+    ) -> Dict:
+        """Stats over the products matching the filters.
+
+        `buckets` are ascending price boundaries: `0,25,50` gives the ranges
+        `0-25` (up to and including 25), `25-50` and `50+`. When the first
+        boundary is above 0, cheaper products are counted in a leading range,
+        e.g. `<10` for `10,20,30`. Without them the ranges of `/api/stats`
+        are used.
+        """
+        priced = self.priced
+        mask = self.select(categories, brands)
+        priced_members = self.member_rows < priced
+        if mask is None:
+            total = self.size
+            prices, brand_codes = self.prices[:priced], self.brand_codes[:priced]
+            keys = self.sketch_keys
+            member_categories = self.member_categories[priced_members]
+        else:
+            total = int(np.count_nonzero(mask))
+            priced_mask = mask[:priced]
+            prices = self.prices[:priced][priced_mask]
+            brand_codes = self.brand_codes[:priced][priced_mask]
+            keys = self.sketch_keys[priced_mask]
+            member_categories = self.member_categories[
+                priced_members & mask[self.member_rows]
+            ]
+
+        if buckets is None:
+            labels, edges = PRICE_RANGES, PRICE_RANGE_EDGES
+            cuts = np.searchsorted(prices, edges, side="right").tolist()
+        else:
+            labels = _bucket_labels(buckets)
+            cuts = np.searchsorted(prices, buckets[1:], side="right").tolist()
+            if buckets[0] > 0:
+                cuts.insert(0, int(np.searchsorted(prices, buckets[0], side="left")))
+        bucket_counts = [b - a for a, b in zip([0] + cuts, cuts + [len(prices)])]
+
+        brand_counts = np.bincount(brand_codes, minlength=len(self.brand_names))
+        present = np.flatnonzero(brand_counts)
+        category_counts = np.bincount(
+            member_categories, minlength=len(self.category_names)
+        ).tolist()
+        sketch = PriceSketch.from_keys(keys)
+
+        return {
+            "total_products": total,
+            "average_price": (
+                round(math.fsum(prices.tolist()) / total, 2) if total else 0
+            ),
+            "price_ranges": dict(zip(labels, bucket_counts)),
+            "top_brands": [
+                brand.model_dump()
+                for brand in rank_brand_counts(
+                    [self.brand_names[i] for i in present.tolist()],
+                    brand_counts[present],
+                )
+            ],
+            "categories": {
+                name: count
+                for name, count in sorted(zip(self.category_names, category_counts))
+                if count
+            },
+            "price_quantiles": sketch.quantiles(STATS_PRICE_QUANTILES),
+            "price_histogram": sketch.histogram(STATS_PRICE_HISTOGRAM_BINS),
+            "distinct_brands": len(present),
+            "distinct_categories": sum(1 for count in category_counts if count),
+        }
+
+
+def _invert(
+    codes: "np.ndarray", rows: "np.ndarray", size: int
+) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Group `rows` by `codes`: rows of code i are rows[offsets[i]:offsets[i + 1]]."""
+    order = np.lexsort((rows, codes))
+    offsets = np.searchsorted(codes[order], np.arange(size + 1), side="left")
+    return rows[order], offsets
+
+
+def _bucket_labels(buckets: Sequence[float]) -> Tuple[str, ...]:
+    labels = [f"{low:g}-{high:g}" for low, high in zip(buckets, buckets[1:])]
+    if buckets[0] > 0:
+        labels.insert(0, f"<{buckets[0]:g}")
+    return tuple(labels + [f"{buckets[-1]:g}+"])
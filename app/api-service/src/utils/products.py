@@ -0,0 +1,109 @@
+import logging
+from sys import intern
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+class ProductRecord:
+    """The fields of an ODA product the stats read.
+
+    Raw search items carry names, URLs, images and nested attributes the
+    stats never look at. Pages are projected into these records as soon as
+    they are parsed, so only the records outlive the page. Brand and
+    category names are interned and shared by every product that uses them.
+    """
+
+    __slots__ = ("id", "price", "brand", "categories")
+
+    def __init__(
+        self,
+        id: Any,
+        price: Optional[float],
+        brand: str,
+        categories: Tuple[str, ...],
+    ):
+        self.id = id
+        self.price = price  # None when the item had no usable price
+        self.brand = brand
+        self.categories = categories
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ProductRecord):
+            return NotImplemented
+        return (self.id, self.price, self.brand, self.categories) == (
+            other.id,
+            other.price,
+            other.brand,
+            other.categories,
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"ProductRecord(id={self.id!r}, price={self.price!r}, "
+            f"brand={self.brand!r}, categories={self.categories!r})"
+        )
+
+
+def make_record(
+    product_id: Any,
+    gross_price: Any,
+    brand: Any,
+    category_names: Iterable[Optional[str]],
+) -> ProductRecord:
+    """Build a ProductRecord from the raw attribute values of one item.
+
+    A missing `gross_price` or classifier name is passed as None.
+    """
+    price = None
+    if gross_price is None:
+        logger.warning(f"Error processing product {product_id}: 'gross_price'")
+    else:
+        try:
+            price = float(gross_price)
+        except ValueError as e:
+            logger.warning(f"Error processing product {product_id}: {str(e)}")
+
+    # Handle None and blank brands
+    if brand is not None and isinstance(brand, str) and brand.strip():
+        brand_name = intern(brand.strip())
+    else:
+        brand_name = "Unknown"
+
+    # Using client_classifiers as categories
+    categories = []
+    for name in category_names:
+        if name is None:
+            if price is not None:
+                logger.warning(f"Error processing product {product_id}: 'name'")
+            break
+        categories.append(intern(name))
+
+    return ProductRecord(product_id, price, brand_name, tuple(categories))
+
+
+def project_product(item: dict) -> ProductRecord:
+    """Parse one ODA search item into a ProductRecord."""
+    attrs = item["attributes"]
+    product_id = item.get("id", attrs.get("id"))
+    return make_record(
+        product_id,
+        attrs.get("gross_price"),
+        attrs.get("brand"),
+        (classifier.get("name") for classifier in attrs.get("client_classifiers", [])),
+    )
+
+
+def project_page(items: Iterable[dict]) -> List[ProductRecord]:
+    """Project the product items of a search page, dropping other item types."""
+    return [project_product(item) for item in items if item["type"] == "product"]
+
+
+def as_records(
+    products: Iterable[Union[dict, ProductRecord]],
+) -> Iterator[ProductRecord]:
+    """Accept raw ODA items or already projected records."""
+    for product in products:
+        yield (
+            product if isinstance(product, ProductRecord) else project_product(product)
+        )
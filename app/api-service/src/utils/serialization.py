@@ -0,0 +1,170 @@
+import json
+import logging
+from typing import Any, List, Optional
+
+from utils.products import ProductRecord, make_record, project_page
+from config import JSON_BACKEND, STATS_VALUE_FORMAT
+
+try:
+    import msgspec
+except ImportError:  # optional, fastest backend with typed ODA page decoding
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # optional, fast dict-based backend
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Newest Redis value format this release reads and writes. Format 1 is the
+# bare JSON document older releases use; format N > 1 is b"N:" + JSON.
+LATEST_VALUE_FORMAT = 2
+
+
+class SearchPage:
+    """One decoded ODA `/search/mixed/` response, reduced to what the crawl needs."""
+
+    __slots__ = ("has_more_items", "products")
+
+    def __init__(self, has_more_items: bool, products: List[ProductRecord]):
+        self.has_more_items = has_more_items
+        self.products = products
+
+
+class StdlibSerializer:
+    name = "stdlib"
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+    def loads(self, data) -> Any:
+        return json.loads(data)
+
+    def decode_search_page(self, body: bytes) -> SearchPage:
+        data = self.loads(body)
+        return SearchPage(
+            data["attributes"]["has_more_items"], project_page(data["items"])
+        )
+
+
+class OrjsonSerializer(StdlibSerializer):
+    name = "orjson"
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(self, data) -> Any:
+        return orjson.loads(data)
+
+
+if msgspec is not None:
+
+    class _Classifier(msgspec.Struct):
+        name: Optional[str] = None
+
+    class _ItemAttributes(msgspec.Struct):
+        id: Any = None
+        gross_price: Any = None
+        brand: Any = None
+        client_classifiers: List[_Classifier] = []
+
+    class _Item(msgspec.Struct):
+        type: str
+        attributes: _ItemAttributes
+        id: Any = None
+
+    class _PageAttributes(msgspec.Struct):
+        has_more_items: bool
+
+    class _Page(msgspec.Struct):
+        attributes: _PageAttributes
+        items: List[_Item]
+
+
+class MsgspecSerializer(StdlibSerializer):
+    """Decodes ODA pages straight into typed structs.
+
+    Only the fields the stats read are declared, so images, URLs and the
+    rest of each item are skipped by the parser instead of being built into
+    dicts first.
+    """
+
+    name = "msgspec"
+
+    def __init__(self):
+        self._encoder = msgspec.json.Encoder()
+        self._page_decoder = msgspec.json.Decoder(_Page)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._encoder.encode(obj)
+
+    def loads(self, data) -> Any:
+        return msgspec.json.decode(data)
+
+    def decode_search_page(self, body: bytes) -> SearchPage:
+        try:
+            page = self._page_decoder.decode(body)
+        except msgspec.ValidationError as e:
+            # Unexpected shapes get the same treatment as with the other backends
+            logger.warning(f"ODA page did not match the expected schema: {str(e)}")
+            return super().decode_search_page(body)
+
+        products = []
+        for item in page.items:
+            if item.type != "product":
+                continue
+            attrs = item.attributes
+            products.append(
+                make_record(
+                    item.id if item.id is not None else attrs.id,
+                    attrs.gross_price,
+                    attrs.brand,
+                    (classifier.name for classifier in attrs.client_classifiers),
+                )
+            )
+        return SearchPage(page.attributes.has_more_items, products)
+
+
+SERIALIZERS = {
+    "msgspec": MsgspecSerializer if msgspec is not None else None,
+    "orjson": OrjsonSerializer if orjson is not None else None,
+    "stdlib": StdlibSerializer,
+}
+
+
+def get_serializer(name: str = "auto"):
+    """Return the named JSON backend, or the fastest installed one for "auto"."""
+    if name == "auto":
+        name = next(n for n, backend in SERIALIZERS.items() if backend is not None)
+    elif SERIALIZERS.get(name) is None:
+        logger.warning(f"JSON backend {name!r} is not available, using stdlib")
+        name = "stdlib"
+    return SERIALIZERS[name]()
+
+
+def pack_value(body: bytes, value_format: int = STATS_VALUE_FORMAT) -> bytes:
+    """Wrap a JSON document in the versioned Redis value format."""
+    if value_format == 1:
+        return body
+    return b"%d:" % value_format + body
+
+
+def unpack_value(value) -> bytes:
+    """Return the JSON document inside a Redis value of any supported format."""
+    if isinstance(value, str):
+        value = value.encode()
+    if value[:1] in (b"{", b"["):
+        return value
+
+    value_format, separator, body = value.partition(b":")
+    if (
+        not separator
+        or not value_format.isdigit()
+        or not 1 < int(value_format) <= LATEST_VALUE_FORMAT
+    ):
+        raise ValueError(f"Unsupported Redis value format: {value[:16]!r}")
+    return body
+
+
+serializer = get_serializer(JSON_BACKEND)
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, List, Optional, Tuple, Union
+
+from models.stats import ProductStats
+from utils.products import ProductRecord, as_records
+from utils.stats import StatsAccumulator
+from config import STATS_SHARD_SIZE, STATS_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# (price, brand, categories) of a priced product, cheap to pickle
+Row = Tuple[float, str, Tuple[str, ...]]
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_stats_pool() -> ProcessPoolExecutor:
+    """The process pool shared by every sharded aggregation, started on first use.
+
+    Workers are spawned rather than forked, so they do not inherit the event
+    loop, sockets or threads of the API process.
+    """
+    global _pool
+    if _pool is None:
+        workers = STATS_WORKERS or os.cpu_count() or 1
+        _pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"Started stats process pool with {workers} workers")
+    return _pool
+
+
+def shutdown_stats_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def aggregate_shard(rows: List[Row], unpriced: int) -> StatsAccumulator:
+    """Worker side: the partial aggregate of one shard."""
+    accumulator = StatsAccumulator()
+    accumulator.add(
+        ProductRecord(None, price, brand, categories)
+        for price, brand, categories in rows
+    )
+    accumulator.total_products += unpriced
+    return accumulator
+
+
+class ShardedStatsAccumulator:
+    """Aggregates products in a process pool, `shard_size` products at a time.
+
+    `add()` only reduces records to compact rows on the calling thread; each
+    full shard is aggregated by a worker into a partial `StatsAccumulator`.
+    `finish()` merges the partials and ranks the top brands, which costs time
+    in the number of distinct brands and categories, not products. Await
+    `drain()` first to wait for the workers without blocking the event loop.
+    """
+
+    def __init__(
+        self,
+        pool: Optional[ProcessPoolExecutor] = None,
+        shard_size: int = STATS_SHARD_SIZE,
+    ):
+        self.pool = pool
+        self.shard_size = shard_size
+        self._rows: List[Row] = []
+        self._unpriced = 0
+        self._futures: List[Future] = []
+        self.price_sketch = None
+
+    def add(self, records: Iterable[ProductRecord]):
+        rows = self._rows
+        for record in records:
+            if record.price is None:
+                self._unpriced += 1
+            else:
+                rows.append((record.price, record.brand, record.categories))
+        if len(rows) >= self.shard_size:
+            self._submit()
+
+    def _submit(self):
+        pool = self.pool or get_stats_pool()
+        self._futures.append(pool.submit(aggregate_shard, self._rows, self._unpriced))
+        self._rows, self._unpriced = [], 0
+
+    async def drain(self):
+        """Submit the last shard and wait for every worker."""
+        if self._rows or self._unpriced:
+            self._submit()
+        try:
+            await asyncio.gather(*(asyncio.wrap_future(f) for f in self._futures))
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next refresh
+            if self.pool is None:
+                shutdown_stats_pool()
+            raise
+
+    def finish(self) -> ProductStats:
+        if self._rows or self._unpriced:
+            self._submit()
+        futures, self._futures = self._futures, []
+
+        merged = StatsAccumulator()
+        for future in futures:
+            merged.merge(future.result())
+        self.price_sketch = merged.price_sketch
+        return merged.finish()
+
+
+def calculate_stats_sharded(
+    products: List[Union[dict, ProductRecord]],
+    pool: Optional[ProcessPoolExecutor] = None,
+    shard_size: int = STATS_SHARD_SIZE,
+) -> ProductStats:
+    """`calculate_stats` over a process pool; blocks until every shard is done."""
+    accumulator = ShardedStatsAccumulator(pool, shard_size)
+    accumulator.add(as_records(products))
+    return accumulator.finish()
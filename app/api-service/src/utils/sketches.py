@@ -0,0 +1,171 @@
+import math
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # only needed to build sketches from price columns
+    np = None
+
+# Buckets per power of two. Values are reported as the middle of their bucket,
+# at most RELATIVE_ACCURACY away from the true value
+SKETCH_SUBBUCKETS = 128
+RELATIVE_ACCURACY = 1 / (2 * SKETCH_SUBBUCKETS)
+
+# Bucket of zero (and, defensively, negative) prices; sorts before every other
+ZERO_KEY = -(1 << 40)
+
+# Keys of recently seen prices: a catalog repeats the same few thousand prices,
+# and a dict lookup is cheaper than frexp. Cleared when full
+KEY_CACHE_SIZE = 1 << 16
+key_cache: Dict[float, int] = {}
+
+
+def sketch_key(price: float) -> int:
+    """Bucket of a price: its binary exponent and the top bits of its mantissa."""
+    if price <= 0:
+        return ZERO_KEY
+    mantissa, exponent = math.frexp(price)
+    return exponent * SKETCH_SUBBUCKETS + int(
+        (mantissa - 0.5) * (2 * SKETCH_SUBBUCKETS)
+    )
+
+
+def cached_sketch_key(price: float) -> int:
+    key = key_cache.get(price)
+    if key is None:
+        if len(key_cache) >= KEY_CACHE_SIZE:
+            key_cache.clear()
+        key = key_cache[price] = sketch_key(price)
+    return key
+
+
+def sketch_keys(prices: "np.ndarray") -> "np.ndarray":
+    """`sketch_key` of every price in a column; frexp is exact, so both agree."""
+    mantissas, exponents = np.frexp(prices)
+    keys = exponents.astype(np.int64) * SKETCH_SUBBUCKETS + (
+        (mantissas - 0.5) * (2 * SKETCH_SUBBUCKETS)
+    ).astype(np.int64)
+    return np.where(prices > 0, keys, ZERO_KEY)
+
+
+def bucket_value(key: int) -> float:
+    """The middle of a bucket, reported for every price in it."""
+    if key == ZERO_KEY:
+        return 0.0
+    exponent, sub = divmod(key, SKETCH_SUBBUCKETS)
+    return math.ldexp(0.5 + (sub + 0.5) / (2 * SKETCH_SUBBUCKETS), exponent)
+
+
+class PriceSketch:
+    """Mergeable quantile sketch of a price distribution.
+
+    A log-linear histogram: every power of two is split into
+    SKETCH_SUBBUCKETS equal-width buckets, so quantiles are within
+    RELATIVE_ACCURACY of the exact ones. Memory is bounded by the range of
+    prices (about 2,200 buckets from 1 to 100,000 kr), not their number.
+    Bucket counts simply add up, so sketches of pages, shards or engines merge
+    into exactly the sketch of a single pass, in any order, and a price can be
+    removed as exactly as it was added.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.buckets: Dict[int, int] = {}
+
+    def add(self, price: float, count: int = 1):
+        """Add `count` copies of a price; a negative count removes them."""
+        key = cached_sketch_key(price)
+        total = self.buckets.get(key, 0) + count
+        if total:
+            self.buckets[key] = total
+        else:
+            del self.buckets[key]
+        self.count += count
+
+    def update(self, prices: Iterable[float]):
+        for price in prices:
+            self.add(price)
+
+    def merge(self, other: "PriceSketch"):
+        buckets = self.buckets
+        for key, count in other.buckets.items():
+            buckets[key] = buckets.get(key, 0) + count
+        self.count += other.count
+
+    @classmethod
+    def from_keys(cls, keys: "np.ndarray") -> "PriceSketch":
+        """Sketch of a column of `sketch_keys`."""
+        sketch = cls()
+        unique, counts = np.unique(keys, return_counts=True)
+        sketch.buckets = dict(zip(unique.tolist(), counts.tolist()))
+        sketch.count = len(keys)
+        return sketch
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Nearest-rank `q` quantile, None for an empty sketch."""
+        if not self.count:
+            return None
+        rank = min(max(math.ceil(q * self.count), 1), self.count)
+        seen = 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen >= rank:
+                return bucket_value(key)
+        return bucket_value(max(self.buckets))
+
+    def quantiles(self, qs: Iterable[float]) -> Dict[str, float]:
+        """Quantiles keyed by percentile, e.g. {"p50": 42.9, "p99": 409.0}."""
+        if not self.count:
+            return {}
+        return {f"p{q * 100:g}": round(self.quantile(q), 2) for q in qs}
+
+    def histogram(self, bins: int, high: Optional[float] = None) -> List[Dict]:
+        """`bins` equal-width price bins from 0 to `high`, the last open-ended.
+
+        `high` defaults to the 99th percentile rounded up to two significant
+        digits, so a few very expensive products do not squash every other
+        bin. Each bucket is counted in the bin of its middle value.
+        """
+        if not self.count:
+            return []
+        if high is None:
+            high = _round_up(self.quantile(0.99))
+        width = (high or 1.0) / bins
+
+        counts = [0] * bins
+        for key, count in self.buckets.items():
+            counts[min(int(bucket_value(key) / width), bins - 1)] += count
+        return [
+            {
+                "low": round(i * width, 2),
+                "high": round((i + 1) * width, 2) if i < bins - 1 else None,
+                "count": count,
+            }
+            for i, count in enumerate(counts)
+        ]
+
+    def to_dict(self) -> Dict:
+        return {
+            "subbuckets": SKETCH_SUBBUCKETS,
+            "count": self.count,
+            "buckets": sorted(self.buckets.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PriceSketch":
+        if data["subbuckets"] != SKETCH_SUBBUCKETS:
+            raise ValueError(
+                f"Sketch has {data['subbuckets']} sub-buckets, expected {SKETCH_SUBBUCKETS}"
+            )
+        sketch = cls()
+        sketch.buckets = {key: count for key, count in data["buckets"]}
+        sketch.count = data["count"]
+        return sketch
+
+
+def _round_up(value: float) -> float:
+    """Round up to two significant digits: 843.27 -> 850."""
+    if value <= 0:
+        return 0.0
+    magnitude = 10.0 ** (math.floor(math.log10(value)) - 1)
+    return round(math.ceil(round(value / magnitude, 9)) * magnitude, 9)
@@ -1,80 +1,85 @@
 import logging
-from typing import List, Dict
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 from datetime import datetime, timezone
 
 from models.stats import ProductStats, BrandInfo
+from utils.products import ProductRecord, as_records, project_product
+from utils.sketches import PriceSketch, cached_sketch_key, key_cache
+from config import STATS_PRICE_HISTOGRAM_BINS, STATS_PRICE_QUANTILES
 
 logger = logging.getLogger(__name__)
 
+PRICE_RANGES = ("0-50", "51-100", "101-200", "201-500", "500+")
+TOP_BRANDS_LIMIT = 10
 
-def calculate_stats(products: List[dict]) -> ProductStats:
-    """Calculate various statistics from products data."""
-    if not products:
-        logger.warning("No products provided to calculate_stats")
-        return None
+# (price range, price, brand, categories) a single product adds to the stats
+Contribution = Tuple[str, float, str, Tuple[str, ...]]
 
-    logger.info(f"Starting stats calculation for {len(products)} products")
 
-    # Price ranges for grouping
-    price_ranges = {"0-50": 0, "51-100": 0, "101-200": 0, "201-500": 0, "500+": 0}
+def price_range(price: float) -> str:
+    if price <= 50:
+        return "0-50"
+    elif price <= 100:
+        return "51-100"
+    elif price <= 200:
+        return "101-200"
+    elif price <= 500:
+        return "201-500"
+    return "500+"
 
-    total_price = 0
-    brands = {}
-    categories = {}
 
-    for product in products:
-        attrs = product["attributes"]
-
-        try:
-            price = float(attrs["gross_price"])
+def record_contribution(record: ProductRecord) -> Optional[Contribution]:
+    """What a product adds to the stats, or None if it has no usable price."""
+    if record.price is None:
+        return None
+    return price_range(record.price), record.price, record.brand, record.categories
 
-            # Update price ranges
-            if price <= 50:
-                price_ranges["0-50"] += 1
-            elif price <= 100:
-                price_ranges["51-100"] += 1
-            elif price <= 200:
-                price_ranges["101-200"] += 1
-            elif price <= 500:
-                price_ranges["201-500"] += 1
-            else:
-                price_ranges["500+"] += 1
 
-            # Update total price for average calculation
-            total_price += price
+def product_contribution(product: dict) -> Optional[Contribution]:
+    """Extract what a raw ODA item adds to the stats."""
+    return record_contribution(project_product(product))
 
-            # Update brand counts - handle None values
-            brand = attrs.get("brand")
-            if brand is not None and isinstance(brand, str) and brand.strip():
-                brand_name = brand.strip()
-                brands[brand_name] = brands.get(brand_name, 0) + 1
-            else:
-                brands["Unknown"] = brands.get("Unknown", 0) + 1
 
-            # Update category counts (using client_classifiers as categories)
-            for classifier in attrs.get("client_classifiers", []):
-                category = classifier["name"]
-                categories[category] = categories.get(category, 0) + 1
+def rank_brands(brands: Iterable[Tuple[str, int]]) -> List[BrandInfo]:
+    """Pick the top brands by count; ties are ordered by name."""
+    ranked = sorted(brands, key=lambda x: (-x[1], x[0]))[:TOP_BRANDS_LIMIT]
+    return [BrandInfo(name=name, count=count) for name, count in ranked]
 
-        except (KeyError, ValueError) as e:
-            logger.warning(f"Error processing product {attrs.get('id')}: {str(e)}")
-            continue
 
-    # Calculate top brands with validation
-    valid_brands = [
-        BrandInfo(name=k, count=v)
-        for k, v in brands.items()
-        if isinstance(k, str) and isinstance(v, int)
-    ]
+def build_stats(
+    total_products: int,
+    total_price: float,
+    price_ranges: Dict[str, int],
+    brands: Dict[str, int],
+    categories: Dict[str, int],
+    top_brands: Optional[List[BrandInfo]] = None,
+    price_sketch: Optional[PriceSketch] = None,
+) -> ProductStats:
+    """Finalize aggregated counters into ProductStats.
 
-    top_brands = sorted(valid_brands, key=lambda x: x.count, reverse=True)[:10]
+    Brands tied on count are ordered by name and categories are sorted, so the
+    result does not depend on the order products were aggregated in. Engines
+    that already ranked the brands can pass `top_brands`. Price quantiles and
+    the histogram come from `price_sketch`, which is order-independent too.
+    """
+    if top_brands is None:
+        top_brands = rank_brands(brands.items())
 
     stats = ProductStats(
-        total_products=len(products),
-        average_price=round(total_price / len(products), 2) if products else 0,
-        price_ranges=price_ranges,
+        total_products=total_products,
+        average_price=round(total_price / total_products, 2) if total_products else 0,
+        price_ranges={name: price_ranges.get(name, 0) for name in PRICE_RANGES},
         top_brands=top_brands,
-        categories=categories,
+        categories=dict(sorted(categories.items())),
+        price_quantiles=(
+            price_sketch.quantiles(STATS_PRICE_QUANTILES) if price_sketch else {}
+        ),
+        price_histogram=(
+            price_sketch.histogram(STATS_PRICE_HISTOGRAM_BINS) if price_sketch else []
+        ),
+        distinct_brands=len(brands),
+        distinct_categories=len(categories),
         last_updated=datetime.now(timezone.utc).isoformat(),
     )
 
@@ -84,3 +89,233 @@ def calculate_stats(products: List[dict]) -> ProductStats:
     logger.info(f"Top brand: {top_brands[0].name if top_brands else 'None'}")
 
     return stats
+
+
+class ExactSum:
+    """Running float sum that supports removal without accumulating error.
+
+    Keeps Shewchuk's non-overlapping partials, so `value()` equals
+    `math.fsum` over the values currently in the sum.
+    """
+
+    def __init__(self):
+        self._partials: List[float] = []
+
+    def add(self, x: float):
+        i = 0
+        for y in self._partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            hi = x + y
+            lo = y - (hi - x)
+            if lo:
+                self._partials[i] = lo
+                i += 1
+            x = hi
+        self._partials[i:] = [x]
+
+    def remove(self, x: float):
+        self.add(-x)
+
+    def merge(self, other: "ExactSum"):
+        """Add everything summed by `other`, still exactly."""
+        for partial in other._partials:
+            self.add(partial)
+
+    def value(self) -> float:
+        return math.fsum(self._partials)
+
+
+class StatsAccumulator:
+    """Folds products into stats counters as they arrive, page by page.
+
+    Memory is bounded by the number of distinct brands and categories and the
+    range of prices, not by the number of products.
+    """
+
+    def __init__(self):
+        self.total_products = 0
+        self.price_ranges = dict.fromkeys(PRICE_RANGES, 0)
+        self.total_price = ExactSum()
+        self.brands: Dict[str, int] = {}
+        self.categories: Dict[str, int] = {}
+        self.price_sketch = PriceSketch()
+
+    def add(self, records: Iterable[ProductRecord]):
+        price_ranges, brands, categories = (
+            self.price_ranges,
+            self.brands,
+            self.categories,
+        )
+        add_price = self.total_price.add
+        sketch_buckets, cached_key = self.price_sketch.buckets, key_cache.get
+        priced = 0
+
+        for record in records:
+            self.total_products += 1
+            price = record.price
+            if price is None:
+                continue
+
+            price_ranges[price_range(price)] += 1
+            add_price(price)
+            # PriceSketch.add, inlined for the hot loop
+            key = cached_key(price)
+            if key is None:
+                key = cached_sketch_key(price)
+            sketch_buckets[key] = sketch_buckets.get(key, 0) + 1
+            priced += 1
+            brands[record.brand] = brands.get(record.brand, 0) + 1
+            for category in record.categories:
+                categories[category] = categories.get(category, 0) + 1
+        self.price_sketch.count += priced
+
+    def merge(self, other: "StatsAccumulator"):
+        """Fold in the counters of an accumulator that saw other products.
+
+        Counts, the exact price sum and the price sketch are associative, so
+        merging partial accumulators gives the same stats as one pass over
+        every product.
+        """
+        self.total_products += other.total_products
+        for name, count in other.price_ranges.items():
+            self.price_ranges[name] += count
+        self.total_price.merge(other.total_price)
+        self.price_sketch.merge(other.price_sketch)
+        for counter, counts in (
+            (self.brands, other.brands),
+            (self.categories, other.categories),
+        ):
+            for key, count in counts.items():
+                counter[key] = counter.get(key, 0) + count
+
+    def apply(self, contribution: Optional[Contribution], sign: int = 1):
+        """Add (or with sign=-1 remove) one product contribution."""
+        if contribution is None:
+            return
+
+        bucket, price, brand, categories = contribution
+        self.price_ranges[bucket] += sign
+        self.total_price.add(price * sign)
+        self.price_sketch.add(price, sign)
+        _bump(self.brands, brand, sign)
+        for category in categories:
+            _bump(self.categories, category, sign)
+
+    def finish(self) -> ProductStats:
+        if not self.total_products:
+            logger.warning("No products provided to calculate_stats")
+            return None
+
+        return build_stats(
+            self.total_products,
+            self.total_price.value(),
+            self.price_ranges,
+            self.brands,
+            self.categories,
+            price_sketch=self.price_sketch,
+        )
+
+
+def calculate_stats(products: List[Union[dict, ProductRecord]]) -> ProductStats:
+    """Calculate various statistics from raw products or projected records."""
+    if not products:
+        logger.warning("No products provided to calculate_stats")
+        return None
+
+    logger.info(f"Starting stats calculation for {len(products)} products")
+
+    accumulator = StatsAccumulator()
+    accumulator.add(as_records(products))
+    return accumulator.finish()
+
+
+class IncrementalStatsAggregator:
+    """Keeps running stats counters and updates them from catalog diffs.
+
+    Each product's contribution is remembered by product id. A new snapshot is
+    diffed against the previous one and only added, removed and changed
+    products touch the counters. The result matches `calculate_stats` over the
+    same snapshot.
+
+    Snapshots can be streamed in with `begin()`, `add()` per page and
+    `finish()`. Counters are only modified in `finish()`, so an abandoned
+    snapshot (e.g. a failed crawl) leaves the previous state intact.
+    """
+
+    def __init__(self):
+        self._contributions: Dict[Tuple[Any, int], Optional[Contribution]] = {}
+        self._counters = StatsAccumulator()
+        self._pending: Dict[Tuple[Any, int], Optional[Contribution]] = {}
+        self._occurrences: Dict[Any, int] = {}
+        # Share of products added, changed or removed by the last snapshot
+        self.change_ratio: Optional[float] = None
+
+    def begin(self):
+        """Start collecting a new snapshot, discarding any unfinished one."""
+        self._pending = {}
+        self._occurrences = {}
+
+    def add(self, records: Iterable[ProductRecord]):
+        """Record the contributions of one page of the snapshot being collected."""
+        for record in records:
+            # Duplicated ids are counted once per occurrence, like a full recompute
+            occurrence = self._occurrences.get(record.id, 0)
+            self._occurrences[record.id] = occurrence + 1
+            self._pending[(record.id, occurrence)] = record_contribution(record)
+
+    @property
+    def price_sketch(self) -> PriceSketch:
+        return self._counters.price_sketch
+
+    def finish(self) -> ProductStats:
+        """Diff the collected snapshot against the previous one and apply it."""
+        contributions, self._pending = self._pending, {}
+        self._occurrences = {}
+        if not contributions:
+            logger.warning("No products provided to IncrementalStatsAggregator")
+            return None
+
+        added = changed = removed = 0
+        for key, contribution in contributions.items():
+            if key not in self._contributions:
+                self._counters.apply(contribution, 1)
+                added += 1
+            else:
+                previous = self._contributions[key]
+                if previous != contribution:
+                    self._counters.apply(previous, -1)
+                    self._counters.apply(contribution, 1)
+                    changed += 1
+
+        for key in self._contributions.keys() - contributions.keys():
+            self._counters.apply(self._contributions[key], -1)
+            removed += 1
+
+        previous = len(self._contributions)
+        self.change_ratio = (
+            (added + changed + removed) / max(previous, len(contributions))
+            if previous
+            else None
+        )
+        self._contributions = contributions
+        self._counters.total_products = len(contributions)
+        logger.info(
+            f"Incremental stats update: {added} added, {changed} changed, {removed} removed"
+        )
+
+        return self._counters.finish()
+
+    def update(self, products: List[Union[dict, ProductRecord]]) -> ProductStats:
+        """Apply a complete catalog snapshot and return the resulting stats."""
+        self.begin()
+        self.add(as_records(products))
+        return self.finish()
+
+
+def _bump(counter: Dict[str, int], key: str, delta: int):
+    count = counter.get(key, 0) + delta
+    if count:
+        counter[key] = count
+    else:
+        del counter[key]
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+import redis
+import redis.asyncio as aioredis
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+# The stub ODA server and the synthetic catalog
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+
+import services.oda as oda  # noqa: E402
+from services.page_store import page_store  # noqa: E402
+from stub_oda import StubOdaServer  # noqa: E402
+
+# Scratch database for the tests that need a real Redis; they are skipped if
+# it is unreachable
+REDIS_TEST_URL = os.getenv("REDIS_TEST_URL", "redis://localhost:6379/15")
+
+
+@pytest.fixture
+def redis_url() -> str:
+    client = redis.Redis.from_url(REDIS_TEST_URL)
+    try:
+        client.ping()
+    except redis.ConnectionError:
+        pytest.skip(f"Redis not available at {REDIS_TEST_URL}")
+    finally:
+        client.close()
+    return REDIS_TEST_URL
+
+
+@pytest.fixture
+def redis_client(redis_url):
+    """Client of the scratch database, emptied before and after the test."""
+    client = redis.Redis.from_url(redis_url, decode_responses=True)
+    client.flushdb()
+    yield client
+    client.flushdb()
+    client.close()
+
+
+@pytest.fixture
+def run_redis(redis_client):
+    """Runs `coro_fn(client)` to completion with an asyncio client, as the
+    service would call it."""
+
+    def run(coro_fn):
+        async def main():
+            client = aioredis.Redis.from_url(REDIS_TEST_URL, decode_responses=True)
+            try:
+                return await coro_fn(client)
+            finally:
+                await client.aclose()
+
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def serve_oda(monkeypatch):
+    """Starts a stub ODA server with the given options for the crawler to use,
+    unthrottled and without latency unless asked for."""
+    servers = []
+
+    def start(**options) -> StubOdaServer:
+        server = StubOdaServer(**{"latency": 0, **options}).start()
+        servers.append(server)
+        monkeypatch.setattr(
+            oda, "ODA_API_SEARCH_BASE_URL", f"{server.base_url}/search/mixed/"
+        )
+        monkeypatch.setattr(oda, "ODA_RATE_LIMIT", 0)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """The page store, recording up to two crawls in a temporary directory."""
+    monkeypatch.setattr(page_store, "root", tmp_path)
+    monkeypatch.setattr(page_store, "max_crawls", 2)
+    monkeypatch.setattr(page_store, "_latest", None)
+    monkeypatch.setattr(page_store, "_latest_loaded", False)
+    yield page_store
+    asyncio.run(page_store.abort())
+
+
+@pytest.fixture
+def refresh():
+    """Plans and runs one refresh of a PageTracker, as the stats task does;
+    returns the plan and the products, or None if the crawl was skipped."""
+
+    def run(tracker):
+        async def main():
+            plan = await tracker.plan()
+            if plan.unchanged:
+                await tracker.skip()
+                return plan, None
+            products = []
+            async for page in tracker.crawl(plan):
+                products.extend(page)
+            return plan, products
+
+        return asyncio.run(main())
+
+    return run
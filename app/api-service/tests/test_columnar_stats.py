@@ -0,0 +1,64 @@
+import json
+import random
+
+import pytest
+
+from utils.stats import calculate_stats
+
+pytest.importorskip("numpy")
+from utils.columnar import calculate_stats_columnar  # noqa: E402
+
+
+def encode(stats) -> str:
+    return json.dumps(stats.model_dump(exclude={"last_updated"}))
+
+
+def make_products(count: int, brands: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "type": "product",
+            "id": i,
+            "attributes": {
+                "id": i,
+                "gross_price": (
+                    rng.choice(["50", "50.01", "100", "200.00", "500", "999.9"])
+                    if i % 4 == 0
+                    else f"{rng.uniform(1, 900):.2f}"
+                ),
+                "brand": rng.choice(
+                    [f"Brand {b}" for b in range(brands)] + [None, " "]
+                ),
+                "client_classifiers": [
+                    {"name": f"Category {rng.randint(0, 20)}"}
+                    for _ in range(rng.randint(0, 3))
+                ],
+            },
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("brands", [3, 10, 40])
+def test_columnar_output_is_identical_to_python_engine(brands):
+    products = make_products(2000, brands, seed=brands)
+    products[1]["attributes"]["gross_price"] = "n/a"
+    products[2]["attributes"]["client_classifiers"] = [{"name": "Meieri"}, {}]
+
+    assert encode(calculate_stats_columnar(products)) == encode(
+        calculate_stats(products)
+    )
+
+
+def test_top_brands_ties_at_the_cutoff_are_ordered_by_name():
+    products = [
+        {"id": i, "attributes": {"gross_price": "10", "brand": f"Brand {i % 25:02d}"}}
+        for i in range(250)
+    ]
+
+    top = calculate_stats_columnar(products).top_brands
+
+    assert [b.name for b in top] == [f"Brand {i:02d}" for i in range(10)]
+    assert encode(calculate_stats_columnar(products)) == encode(
+        calculate_stats(products)
+    )
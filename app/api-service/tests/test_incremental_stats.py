@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from utils.stats import IncrementalStatsAggregator, calculate_stats
+
+BRANDS = ["Tine", "Q", "Gilde", "Oda", "  Tine  ", "", None]
+CATEGORIES = ["Meieri", "Kjøtt", "Frukt", "Grønnsaker", "Bakeri"]
+
+
+def make_product(product_id: int, rng: random.Random) -> dict:
+    return {
+        "type": "product",
+        "id": product_id,
+        "attributes": {
+            "id": product_id,
+            "gross_price": f"{rng.uniform(1, 900):.2f}",
+            "brand": rng.choice(BRANDS),
+            "client_classifiers": [
+                {"name": name} for name in rng.sample(CATEGORIES, rng.randint(0, 3))
+            ],
+        },
+    }
+
+
+def mutate(products: list, rng: random.Random) -> list:
+    """Reprice, rebrand, drop and add a handful of products."""
+    products = [dict(p, attributes=dict(p["attributes"])) for p in products]
+    for product in rng.sample(products, 5):
+        product["attributes"]["gross_price"] = f"{rng.uniform(1, 900):.2f}"
+    for product in rng.sample(products, 3):
+        product["attributes"]["brand"] = rng.choice(BRANDS)
+    for product in rng.sample(products, 4):
+        products.remove(product)
+    next_id = max(p["id"] for p in products) + 1
+    products.extend(make_product(next_id + i, rng) for i in range(6))
+    rng.shuffle(products)
+    return products
+
+
+def assert_same_stats(incremental, full):
+    assert incremental.model_dump(exclude={"last_updated"}) == full.model_dump(
+        exclude={"last_updated"}
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_matches_full_recompute_across_snapshots(seed):
+    rng = random.Random(seed)
+    products = [make_product(i, rng) for i in range(200)]
+    aggregator = IncrementalStatsAggregator()
+
+    for _ in range(10):
+        assert_same_stats(aggregator.update(products), calculate_stats(products))
+        products = mutate(products, rng)
+
+
+def test_invalid_and_duplicate_products_match_full_recompute():
+    rng = random.Random(42)
+    products = [make_product(i, rng) for i in range(20)]
+    products[3]["attributes"]["gross_price"] = "n/a"
+    del products[4]["attributes"]["gross_price"]
+    products[5]["attributes"]["client_classifiers"] = [{"name": "Meieri"}, {"id": 1}]
+    products.append(products[0])
+
+    aggregator = IncrementalStatsAggregator()
+    assert_same_stats(aggregator.update(products), calculate_stats(products))
+
+    products = products[:-1]
+    products[3] = make_product(3, rng)
+    assert_same_stats(aggregator.update(products), calculate_stats(products))
+
+
+def test_removing_everything_but_one_product_clears_counters():
+    rng = random.Random(7)
+    products = [make_product(i, rng) for i in range(50)]
+    aggregator = IncrementalStatsAggregator()
+    aggregator.update(products)
+
+    stats = aggregator.update(products[:1])
+
+    assert_same_stats(stats, calculate_stats(products[:1]))
+    assert sum(stats.price_ranges.values()) == 1
+    assert len(stats.top_brands) == 1
+
+
+def test_empty_snapshot_returns_none():
+    assert IncrementalStatsAggregator().update([]) is None
+
+
+def test_change_ratio_measures_churn_between_snapshots():
+    rng = random.Random(3)
+    products = [make_product(i, rng) for i in range(100)]
+    aggregator = IncrementalStatsAggregator()
+
+    aggregator.update(products)
+    assert aggregator.change_ratio is None
+
+    aggregator.update(products)
+    assert aggregator.change_ratio == 0
+
+    products = [dict(p, attributes=dict(p["attributes"])) for p in products]
+    for product in products[:5]:
+        product["attributes"]["gross_price"] = "999.99"
+    aggregator.update(products[:-5])
+    assert aggregator.change_ratio == pytest.approx(10 / 100)
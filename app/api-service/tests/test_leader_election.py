@@ -0,0 +1,88 @@
+"""Leader election across real processes against a local Redis."""
+
+import os
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+TTL = 1.0
+
+# Campaigns forever, mirroring is_leader into a hash so the test can observe it
+CANDIDATE = """
+import asyncio, os, sys
+import redis.asyncio as aioredis
+from services.leader import LeaderElection
+
+async def main(url, key, ttl):
+    client = aioredis.Redis.from_url(url, decode_responses=True)
+    election = LeaderElection(client, key=key, ttl=ttl)
+    while True:
+        await election.campaign()
+        await client.hset(key + ":status", election.identity, int(election.is_leader))
+        await asyncio.sleep(ttl / 3)
+
+asyncio.run(main(sys.argv[1], sys.argv[2], float(sys.argv[3])))
+"""
+
+
+@pytest.fixture
+def key(redis_client):
+    return f"test:leader:{uuid.uuid4().hex}"
+
+
+def start_candidates(count: int, url: str, key: str):
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    return [
+        subprocess.Popen([sys.executable, "-c", CANDIDATE, url, key, str(TTL)], env=env)
+        for _ in range(count)
+    ]
+
+
+def leaders(redis_client, key: str, alive: set) -> list:
+    status = redis_client.hgetall(key + ":status")
+    return [
+        identity
+        for identity, flag in status.items()
+        if flag == "1" and int(identity.split(":")[1]) in alive
+    ]
+
+
+def wait_for_single_leader(redis_client, key: str, alive: set, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        current = leaders(redis_client, key, alive)
+        if len(current) == 1 and redis_client.get(key) == current[0]:
+            return current[0]
+        time.sleep(0.1)
+    pytest.fail(
+        f"No single leader after {timeout}s: {leaders(redis_client, key, alive)}"
+    )
+
+
+def test_exactly_one_leader_and_failover(redis_client, redis_url, key):
+    processes = start_candidates(4, redis_url, key)
+    alive = {p.pid for p in processes}
+    try:
+        leader = wait_for_single_leader(redis_client, key, alive, timeout=5)
+
+        # Leadership is stable while the leader is alive
+        for _ in range(10):
+            time.sleep(TTL / 5)
+            assert leaders(redis_client, key, alive) == [leader]
+
+        # Kill the leader without letting it release the lease
+        leader_pid = int(leader.split(":")[1])
+        next(p for p in processes if p.pid == leader_pid).kill()
+        alive.discard(leader_pid)
+
+        successor = wait_for_single_leader(redis_client, key, alive, timeout=TTL * 4)
+        assert successor != leader
+    finally:
+        for process in processes:
+            process.kill()
+            process.wait()
@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+from api.middleware import MetricsMiddleware
+from services.metrics import http_request_seconds
+from utils.metrics import MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", ("op",), (0.1, 1))
+    for value in (0.05, 0.1, 0.5, 2):
+        latency.observe(value, "get")
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+    ]
+    assert lines[2:] == [
+        'latency_seconds_bucket{op="get",le="0.1"} 2',
+        'latency_seconds_bucket{op="get",le="1"} 3',
+        'latency_seconds_bucket{op="get",le="+Inf"} 4',
+        'latency_seconds_sum{op="get"} 2.65',
+        'latency_seconds_count{op="get"} 4',
+    ]
+
+
+def test_counters_gauges_and_collectors():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests", "Requests", ("path",))
+    size = registry.gauge("queue_size", "Queue size")
+    queue = [1, 2, 3]
+    registry.collector(lambda: size.set(len(queue)))
+
+    requests.inc('a"b')
+    requests.inc('a"b', amount=2)
+    text = registry.render()
+    assert 'requests_total{path="a\\"b"} 3' in text
+    assert "queue_size 3" in text
+
+    size.set(None)
+    registry.collectors.clear()
+    assert "\nqueue_size " not in registry.render()
+
+
+def test_middleware_labels_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        if item_id == 0:
+            raise HTTPException(status_code=404)
+        return {"id": item_id}
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            for path in ("/items/1", "/items/2", "/items/0", "/nope"):
+                await c.get(path)
+
+    asyncio.run(run())
+    series = http_request_seconds._series
+    assert series[("GET", "/items/{item_id}", "200")][0][-1] == 0
+    assert sum(series[("GET", "/items/{item_id}", "200")][0]) == 2
+    assert sum(series[("GET", "/items/{item_id}", "404")][0]) == 1
+    assert sum(series[("GET", "unmatched", "404")][0]) == 1
@@ -0,0 +1,60 @@
+"""The shared, pooled ODA client against the stub ODA server."""
+
+import asyncio
+
+import pytest
+
+import services.oda as oda
+from services.oda import OdaClientStats, fetch_all_products
+
+
+@pytest.fixture
+def client_stats(monkeypatch) -> OdaClientStats:
+    stats = OdaClientStats()
+    monkeypatch.setattr(oda, "client_stats", stats)
+    monkeypatch.setattr(oda, "oda_client", None)
+    return stats
+
+
+def test_shared_client_is_reused_across_crawls_and_closed(
+    serve_oda, client_stats, monkeypatch
+):
+    serve_oda(total_products=450)
+
+    def no_new_client():
+        raise AssertionError("a crawl created its own client")
+
+    async def run():
+        client = await oda.init_oda_client()
+        monkeypatch.setattr(oda, "create_oda_client", no_new_client)
+        try:
+            crawls = [await fetch_all_products(concurrency=2) for _ in range(2)]
+        finally:
+            await oda.close_oda_client()
+        return client, crawls
+
+    client, (first, second) = asyncio.run(run())
+
+    assert len(first) == 450 and first == second
+    assert client.is_closed and oda.oda_client is None
+    # 5 pages and at least the 422 past the end, per crawl
+    assert client_stats.requests >= 12
+    # Connections are kept alive across pages and crawls
+    assert client_stats.new_connections < client_stats.requests / 3
+
+
+def test_crawl_without_shared_client_closes_its_own(
+    serve_oda, client_stats, monkeypatch
+):
+    serve_oda(total_products=150)
+    clients = []
+
+    def create_oda_client():
+        clients.append(create())
+        return clients[-1]
+
+    create = oda.create_oda_client
+    monkeypatch.setattr(oda, "create_oda_client", create_oda_client)
+
+    assert len(asyncio.run(fetch_all_products())) == 150
+    assert len(clients) == 1 and clients[0].is_closed
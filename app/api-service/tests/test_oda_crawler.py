@@ -0,0 +1,74 @@
+"""The concurrent, ordered ODA crawler against the stub ODA server."""
+
+import asyncio
+import functools
+
+import httpx
+import pytest
+
+import services.oda as oda
+from config import ODA_MAX_RETRIES
+from services.oda import iter_product_pages
+
+
+def crawl(concurrency: int, start_page: int = 1):
+    """Product ids of each page the crawler yields, in yield order."""
+
+    async def run():
+        return [
+            [product.id for product in page]
+            async for page in iter_product_pages(concurrency, start_page)
+        ]
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("end_mode", ["422", "flag"])
+def test_pagination_ends_inside_the_in_flight_window(serve_oda, end_mode):
+    stub = serve_oda(total_products=250, end_mode=end_mode)
+
+    pages = crawl(concurrency=8)
+
+    assert [len(page) for page in pages] == [100, 100, 50]
+    assert sum(pages, []) == list(range(1, 251))
+    # Pages claimed past the end are discarded, and claiming stops there
+    assert stub.requests <= 3 + 8
+
+
+def test_pages_are_yielded_in_order_under_random_latency(serve_oda):
+    serve_oda(total_products=3000, jitter=0.02)
+
+    pages = crawl(concurrency=6)
+
+    assert len(pages) == 30
+    assert sum(pages, []) == list(range(1, 3001))
+
+
+def test_crawl_resumes_from_start_page(serve_oda):
+    serve_oda(total_products=1000)
+
+    pages = crawl(concurrency=4, start_page=4)
+
+    assert sum(pages, []) == list(range(301, 1001))
+
+
+def test_failures_past_the_end_are_ignored(serve_oda, monkeypatch):
+    # Pages past the end fail for good while the last ones are still loading
+    serve_oda(total_products=250, end_mode="flag", failing_pages={4, 5, 6}, latency=0.2)
+    monkeypatch.setattr(
+        oda,
+        "fetch_page_with_retries",
+        functools.partial(oda.fetch_page_with_retries, max_retries=1),
+    )
+
+    pages = crawl(concurrency=8)
+
+    assert sum(pages, []) == list(range(1, 251))
+
+
+def test_failing_page_ends_the_crawl_after_its_retries(serve_oda):
+    stub = serve_oda(total_products=1000, error_rate=1.0)
+
+    with pytest.raises(httpx.HTTPError):
+        crawl(concurrency=1)
+    assert stub.requests == ODA_MAX_RETRIES
@@ -0,0 +1,95 @@
+"""Recording crawls to the on-disk page store and replaying them."""
+
+import asyncio
+
+import pytest
+
+from services.oda import fetch_all_products
+from services.page_store import page_store
+from services.page_tracker import PageTracker
+from utils.stats import calculate_stats
+
+PAGES = 12
+
+
+@pytest.fixture
+def stub(serve_oda):
+    return serve_oda(total_products=PAGES * 100 - 30)
+
+
+def replayed(crawl_id: str):
+    return [p for page in page_store.iter_records(crawl_id) for p in page]
+
+
+def test_crawls_are_stored_and_replay_offline(stub, store, monkeypatch, refresh):
+    monkeypatch.setattr("services.page_tracker.random.sample", lambda pages, k: [6, 9])
+    tracker = PageTracker(probe_pages=2, full_crawl_interval=3600, max_refetch=0.9)
+    _, products = refresh(tracker)
+    [first] = store.crawls()
+    assert store.load_index(first)["last_page"] == PAGES
+    assert replayed(first) == products
+
+    # Unchanged catalog: nothing new is stored
+    assert refresh(tracker)[1] is None
+    assert store.crawls() == [first]
+
+    # Partial crawl: reused pages are copied from the first crawl
+    stub.reprice(550)
+    _, products = refresh(tracker)
+    second = store.crawls()[-1]
+    assert second != first
+    assert store.stats["pages_copied"] > 0
+    assert replayed(second) == products == asyncio.run(fetch_all_products())
+
+    stub.stop()  # Replay needs no network
+    stats = calculate_stats(replayed(second)).model_dump(exclude={"last_updated"})
+    assert stats == calculate_stats(products).model_dump(exclude={"last_updated"})
+
+
+def test_refetches_are_conditional(stub, store, refresh):
+    tracker = PageTracker(probe_pages=0, full_crawl_interval=0)
+    refresh(tracker)
+    stub.reprice(150)
+
+    _, products = refresh(tracker)
+    # Every page but the repriced one came back 304, from the stored bodies
+    assert stub.not_modified == PAGES - 1
+    assert products == replayed(store.crawls()[-1])
+
+    refresh(tracker)
+    assert len(store.crawls()) == 2
+
+
+def test_abandoned_and_incomplete_crawls_are_dropped(stub, store):
+    tracker = PageTracker(probe_pages=0, full_crawl_interval=0)
+
+    async def abandon():
+        crawl = tracker.crawl(await tracker.plan())
+        await crawl.__anext__()
+        await crawl.aclose()
+
+    asyncio.run(abandon())
+    assert store.writer is None
+    assert list(store.root.iterdir()) == []
+
+    async def incomplete():
+        await store.begin()
+        await store.record(1, b'{"items": []}', {})
+        return await store.finish(2)
+
+    assert asyncio.run(incomplete()) is None
+    assert store.crawls() == []
+    assert list(store.root.iterdir()) == []
+
+
+def test_pruning_leaves_crawls_in_progress_alone(stub, store, refresh):
+    # Another process sharing the path is still recording this one
+    in_progress = store.root / "20000101T000000000000Z"
+    in_progress.mkdir()
+    tracker = PageTracker(probe_pages=0, full_crawl_interval=0)
+
+    for _ in range(3):
+        refresh(tracker)
+
+    assert len(store.crawls()) == 2
+    assert in_progress.is_dir()
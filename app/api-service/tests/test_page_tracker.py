@@ -0,0 +1,121 @@
+"""Change detection against the stub ODA server with a mutating catalog."""
+
+import asyncio
+
+import pytest
+
+import services.page_tracker
+from services.oda import fetch_all_products
+from services.page_tracker import PageTracker
+from utils.stats import calculate_stats
+
+PAGES = 20
+
+
+@pytest.fixture
+def stub(serve_oda):
+    return serve_oda(total_products=PAGES * 100 - 50)
+
+
+def assert_current(products, stub):
+    expected = asyncio.run(fetch_all_products())
+    assert products == expected
+    assert calculate_stats(products).model_dump(
+        exclude={"last_updated"}
+    ) == calculate_stats(expected).model_dump(exclude={"last_updated"})
+    assert len(products) == stub.total_products
+
+
+def test_unchanged_catalog_is_skipped(stub, refresh):
+    tracker = PageTracker(probe_pages=3, full_crawl_interval=3600, max_refetch=0.5)
+    plan, products = refresh(tracker)
+    assert plan.full
+    assert tracker.last_page == PAGES
+
+    stub.requests = 0
+    plan, products = refresh(tracker)
+    assert plan.unchanged and products is None
+    # First, last two, one past the end and 3 random pages
+    assert stub.requests == 7
+    assert tracker.stats["skipped_crawls"] == 1
+
+
+def test_probed_change_refetches_neighbouring_range(stub, store, monkeypatch, refresh):
+    tracker = PageTracker(probe_pages=4, full_crawl_interval=3600, max_refetch=0.5)
+    refresh(tracker)
+    monkeypatch.setattr(
+        services.page_tracker.random, "sample", lambda pages, k: [5, 8, 12, 15]
+    )
+
+    # Page 10 is not probed, so its change goes unnoticed
+    stub.reprice(950)
+    plan, products = refresh(tracker)
+    assert plan.unchanged
+
+    stub.reprice(1150)  # page 12
+    stub.requests = 0
+    plan, products = refresh(tracker)
+    assert not plan.full and plan.tail_from is None
+    assert plan.pages == set(range(9, 15))
+    # 8 probes, then the pages between the probes around page 12
+    assert stub.requests == 8 + 5
+    assert tracker.stats["pages_reused"] == PAGES + PAGES - 6
+
+    refresh(tracker)
+    tracker.full_crawl_interval = 0
+    plan, products = refresh(tracker)
+    assert plan.full
+    assert_current(products, stub)
+
+
+@pytest.mark.parametrize("change", ["add", "remove"])
+def test_growth_and_shrinkage_recrawl_the_tail(stub, store, change, refresh):
+    tracker = PageTracker(probe_pages=0, full_crawl_interval=3600, max_refetch=0.5)
+    refresh(tracker)
+
+    if change == "add":
+        stub.add(120)
+    else:
+        stub.remove(stub.total_products - 1)
+    plan, products = refresh(tracker)
+    assert not plan.full and plan.tail_from is not None
+    assert_current(products, stub)
+    assert tracker.last_page == stub.last_page
+
+
+def test_wide_change_falls_back_to_full_crawl(stub, refresh):
+    tracker = PageTracker(probe_pages=0, full_crawl_interval=3600, max_refetch=0.5)
+    refresh(tracker)
+
+    stub.revision += 1
+    plan, products = refresh(tracker)
+    assert plan.full
+    assert_current(products, stub)
+
+
+def test_changes_without_a_stored_crawl_are_crawled_in_full(stub, refresh):
+    tracker = PageTracker(probe_pages=0, full_crawl_interval=3600, max_refetch=0.5)
+    refresh(tracker)
+    assert tracker.crawl_id is None
+
+    stub.add(1)
+    plan, products = refresh(tracker)
+    assert plan.full
+    assert_current(products, stub)
+
+
+def test_pruned_crawl_is_not_reused(stub, store, monkeypatch, refresh):
+    tracker = PageTracker(probe_pages=0, full_crawl_interval=3600, max_refetch=0.5)
+    refresh(tracker)
+
+    def pruned(*args):
+        raise FileNotFoundError("pages.bin")
+
+    monkeypatch.setattr(store, "_reuse_page", pruned)
+
+    stub.add(1)
+    with pytest.raises(RuntimeError):
+        refresh(tracker)
+    plan, products = refresh(tracker)
+    assert plan.full
+    assert_current(products, stub)
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import math
+import random
+
+import pytest
+from fastapi import HTTPException
+
+from utils.products import project_page, project_product
+from utils.serialization import pack_value
+from utils.stats import calculate_stats, rank_brands, record_contribution
+
+pytest.importorskip("numpy")
+import api.endpoints as endpoints  # noqa: E402
+import services.stats_cache as stats_cache  # noqa: E402
+from services.stats_cache import (  # noqa: E402
+    STATS_INDEX_KEY,
+    STATS_KEY,
+    STATS_VERSION_KEY,
+    StatsCache,
+)
+from services.stats_index import StatsIndex, encode_index  # noqa: E402
+from utils.product_index import ProductIndex  # noqa: E402
+from utils.product_index import ProductIndexBuilder  # noqa: E402
+
+BRANDS = ["Tine", "Q", "Gilde", "Oda", None]
+CATEGORIES = ["Meieri", "Kjøtt", "Frukt", "Grønnsaker", "Bakeri"]
+
+
+def make_products(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "type": "product",
+            "id": i,
+            "attributes": {
+                "id": i,
+                "gross_price": rng.choice(
+                    ["25", "50", "n/a", f"{rng.uniform(1, 900):.2f}"]
+                ),
+                "brand": rng.choice(BRANDS),
+                "client_classifiers": [
+                    {"name": name} for name in rng.sample(CATEGORIES, rng.randint(0, 3))
+                ],
+            },
+        }
+        for i in range(count)
+    ]
+
+
+def build_index(products: list):
+    builder = ProductIndexBuilder()
+    for start in range(0, len(products), 100):
+        builder.add(project_page(products[start : start + 100]))
+    return builder.finish()
+
+
+def brute_force(products, categories, brands, buckets):
+    selected, total = [], 0
+    for product in products:
+        record = project_product(product)
+        if categories and not set(categories) & set(record.categories):
+            continue
+        if brands and record.brand not in brands:
+            continue
+        total += 1
+        contribution = record_contribution(record)
+        if contribution is not None:
+            _, price, brand, product_categories = contribution
+            selected.append((price, brand, product_categories))
+
+    underflow = buckets[0] > 0
+    counts = [0] * (len(buckets) + underflow)
+    for price, _, _ in selected:
+        if underflow and price < buckets[0]:
+            counts[0] += 1
+        else:
+            counts[underflow + sum(price > edge for edge in buckets[1:])] += 1
+    brand_counts, category_counts = {}, {}
+    for _, brand, product_categories in selected:
+        brand_counts[brand] = brand_counts.get(brand, 0) + 1
+        for category in product_categories:
+            category_counts[category] = category_counts.get(category, 0) + 1
+
+    return {
+        "total_products": total,
+        "average_price": (
+            round(math.fsum(price for price, _, _ in selected) / total, 2)
+            if total
+            else 0
+        ),
+        "price_counts": counts,
+        "top_brands": [b.model_dump() for b in rank_brands(brand_counts.items())],
+        "categories": dict(sorted(category_counts.items())),
+    }
+
+
+def test_unfiltered_matches_calculate_stats():
+    products = make_products(2000, seed=1)
+    expected = calculate_stats(products).model_dump(exclude={"last_updated"})
+
+    assert build_index(products).stats() == expected
+
+
+@pytest.mark.parametrize(
+    "categories,brands",
+    [
+        (["Meieri"], []),
+        ([], ["Tine"]),
+        (["Meieri", "Bakeri"], ["Tine", "Unknown"]),
+        (["Kjøtt"], ["Q"]),
+        (["Missing"], []),
+    ],
+)
+@pytest.mark.parametrize(
+    "buckets,labels",
+    [
+        ([0, 25, 50, 100], ["0-25", "25-50", "50-100", "100+"]),
+        ([10, 20, 30], ["<10", "10-20", "20-30", "30+"]),
+    ],
+)
+def test_filters_match_brute_force(categories, brands, buckets, labels):
+    products = make_products(2000, seed=2)
+
+    result = build_index(products).stats(categories, brands, buckets)
+    expected = brute_force(products, categories, brands, buckets)
+
+    assert result["total_products"] == expected["total_products"]
+    assert result["average_price"] == expected["average_price"]
+    assert list(result["price_ranges"]) == labels
+    assert list(result["price_ranges"].values()) == expected["price_counts"]
+    assert result["top_brands"] == expected["top_brands"]
+    assert result["categories"] == expected["categories"]
+
+
+def test_query_results_are_memoized_per_normalized_query():
+    cache = StatsIndex(max_entries=2)
+    cache.publish(build_index(make_products(500, seed=3)), version=4)
+
+    first = cache.query(["Meieri", "Frukt"], ["Tine"])
+    assert cache.query(["Frukt", "Meieri", "Frukt"], ["Tine"]) is first
+    assert json.loads(first)["version"] == 4
+
+    cache.query(["Bakeri"])
+    cache.query(["Kjøtt"])
+    assert cache.query(["Meieri", "Frukt"], ["Tine"]) is not first
+
+
+def test_no_index_yet():
+    assert StatsIndex().query(["Meieri"]) is None
+
+
+def test_index_survives_serialization():
+    index = build_index(make_products(1000, seed=4))
+
+    loaded = ProductIndex.from_bytes(index.to_bytes())
+
+    for categories, brands, buckets in [
+        ((), (), None),
+        (["Meieri", "Frukt"], ["Tine", None], [10, 20, 30]),
+        (["Bakeri"], [], [0, 50]),
+    ]:
+        assert loaded.stats(categories, brands, buckets) == index.stats(
+            categories, brands, buckets
+        )
+
+
+def test_followers_load_the_index_with_the_snapshot(
+    redis_client, run_redis, monkeypatch
+):
+    follower = StatsIndex()
+    monkeypatch.setattr(stats_cache, "stats_index", follower)
+    index = build_index(make_products(500, seed=5))
+    body = json.dumps({"total_products": 500}).encode()
+    redis_client.set(STATS_KEY, pack_value(body), ex=600)
+    redis_client.set(STATS_VERSION_KEY, 3)
+    redis_client.set(STATS_INDEX_KEY, encode_index(index), ex=600)
+
+    run_redis(StatsCache(check_interval=0, path="").get)
+
+    assert follower.version == 3
+    assert json.loads(follower.query(["Meieri"]))["total_products"] == (
+        index.stats(["Meieri"])["total_products"]
+    )
+
+
+@pytest.mark.parametrize(
+    "buckets",
+    [
+        "0,nan,50",
+        "0,25,inf",
+        "-inf,0",
+        "10,5",
+        "10",
+        "0,a",
+        ",".join(map(str, range(51))),
+    ],
+)
+def test_slice_rejects_invalid_buckets(buckets):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(endpoints.get_stats_slice([], [], buckets))
+    assert error.value.status_code == 400
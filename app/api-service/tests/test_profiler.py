@@ -0,0 +1,46 @@
+import time
+from collections import Counter
+
+from services.profiler import StackSampler, collapse, top_functions
+
+
+def busy_loop(seconds: float):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+def test_sampler_collects_collapsed_stacks():
+    sampler = StackSampler(interval=0.002)
+    sampler.start()
+    busy_loop(0.3)
+    counts = sampler.stop()
+
+    assert sampler.samples > 10
+    hot = sum(count for stack, count in counts.items() if "busy_loop" in stack)
+    assert hot / sampler.samples > 0.8
+    stack = next(stack for stack in counts if "busy_loop" in stack)
+    frames = stack.split(";")
+    # Root first, each frame labelled with its file
+    assert frames.index(next(f for f in frames if f.startswith("busy_loop"))) > 0
+    assert any("test_profiler.py" in frame for frame in frames)
+
+
+def test_collapse_is_bounded_and_keeps_totals():
+    counts = Counter({f"main;work_{i}": i + 1 for i in range(100)})
+    text = collapse(counts, max_bytes=200)
+
+    assert len(text) <= 200 + len("\n[truncated] 99999")
+    lines = text.splitlines()
+    assert lines[0] == "main;work_99 100"
+    assert lines[-1].startswith("[truncated] ")
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) == sum(counts.values())
+
+
+def test_top_functions_counts_self_samples():
+    counts = Counter({"main;parse": 6, "main;aggregate;parse": 2, "main;select": 2})
+    top = top_functions(counts)
+    assert top[0] == {"function": "parse", "samples": 8, "share": 0.8}
+    assert top[1]["function"] == "select"
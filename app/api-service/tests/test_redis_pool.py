@@ -0,0 +1,85 @@
+"""The shared, blocking Redis connection pool against a local Redis."""
+
+import asyncio
+import time
+import uuid
+from urllib.parse import urlparse
+
+import pytest
+import redis
+import redis.asyncio as aioredis
+
+import services.redis
+from services.redis import create_connection_pool
+
+
+@pytest.fixture
+def make_pool(redis_url, monkeypatch):
+    """Pools of `size` connections to the test Redis, waiting up to `timeout`."""
+    url = urlparse(redis_url)
+    monkeypatch.setattr(services.redis, "REDIS_HOST", url.hostname)
+    monkeypatch.setattr(services.redis, "REDIS_PORT", url.port or 6379)
+
+    def make_pool(size: int, timeout: float):
+        monkeypatch.setattr(services.redis, "REDIS_MAX_CONNECTIONS", size)
+        monkeypatch.setattr(services.redis, "REDIS_POOL_TIMEOUT", timeout)
+        return create_connection_pool()
+
+    return make_pool
+
+
+async def hold_connection(client, seconds: float):
+    """Keep one pooled connection busy for `seconds`, without writing anything."""
+    await client.blpop(f"pool:test:{uuid.uuid4().hex}", timeout=seconds)
+
+
+def test_exhausted_pool_waits_for_a_connection(make_pool):
+    pool = make_pool(size=2, timeout=5)
+
+    async def run():
+        client = aioredis.Redis(connection_pool=pool)
+        try:
+            holders = [
+                asyncio.create_task(hold_connection(client, 0.5)) for _ in range(2)
+            ]
+            await asyncio.sleep(0.1)
+            start = time.monotonic()
+            # Every request still gets an answer, once a connection is released
+            answers = await asyncio.gather(*(client.ping() for _ in range(10)))
+            waited = time.monotonic() - start
+            await asyncio.gather(*holders)
+            return answers, waited, len(pool._available_connections)
+        finally:
+            await client.aclose()
+            await pool.disconnect()
+
+    answers, waited, created = asyncio.run(run())
+
+    assert all(answers)
+    assert waited >= 0.3
+    assert created == 2
+
+
+def test_pool_timeout_raises_connection_error(make_pool):
+    pool = make_pool(size=1, timeout=0.2)
+
+    async def run():
+        client = aioredis.Redis(connection_pool=pool)
+        try:
+            holder = asyncio.create_task(hold_connection(client, 1))
+            await asyncio.sleep(0.1)
+            start = time.monotonic()
+            with pytest.raises(redis.ConnectionError, match="No connection available"):
+                await client.ping()
+            waited = time.monotonic() - start
+            await holder
+            # The connection is handed on once it is released
+            return waited, await client.ping()
+        finally:
+            await client.aclose()
+            await pool.disconnect()
+
+    waited, answer = asyncio.run(run())
+
+    assert 0.15 <= waited < 0.9
+    assert answer
@@ -0,0 +1,51 @@
+"""SCAN-based key listing against a local Redis."""
+
+import pytest
+
+from services.redis import scan_keys
+
+
+@pytest.fixture
+def keyspace(redis_client):
+    with redis_client.pipeline() as pipe:
+        for i in range(250):
+            pipe.set(f"scan:test:{i}", "x" * i, ex=600)
+        for i in range(30):
+            pipe.rpush(f"other:{i}", i)
+        pipe.execute()
+
+
+@pytest.fixture
+def scan_all(keyspace, run_redis):
+    def scan_all(match: str, count: int):
+        async def scan(client):
+            pages, keys, cursor = 0, {}, 0
+            while True:
+                cursor, page = await scan_keys(client, cursor, match, count)
+                pages += 1
+                keys.update(page)
+                if cursor == 0:
+                    return pages, keys
+
+        return run_redis(scan)
+
+    return scan_all
+
+
+def test_pages_cover_every_matching_key(scan_all):
+    pages, keys = scan_all("scan:test:*", 50)
+
+    assert set(keys) == {f"scan:test:{i}" for i in range(250)}
+    assert pages > 1
+    detail = keys["scan:test:200"]
+    assert detail["type"] == "string"
+    assert 0 < detail["ttl"] <= 600
+    assert detail["memory_bytes"] >= 200
+
+
+def test_default_match_lists_every_type(scan_all):
+    _, keys = scan_all("*", 1000)
+
+    assert len(keys) == 280
+    assert keys["other:3"]["type"] == "list"
+    assert keys["other:3"]["ttl"] == -1
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+
+from services.refresh_scheduler import RefreshScheduler
+
+
+def make_scheduler(**kwargs) -> RefreshScheduler:
+    options = dict(
+        min_interval=60,
+        max_interval=960,
+        change_high=0.01,
+        change_low=0.001,
+        backoff_base=10,
+    )
+    options.update(kwargs)
+    return RefreshScheduler(**options)
+
+
+def test_interval_adapts_to_change_ratio_within_bounds():
+    scheduler = make_scheduler()
+    assert scheduler.interval == 960
+
+    intervals = []
+    for ratio in (0.5, 0.5, 0.5, 0.5, 0.5, 0.005, None, 0.0, 0.0):
+        scheduler.record_success(ratio)
+        intervals.append(scheduler.interval)
+
+    assert intervals == [480, 240, 120, 60, 60, 60, 60, 90, 135]
+    assert scheduler.next_run_at == pytest.approx(time.time() + 135, abs=1)
+
+
+def test_stable_catalog_relaxes_to_max_and_counts_saved_crawls():
+    scheduler = make_scheduler()
+    for _ in range(10):
+        scheduler.record_success(0.0)
+
+    assert scheduler.interval == 960
+    assert scheduler.crawls == 10
+    # Each refresh stood in for 960 / 60 = 16 refreshes at the minimum interval
+    assert scheduler.snapshot()["crawls_saved"] == 10 * 15
+
+
+def test_failures_back_off_exponentially_with_jitter():
+    scheduler = make_scheduler()
+    for failures in range(1, 9):
+        delay = scheduler.record_failure() - time.time()
+        ceiling = min(960, 10 * 2 ** (failures - 1))
+        assert ceiling / 2 - 1 <= delay <= ceiling
+
+    scheduler.record_success(None)
+    assert scheduler.failures == 0
+
+
+def test_wait_follows_rescheduling():
+    scheduler = make_scheduler()
+
+    async def run():
+        scheduler.schedule(3600)
+        waiter = asyncio.create_task(scheduler.wait())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+
+        scheduler.schedule(0.05)
+        await asyncio.wait_for(waiter, timeout=1)
+
+    asyncio.run(run())
+    assert scheduler.next_run_at is None
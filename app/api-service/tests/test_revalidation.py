@@ -0,0 +1,128 @@
+"""Stale-while-revalidate of the stats snapshot against a local Redis."""
+
+import asyncio
+import json
+import time
+
+import services.redis
+import services.revalidation as revalidation
+from services.refresh_scheduler import RefreshScheduler
+from services.revalidation import (
+    REVALIDATE_CHANNEL,
+    REVALIDATE_KEY,
+    Revalidator,
+    listen_for_revalidation,
+)
+from services.stats_cache import (
+    STATS_FRESH_UNTIL_KEY,
+    STATS_KEY,
+    STATS_VERSION_KEY,
+    StatsCache,
+)
+from utils.serialization import pack_value
+
+BODY = json.dumps({"total_products": 3, "average_price": 12.5}).encode()
+
+
+def test_burst_across_replicas_triggers_one_refresh(redis_client, run_redis):
+    replicas = [Revalidator(guard=5) for _ in range(3)]
+
+    async def burst(client):
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(REVALIDATE_CHANNEL)
+        results = await asyncio.gather(
+            *(replica.request(client, None) for replica in replicas for _ in range(50))
+        )
+        messages = 0
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            if await pubsub.get_message(timeout=0.1):
+                messages += 1
+        await pubsub.aclose()
+        return results, messages
+
+    results, messages = run_redis(burst)
+
+    assert sum(results) == 1
+    assert messages == 1
+    assert sum(r.stats["triggered"] for r in replicas) == 1
+    assert sum(r.stats["coalesced"] for r in replicas) == 149
+    assert 0 < redis_client.pttl(REVALIDATE_KEY) <= 5000
+
+    # A published snapshot releases the guard: once it goes stale, it is
+    # revalidated again right away
+    redis_client.delete(REVALIDATE_KEY)
+    snapshot = StatsCache(path="").publish(BODY, version=1, ttl=0)
+    assert run_redis(lambda client: replicas[0].request(client, snapshot))
+    assert not run_redis(lambda client: replicas[0].request(client, snapshot))
+
+
+def test_snapshot_past_fresh_until_is_served_stale(redis_client, run_redis):
+    redis_client.set(STATS_KEY, pack_value(BODY), ex=600)
+    redis_client.set(STATS_VERSION_KEY, 4)
+    redis_client.set(STATS_FRESH_UNTIL_KEY, time.time() + 60)
+    cache = StatsCache(check_interval=0, path="")
+
+    snapshot = run_redis(cache.get)
+    assert snapshot.body == BODY
+    assert 55 < snapshot.ttl(time.time()) <= 60
+
+    redis_client.set(STATS_FRESH_UNTIL_KEY, time.time() - 1)
+    snapshot = run_redis(cache.get)
+    assert snapshot.body == BODY
+    assert snapshot.is_stale(time.time())
+    assert not snapshot.stale  # Still in Redis, just past its soft TTL
+
+
+def test_waiters_wake_on_a_fresh_snapshot(run_redis):
+    cache = StatsCache(check_interval=10, path="")
+
+    async def wait(client):
+        waiters = [
+            asyncio.create_task(cache.wait_for_update(client, 5)) for _ in range(20)
+        ]
+        await asyncio.sleep(0.1)
+        published = cache.publish(BODY, version=1, ttl=60)
+        start = time.monotonic()
+        snapshots = await asyncio.gather(*waiters)
+        return published, snapshots, time.monotonic() - start
+
+    published, snapshots, elapsed = run_redis(wait)
+    assert all(snapshot is published for snapshot in snapshots)
+    assert elapsed < 1
+
+    # Nothing is published: the wait ends at its deadline with what there is
+    empty = StatsCache(check_interval=10, path="")
+    assert run_redis(lambda client: empty.wait_for_update(client, 0.2)) is None
+
+
+def test_leader_refreshes_on_request_but_not_during_backoff(run_redis, monkeypatch):
+    monkeypatch.setattr(services.redis, "SUBSCRIBE_RETRY_DELAY", 0.05)
+    scheduler = RefreshScheduler(backoff_base=60)
+    monkeypatch.setattr(revalidation, "refresh_scheduler", scheduler)
+
+    async def request_refresh(client) -> bool:
+        scheduled = scheduler.next_run_at
+        await client.publish(REVALIDATE_CHANNEL, 1)
+        await asyncio.sleep(0.1)
+        return scheduler.next_run_at != scheduled
+
+    async def run(client):
+        listener = asyncio.create_task(
+            listen_for_revalidation(client, lambda: True, lambda: False)
+        )
+        try:
+            while (await client.pubsub_numsub(REVALIDATE_CHANNEL))[0][1] == 0:
+                await asyncio.sleep(0.01)
+            scheduler.record_failure()
+            during_backoff = await request_refresh(client)
+            scheduler.record_success(None)
+            return during_backoff, await request_refresh(client)
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+
+    during_backoff, after_success = run_redis(run)
+    assert not during_backoff
+    assert after_success
+    assert scheduler.next_run_at <= time.time()
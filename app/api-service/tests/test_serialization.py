@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+from utils.products import project_page
+from utils.serialization import (
+    SERIALIZERS,
+    get_serializer,
+    pack_value,
+    unpack_value,
+)
+
+BACKENDS = [name for name, backend in SERIALIZERS.items() if backend is not None]
+
+PAGE = {
+    "attributes": {"page": 1, "items": 6, "has_more_items": True},
+    "items": [
+        {
+            "type": "product",
+            "id": 1,
+            "attributes": {
+                "id": 1,
+                "name": "Lettmelk",
+                "gross_price": "21.90",
+                "brand": " Tine ",
+                "client_classifiers": [{"id": 7, "name": "Meieri"}],
+                "images": [{"thumbnail": {"url": "https://img.example/1.jpg"}}],
+            },
+        },
+        {"type": "recipe", "id": 2, "attributes": {"title": "Vafler"}},
+        {
+            "type": "product",
+            "id": 3,
+            "attributes": {"id": 3, "gross_price": "n/a", "brand": None},
+        },
+        {
+            "type": "product",
+            "id": 4,
+            "attributes": {"id": 4, "brand": "Q", "client_classifiers": []},
+        },
+        {
+            "type": "product",
+            "id": 5,
+            "attributes": {
+                "id": 5,
+                "gross_price": 99,
+                "brand": "",
+                "client_classifiers": [{"name": "Frukt"}, {"id": 1}, {"name": "X"}],
+            },
+        },
+        {
+            "type": "product",
+            "attributes": {"id": 6, "gross_price": "5", "brand": "Gilde"},
+        },
+    ],
+}
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_search_page_decoding_matches_dict_projection(backend):
+    page = get_serializer(backend).decode_search_page(json.dumps(PAGE).encode())
+
+    assert page.has_more_items is True
+    assert page.products == project_page(PAGE["items"])
+    assert [p.categories for p in page.products] == [
+        ("Meieri",),
+        (),
+        (),
+        ("Frukt",),
+        (),
+    ]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_unexpected_page_shape_falls_back_to_dicts(backend):
+    page = {
+        "attributes": {"has_more_items": False},
+        "items": [PAGE["items"][0], {"type": 5, "attributes": {}}],
+    }
+
+    decoded = get_serializer(backend).decode_search_page(json.dumps(page).encode())
+
+    assert decoded.has_more_items is False
+    assert decoded.products == project_page(page["items"])
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_round_trip(backend):
+    serializer = get_serializer(backend)
+    payload = {"total_products": 2, "average_price": 12.5, "categories": {"Bær": 1}}
+
+    encoded = serializer.dumps(payload)
+
+    assert isinstance(encoded, bytes)
+    assert json.loads(encoded) == payload
+    assert serializer.loads(encoded) == payload
+
+
+def test_unavailable_backend_falls_back_to_stdlib(monkeypatch):
+    monkeypatch.setitem(SERIALIZERS, "orjson", None)
+    assert get_serializer("orjson").name == "stdlib"
+
+
+def test_value_formats():
+    body = b'{"total_products":1}'
+
+    assert pack_value(body, 1) == body
+    assert pack_value(body, 2) == b"2:" + body
+    for value_format in (1, 2):
+        assert unpack_value(pack_value(body, value_format)) == body
+    # Values written by older releases, read back as str by the Redis client
+    assert unpack_value('{"total_products": 1}') == b'{"total_products": 1}'
+
+    with pytest.raises(ValueError):
+        unpack_value(b"3:" + body)
+    with pytest.raises(ValueError):
+        unpack_value(b"garbage")
@@ -0,0 +1,65 @@
+import asyncio
+import multiprocessing
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from utils.products import ProductRecord
+from utils.sharded import ShardedStatsAccumulator, calculate_stats_sharded
+from utils.stats import StatsAccumulator, calculate_stats
+
+
+def make_records(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        ProductRecord(
+            i,
+            None if i % 97 == 0 else round(rng.uniform(1, 900), 2),
+            f"Brand {rng.randint(0, 30)}",
+            tuple(f"Category {c}" for c in rng.sample(range(12), rng.randint(0, 3))),
+        )
+        for i in range(count)
+    ]
+
+
+def dump(stats):
+    return stats.model_dump(exclude={"last_updated"})
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("spawn")) as p:
+        yield p
+
+
+def test_merged_partials_match_single_pass():
+    records = make_records(5000)
+    merged = StatsAccumulator()
+    for start in range(0, len(records), 700):
+        partial = StatsAccumulator()
+        partial.add(records[start : start + 700])
+        merged.merge(partial)
+
+    assert dump(merged.finish()) == dump(calculate_stats(records))
+
+
+@pytest.mark.parametrize("shard_size", [1, 333, 100_000])
+def test_sharded_matches_calculate_stats(pool, shard_size):
+    records = make_records(3000, seed=shard_size)
+    stats = calculate_stats_sharded(records, pool, shard_size)
+    assert dump(stats) == dump(calculate_stats(records))
+
+
+def test_streamed_pages_drain_without_blocking(pool):
+    records = make_records(4000, seed=7)
+    accumulator = ShardedStatsAccumulator(pool, shard_size=1000)
+
+    async def run():
+        for start in range(0, len(records), 100):
+            accumulator.add(records[start : start + 100])
+        await accumulator.drain()
+        assert all(future.done() for future in accumulator._futures)
+        return accumulator.finish()
+
+    assert dump(asyncio.run(run())) == dump(calculate_stats(records))
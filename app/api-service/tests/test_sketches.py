@@ -0,0 +1,134 @@
+import json
+import math
+import random
+
+import pytest
+
+from utils.products import ProductRecord
+from utils.sketches import (
+    RELATIVE_ACCURACY,
+    PriceSketch,
+    bucket_value,
+    sketch_key,
+)
+from utils.stats import calculate_stats
+
+
+def make_prices(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    prices = [round(rng.lognormvariate(3.8, 1.1), 2) for _ in range(count)]
+    return prices + [0.0] * (count // 100)
+
+
+def exact_quantile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(max(math.ceil(q * len(ordered)), 1), len(ordered)) - 1]
+
+
+def sketch_of(prices) -> PriceSketch:
+    sketch = PriceSketch()
+    sketch.update(prices)
+    return sketch
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_quantiles_within_relative_accuracy(seed):
+    prices = make_prices(20_000, seed)
+    sketch = sketch_of(prices)
+
+    for q in (0, 0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999, 1):
+        exact = exact_quantile(prices, q)
+        assert abs(sketch.quantile(q) - exact) <= exact * RELATIVE_ACCURACY
+
+
+def test_every_value_is_reported_within_its_bucket():
+    for price in (0.01, 0.5, 1, 9.99, 49.9, 50, 64, 100.01, 12_345.67):
+        assert abs(bucket_value(sketch_key(price)) - price) <= price * RELATIVE_ACCURACY
+    assert bucket_value(sketch_key(0)) == 0
+
+
+def test_merged_partials_equal_one_pass():
+    prices = make_prices(5000, seed=3)
+    merged = PriceSketch()
+    for start in range(0, len(prices), 700):
+        merged.merge(sketch_of(prices[start : start + 700]))
+
+    single = sketch_of(prices)
+    assert merged.count == single.count
+    assert merged.buckets == single.buckets
+
+
+def test_removal_is_exact():
+    prices = make_prices(3000, seed=4)
+    sketch = sketch_of(prices)
+    for price in prices[1000:]:
+        sketch.add(price, -1)
+
+    assert sketch.buckets == sketch_of(prices[:1000]).buckets
+    assert sketch.count == 1000
+
+
+def test_serialized_form_round_trips():
+    sketch = sketch_of(make_prices(2000, seed=5))
+    restored = PriceSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+
+    assert restored.buckets == sketch.buckets
+    assert restored.quantiles((0.5, 0.99)) == sketch.quantiles((0.5, 0.99))
+
+    with pytest.raises(ValueError):
+        PriceSketch.from_dict({**sketch.to_dict(), "subbuckets": 64})
+
+
+def test_histogram_matches_exact_binning():
+    prices = make_prices(20_000, seed=6)
+    sketch = sketch_of(prices)
+    histogram = sketch.histogram(10, high=500)
+
+    assert [b["low"] for b in histogram] == [i * 50.0 for i in range(10)]
+    assert histogram[-1]["high"] is None
+    assert sum(b["count"] for b in histogram) == len(prices)
+
+    exact = [0] * 10
+    for price in prices:
+        exact[min(int(price / 50), 9)] += 1
+    for i, b in enumerate(histogram):
+        # Only prices in a bucket that straddles a bin edge can land next door
+        near_edge = sum(
+            1
+            for price in prices
+            if any(
+                abs(price - edge) <= edge * 2 * RELATIVE_ACCURACY
+                for edge in (i * 50, (i + 1) * 50)
+            )
+        )
+        assert abs(b["count"] - exact[i]) <= near_edge
+
+
+def test_default_histogram_ends_at_rounded_p99():
+    sketch = sketch_of(make_prices(5000, seed=7))
+    p99 = sketch.quantile(0.99)
+    histogram = sketch.histogram(20)
+
+    high = histogram[0]["high"] * 20
+    assert p99 <= high < p99 * 1.1
+
+
+def test_stats_report_quantiles_and_cardinality():
+    prices = make_prices(5000, seed=8)
+    records = [
+        ProductRecord(i, price, f"Brand {i % 37}", (f"Category {i % 11}",))
+        for i, price in enumerate(prices)
+    ]
+    records.append(ProductRecord(-1, None, "Unpriced", ("Unpriced",)))
+    stats = calculate_stats(records)
+
+    assert list(stats.price_quantiles) == ["p50", "p90", "p99"]
+    for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+        exact = exact_quantile(prices, q)
+        # Reported values are rounded to the øre
+        assert abs(stats.price_quantiles[name] - exact) <= (
+            exact * RELATIVE_ACCURACY + 0.005
+        )
+    assert sum(b.count for b in stats.price_histogram) == len(prices)
+    assert stats.distinct_brands == 37
+    assert stats.distinct_categories == 11
@@ -0,0 +1,126 @@
+import json
+import zlib
+
+import pytest
+
+from services.stats_cache import STATS_KEY, STATS_VERSION_KEY, StatsCache
+from utils.serialization import pack_value
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BODY = json.dumps({"total_products": 3, "average_price": 12.5}).encode()
+
+
+def test_published_snapshot_survives_restart(tmp_path):
+    path = str(tmp_path / "data" / "stats_snapshot.json")
+    published = StatsCache(path=path).publish(BODY, version=7, ttl=60)
+    assert not published.is_stale(0)
+
+    restarted = StatsCache(path=path)
+    snapshot = restarted.load_persisted()
+
+    assert snapshot is restarted.snapshot
+    assert snapshot.version == 7
+    assert snapshot.body == BODY
+    assert snapshot.etag == published.etag
+    assert snapshot.is_stale(0)
+
+
+def test_missing_or_corrupt_snapshot_file(tmp_path):
+    path = tmp_path / "stats_snapshot.json"
+    assert StatsCache(path=str(path)).load_persisted() is None
+
+    path.write_bytes(b"not json\n{}")
+    cache = StatsCache(path=str(path))
+    assert cache.load_persisted() is None
+    assert cache.snapshot is None
+
+
+def test_persistence_disabled(tmp_path):
+    cache = StatsCache(path="")
+    cache.publish(BODY, version=1, ttl=60)
+    assert cache.load_persisted() is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_falls_back_to_last_good_snapshot(tmp_path):
+    cache = StatsCache(path=str(tmp_path / "stats_snapshot.json"))
+    published = cache.publish(BODY, version=2, ttl=60)
+
+    cache._fall_back()
+
+    assert cache.snapshot is published
+    assert cache.snapshot.is_stale(0)
+
+
+def test_render_splices_cache_info_into_the_payload():
+    snapshot = StatsCache(path="").publish(BODY, version=1, ttl=60)
+    cache_info = {"ttl_seconds": 60, "next_update_at": "2026-01-01T00:00:00Z"}
+    expected = {**json.loads(BODY), "cache_info": cache_info}
+
+    assert json.loads(snapshot.render(cache_info)) == expected
+    gzipped = snapshot.render(cache_info, "gzip")
+    assert json.loads(zlib.decompress(gzipped, 31)) == expected
+    # The next request compresses from the saved state again
+    assert snapshot.render(cache_info, "gzip") == gzipped
+
+
+def put_snapshot(redis_client, body: bytes, version: int):
+    redis_client.set(STATS_KEY, pack_value(body), ex=600)
+    redis_client.set(STATS_VERSION_KEY, version)
+
+
+def test_new_version_in_redis_is_loaded(redis_client, run_redis):
+    put_snapshot(redis_client, BODY, 1)
+    cache = StatsCache(check_interval=0, path="")
+    assert run_redis(cache.get).version == 1
+
+    newer = json.dumps({"total_products": 4, "average_price": 11.0}).encode()
+    put_snapshot(redis_client, newer, 2)
+    snapshot = run_redis(cache.get)
+    assert snapshot.version == 2
+    assert snapshot.body == newer
+
+
+def test_redis_is_checked_once_per_interval(redis_client, run_redis):
+    put_snapshot(redis_client, BODY, 1)
+    cache = StatsCache(check_interval=60, path="")
+    first = run_redis(cache.get)
+
+    newer = json.dumps({"total_products": 4, "average_price": 11.0}).encode()
+    put_snapshot(redis_client, newer, 2)
+    # Within the interval the snapshot in memory is served as is
+    assert run_redis(cache.get) is first
+    # ... unless a newer version was announced, e.g. on the stats channel
+    assert run_redis(lambda client: cache.get_version(client, 2)).version == 2
+
+    put_snapshot(redis_client, BODY, 3)
+    cache._checked_at -= 60
+    assert run_redis(cache.get).version == 3
+
+
+@pytest.mark.skipif(brotli is None, reason="brotli is not installed")
+def test_brotli_body_is_compressed_once_per_snapshot(monkeypatch):
+    snapshot = StatsCache(path="").publish(BODY, version=1, ttl=60)
+    compressors = []
+    new_compressor = brotli.Compressor
+
+    def compressor(**kwargs):
+        compressors.append(new_compressor(**kwargs))
+        return compressors[-1]
+
+    monkeypatch.setattr("services.stats_cache.brotli.Compressor", compressor)
+    monkeypatch.setattr("services.stats_cache.brotli.compress", None)
+
+    # Requests in the same second, and later ones, differ in cache_info only
+    for ttl in (60, 60, 59, 0):
+        cache_info = {"ttl_seconds": ttl, "stale": not ttl}
+        body = snapshot.render(cache_info, "br")
+        assert json.loads(brotli.decompress(body)) == {
+            **json.loads(BODY),
+            "cache_info": cache_info,
+        }
+    assert len(compressors) == 1
@@ -0,0 +1,244 @@
+"""GET /api/stats through the ASGI app: validators, 304s, content codings
+and waiting for a fresh snapshot."""
+
+import asyncio
+import json
+import time
+
+import pytest
+import redis.asyncio as aioredis
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import api.endpoints as endpoints
+from config import STATS_MAX_WAIT, STATS_REVALIDATE_GUARD
+from services.revalidation import REVALIDATE_KEY, Revalidator
+from services.stats_cache import StatsCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATS = {
+    "total_products": 3,
+    "average_price": 12.5,
+    "last_updated": "2026-01-02T03:04:05+00:00",
+}
+BODY = json.dumps(STATS).encode()
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = StatsCache(check_interval=60, path="")
+    monkeypatch.setattr(endpoints, "stats_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def client(redis_url, redis_client, monkeypatch):
+    monkeypatch.setattr(endpoints, "revalidator", Revalidator(guard=1))
+    app = FastAPI()
+    app.include_router(endpoints.router)
+    app.state.redis = aioredis.Redis.from_url(redis_url)
+    # One event loop for every request, as the Redis connections are bound to it
+    with TestClient(app) as client:
+        yield client
+        client.portal.call(app.state.redis.aclose)
+
+
+def test_served_with_validators(cache, client):
+    snapshot = cache.publish(BODY, version=1, ttl=60)
+
+    response = client.get("/api/stats", headers={"Accept-Encoding": "identity"})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == snapshot.etag
+    assert response.headers["Last-Modified"] == "Fri, 02 Jan 2026 03:04:05 GMT"
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert "Content-Encoding" not in response.headers
+    payload = response.json()
+    assert payload["total_products"] == 3
+    assert payload["cache_info"]["stale"] is False
+    assert 0 < payload["cache_info"]["ttl_seconds"] <= 60
+
+
+def test_conditional_requests(cache, client):
+    snapshot = cache.publish(BODY, version=1, ttl=60)
+    identity = {"Accept-Encoding": "identity"}
+
+    response = client.get(
+        "/api/stats", headers={**identity, "If-None-Match": snapshot.etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == snapshot.etag
+
+    # The ETag of another coding of the same snapshot matches too
+    response = client.get(
+        "/api/stats",
+        headers={**identity, "If-None-Match": snapshot.etag_for("gzip")},
+    )
+    assert response.status_code == 304
+
+    response = client.get(
+        "/api/stats", headers={**identity, "If-None-Match": '"other"'}
+    )
+    assert response.status_code == 200
+
+    response = client.get(
+        "/api/stats",
+        headers={**identity, "If-Modified-Since": "Fri, 02 Jan 2026 03:04:05 GMT"},
+    )
+    assert response.status_code == 304
+
+    response = client.get(
+        "/api/stats",
+        headers={**identity, "If-Modified-Since": "Fri, 02 Jan 2026 03:04:04 GMT"},
+    )
+    assert response.status_code == 200
+
+    # If-None-Match takes precedence over If-Modified-Since
+    response = client.get(
+        "/api/stats",
+        headers={
+            **identity,
+            "If-None-Match": '"other"',
+            "If-Modified-Since": "Fri, 02 Jan 2026 03:04:05 GMT",
+        },
+    )
+    assert response.status_code == 200
+
+    # A new snapshot no longer matches the old validators
+    cache.publish(json.dumps({**STATS, "total_products": 4}).encode(), 2, ttl=60)
+    response = client.get(
+        "/api/stats", headers={**identity, "If-None-Match": snapshot.etag}
+    )
+    assert response.status_code == 200
+    assert response.json()["total_products"] == 4
+
+
+@pytest.mark.parametrize(
+    "encoding",
+    [
+        "gzip",
+        pytest.param(
+            "br", marks=pytest.mark.skipif(brotli is None, reason="needs brotli")
+        ),
+    ],
+)
+def test_compressed_payload(cache, client, encoding):
+    snapshot = cache.publish(BODY, version=1, ttl=60)
+
+    response = client.get("/api/stats", headers={"Accept-Encoding": encoding})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == encoding
+    assert response.headers["ETag"] == snapshot.etag_for(encoding)
+    assert response.headers["ETag"] != snapshot.etag
+    # The client decodes it back to the identity payload
+    payload = response.json()
+    assert payload["total_products"] == 3
+    assert payload["cache_info"]["stale"] is False
+
+    response = client.get(
+        "/api/stats",
+        headers={
+            "Accept-Encoding": encoding,
+            "If-None-Match": snapshot.etag_for(encoding),
+        },
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == snapshot.etag_for(encoding)
+
+
+def test_preferred_encoding(cache, client):
+    cache.publish(BODY, version=1, ttl=60)
+
+    response = client.get("/api/stats", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == ("br" if brotli else "gzip")
+
+    response = client.get("/api/stats", headers={"Accept-Encoding": "gzip;q=1, br;q=0"})
+    assert response.headers["Content-Encoding"] == "gzip"
+
+    response = client.get("/api/stats", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in response.headers
+    assert response.json()["total_products"] == 3
+
+
+class PublishingRevalidator:
+    """Stands in for the leader: every refresh request publishes a fresh
+    snapshot `delay` seconds later."""
+
+    def __init__(self, cache, delay):
+        self.cache = cache
+        self.delay = delay
+        self.requests = 0
+
+    async def request(self, redis_instance, snapshot):
+        self.requests += 1
+        body = json.dumps({**STATS, "total_products": 10 + self.requests}).encode()
+        asyncio.get_running_loop().call_later(
+            self.delay, self.cache.publish, body, 10 + self.requests, 60
+        )
+        return True
+
+
+def test_wait_returns_the_refreshed_snapshot(cache, client, monkeypatch):
+    cache.publish(BODY, version=1, ttl=0)
+    revalidator = PublishingRevalidator(cache, delay=0.2)
+    monkeypatch.setattr(endpoints, "revalidator", revalidator)
+
+    started = time.monotonic()
+    response = client.get("/api/stats?wait=5")
+
+    assert response.status_code == 200
+    assert response.json()["total_products"] == 11
+    assert response.json()["cache_info"]["stale"] is False
+    assert revalidator.requests == 1
+    # Woken by the publish, not by the timeout
+    assert time.monotonic() - started < 2
+
+
+def test_without_wait_the_stale_snapshot_is_served(cache, client, monkeypatch):
+    cache.publish(BODY, version=1, ttl=0)
+    revalidator = PublishingRevalidator(cache, delay=0.2)
+    monkeypatch.setattr(endpoints, "revalidator", revalidator)
+
+    response = client.get("/api/stats")
+
+    assert response.status_code == 200
+    assert response.json()["total_products"] == 3
+    assert response.json()["cache_info"]["stale"] is True
+    assert revalidator.requests == 1
+
+
+def test_wait_times_out_with_the_stale_snapshot(cache, client, redis_client):
+    cache.publish(BODY, version=1, ttl=0)
+
+    started = time.monotonic()
+    response = client.get("/api/stats?wait=0.3")
+
+    assert time.monotonic() - started >= 0.3
+    assert response.status_code == 200
+    assert response.json()["total_products"] == 3
+    assert response.json()["cache_info"]["stale"] is True
+    # The refresh was still asked for
+    assert redis_client.exists(REVALIDATE_KEY)
+
+
+def test_wait_times_out_without_a_snapshot(cache, client, redis_client):
+    response = client.get("/api/stats?wait=0.3")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(int(STATS_REVALIDATE_GUARD))
+    assert redis_client.exists(REVALIDATE_KEY)
+
+
+def test_wait_is_bounded(cache, client):
+    cache.publish(BODY, version=1, ttl=60)
+
+    assert client.get(f"/api/stats?wait={STATS_MAX_WAIT + 1}").status_code == 422
+    assert client.get("/api/stats?wait=-1").status_code == 422
+    assert client.get(f"/api/stats?wait={STATS_MAX_WAIT}").status_code == 200
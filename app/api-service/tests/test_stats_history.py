@@ -0,0 +1,104 @@
+"""Stats history against a local Redis."""
+
+import pytest
+
+from models.stats import ProductStats
+from services.stats_history import (
+    HISTORY_FIELDS,
+    HISTORY_KEY,
+    parse_fields,
+    query_history,
+    record_snapshot,
+)
+
+START = 1_700_000_000
+INTERVAL = 30 * 60
+
+
+@pytest.fixture
+def history(redis_client):
+    """100 snapshots, 30 minutes apart, whose total_products is their index."""
+    with redis_client.pipeline() as pipe:
+        for i in range(100):
+            stats = ProductStats(
+                total_products=i,
+                average_price=10 + i,
+                price_ranges={"0-50": i},
+                top_brands=[],
+                categories={},
+                last_updated=str(i),
+            )
+            record_snapshot(pipe, stats, START + i * INTERVAL)
+        pipe.execute()
+
+
+@pytest.fixture
+def query(history, run_redis):
+    def query(*args, **kwargs):
+        return run_redis(lambda client: query_history(client, *args, **kwargs))
+
+    return query
+
+
+def test_returns_requested_fields_in_range(query):
+    end = START + 9 * INTERVAL
+    result = query(START, end, ["total_products"], max_points=50)
+
+    assert result["total"] == 10
+    assert not result["downsampled"]
+    assert [p["total_products"] for p in result["points"]] == list(range(10))
+    assert set(result["points"][0]) == {"timestamp", "total_products"}
+
+
+def test_downsamples_to_latest_snapshot_per_bucket(query):
+    end = START + 99 * INTERVAL
+    result = query(START, end, ["total_products"], max_points=10)
+
+    assert result["total"] == 100
+    assert result["downsampled"]
+    counts = [p["total_products"] for p in result["points"]]
+    assert len(counts) == 10
+    assert counts == sorted(counts)
+    assert counts[-1] == 99
+
+
+def test_only_numeric_series_are_kept(query, redis_client):
+    [member] = redis_client.zrangebyscore(HISTORY_KEY, START, START)
+    assert "price_ranges" in member and "top_brands" not in member
+
+    [point] = query(START, START)["points"]
+    assert set(point) == {"timestamp", *HISTORY_FIELDS}
+    assert point["average_price"] == 10
+
+
+def test_retention_drops_old_snapshots(history, redis_client, monkeypatch):
+    monkeypatch.setattr("services.stats_history.STATS_HISTORY_RETENTION_DAYS", 1)
+    latest = START + 99 * INTERVAL
+    with redis_client.pipeline() as pipe:
+        record_snapshot(
+            pipe,
+            ProductStats(
+                total_products=100,
+                average_price=0,
+                price_ranges={},
+                top_brands=[],
+                categories={},
+                last_updated="latest",
+            ),
+            latest,
+        )
+        pipe.execute()
+
+    # The last day of half-hourly snapshots (both ends included) plus the new one
+    assert redis_client.zcard(HISTORY_KEY) == 49 + 1
+
+
+def test_parse_fields():
+    assert parse_fields(None) == list(HISTORY_FIELDS)
+    assert parse_fields(" average_price , distinct_brands") == [
+        "average_price",
+        "distinct_brands",
+    ]
+    for fields in ("average_price,secret", "categories"):
+        with pytest.raises(ValueError):
+            parse_fields(fields)
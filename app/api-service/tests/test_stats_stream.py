@@ -0,0 +1,149 @@
+"""Live stats streams: the broadcaster, the SSE endpoint and the listener."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import api.endpoints as endpoints
+import services.redis
+import services.stats_stream as stats_stream
+from services.stats_cache import (
+    STATS_CHANNEL,
+    STATS_KEY,
+    STATS_VERSION_KEY,
+    StatsCache,
+)
+from services.stats_stream import StatsBroadcaster
+from utils.serialization import pack_value
+
+
+def body(version: int) -> bytes:
+    return json.dumps({"total_products": version, "average_price": 1.0}).encode()
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = StatsCache(check_interval=60, path="")
+    monkeypatch.setattr(endpoints, "stats_cache", cache)
+    monkeypatch.setattr(stats_stream, "stats_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def broadcaster(monkeypatch):
+    broadcaster = StatsBroadcaster(max_subscribers=2)
+    monkeypatch.setattr(endpoints, "broadcaster", broadcaster)
+    monkeypatch.setattr(stats_stream, "broadcaster", broadcaster)
+    return broadcaster
+
+
+def test_slow_streams_only_keep_the_newest_snapshot(cache, broadcaster):
+    slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+    assert broadcaster.full
+
+    for version in (1, 2, 3):
+        broadcaster.broadcast(cache.publish(body(version), version, ttl=60))
+        if version == 2:
+            assert fast.get_nowait().version == 2
+
+    assert slow.qsize() == 1
+    assert slow.get_nowait().version == 3
+    assert fast.get_nowait().version == 3
+
+    broadcaster.unsubscribe(slow)
+    assert not broadcaster.full
+    assert broadcaster.subscribers == 1
+
+
+def open_stream(last_event_id=None):
+    headers = {"last-event-id": last_event_id} if last_event_id else {}
+    request = SimpleNamespace(
+        headers=headers, app=SimpleNamespace(state=SimpleNamespace(redis=None))
+    )
+    return endpoints.stream_stats(request)
+
+
+def test_stream_sends_current_and_new_snapshots(cache, broadcaster, monkeypatch):
+    monkeypatch.setattr(endpoints, "STATS_STREAM_HEARTBEAT", 0.05)
+    current = cache.publish(body(1), 1, ttl=60)
+
+    async def run():
+        response = await open_stream()
+        assert response.media_type == "text/event-stream"
+        events = response.body_iterator
+        assert await anext(events) == b"retry: 5000\n\n"
+        assert await anext(events) == current.event
+        assert await anext(events) == b": keep-alive\n\n"
+
+        newer = cache.publish(body(2), 2, ttl=60)
+        broadcaster.broadcast(newer)
+        assert await anext(events) == newer.event
+        assert broadcaster.subscribers == 1
+
+        await events.aclose()
+        assert broadcaster.subscribers == 0
+
+    asyncio.run(run())
+
+
+def test_reconnect_with_last_event_id_skips_the_current_snapshot(
+    cache, broadcaster, monkeypatch
+):
+    monkeypatch.setattr(endpoints, "STATS_STREAM_HEARTBEAT", 0.05)
+    cache.publish(body(7), 7, ttl=60)
+
+    async def run():
+        events = (await open_stream(last_event_id="7")).body_iterator
+        await anext(events)
+        first = await anext(events)
+        await events.aclose()
+        return first
+
+    assert asyncio.run(run()) == b": keep-alive\n\n"
+
+
+def test_stream_limit(cache, broadcaster):
+    broadcaster.subscribe()
+    broadcaster.subscribe()
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(open_stream())
+    assert error.value.status_code == 503
+
+
+def test_listener_survives_a_bad_message(
+    cache, broadcaster, redis_client, run_redis, monkeypatch, caplog
+):
+    monkeypatch.setattr(services.redis, "SUBSCRIBE_RETRY_DELAY", 0.05)
+    redis_client.set(STATS_KEY, pack_value(body(5)), ex=600)
+    redis_client.set(STATS_VERSION_KEY, 5)
+    queue = broadcaster.subscribe()
+
+    async def subscribed(client) -> bool:
+        [(_, count)] = await client.pubsub_numsub(STATS_CHANNEL)
+        return count > 0
+
+    async def run(client):
+        listener = asyncio.create_task(stats_stream.listen_for_snapshots(client))
+        try:
+            while not await subscribed(client):
+                await asyncio.sleep(0.01)
+            await client.publish(STATS_CHANNEL, "not a version")
+            # Keep announcing until the listener has resubscribed and relays it
+            for _ in range(50):
+                await client.publish(STATS_CHANNEL, 5)
+                try:
+                    return await asyncio.wait_for(queue.get(), 0.1)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+
+    snapshot = run_redis(run)
+    assert "failed, resubscribing" in caplog.text
+    assert snapshot.version == 5
+    assert snapshot.body == body(5)
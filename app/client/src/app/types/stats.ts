@@ -11,9 +11,20 @@ export interface ProductStats {
   categories: {
     [key: string]: number;
   };
+  price_quantiles?: {
+    [key: string]: number;
+  };
+  price_histogram?: {
+    low: number;
+    high: number | null;
+    count: number;
+  }[];
+  distinct_brands?: number;
+  distinct_categories?: number;
   last_updated: string;
   cache_info: {
     ttl_seconds: number;
     next_update_at: string;
+    stale?: boolean;
   };
 }
\ No newline at end of file
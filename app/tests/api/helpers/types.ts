@@ -14,6 +14,7 @@ export interface PriceRanges {
 export interface CacheInfo {
   ttl_seconds: number;
   next_update_at: number;
+  stale?: boolean;
 }
 
 export interface Categories {
@@ -33,4 +34,5 @@ export interface StatsResponse {
 export interface HealthResponse {
   status: 'healthy' | 'unhealthy';
   redis: 'connected' | 'disconnected';
+  role?: 'leader' | 'follower';
 }
\ No newline at end of file
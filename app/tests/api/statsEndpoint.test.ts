@@ -104,4 +104,40 @@ test.describe("Stats Endpoint", () => {
     // Cache TTL should be decreasing
     expect(data2.cache_info.ttl_seconds).toBeLessThan(data1.cache_info.ttl_seconds);
   });
+
+  test("should answer 304 when the snapshot has not changed", async ({ request }) => {
+    const response = await request.get(`${API_URL}/api/stats`);
+    const etag = response.headers()["etag"];
+    const lastModified = response.headers()["last-modified"];
+    expect(etag).toBeTruthy();
+    expect(lastModified).toBeTruthy();
+
+    const byEtag = await request.get(`${API_URL}/api/stats`, {
+      headers: { "If-None-Match": etag },
+    });
+    expect(byEtag.status()).toBe(304);
+    expect(byEtag.headers()["etag"]).toBe(etag);
+
+    const byDate = await request.get(`${API_URL}/api/stats`, {
+      headers: { "If-Modified-Since": lastModified },
+    });
+    expect(byDate.status()).toBe(304);
+
+    const stale = await request.get(`${API_URL}/api/stats`, {
+      headers: { "If-None-Match": '"stale"' },
+    });
+    expect(stale.status()).toBe(200);
+  });
+
+  test("should serve compressed stats", async ({ request }) => {
+    const response = await request.get(`${API_URL}/api/stats`, {
+      headers: { "Accept-Encoding": "gzip" },
+    });
+    expect(response.status()).toBe(200);
+    expect(response.headers()["content-encoding"]).toBe("gzip");
+    expect(response.headers()["vary"]).toContain("Accept-Encoding");
+
+    const data = (await response.json()) as StatsResponse;
+    expect(data).toHaveProperty("cache_info");
+  });
 });